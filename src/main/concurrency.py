@@ -0,0 +1,113 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Helpers for the async views.
+
+``read()`` runs a blocking ORM / cache / file read on the "db" thread pool.
+Every pool thread keeps a context of its own, so it holds its own database
+connections, and reads awaited together with ``asyncio.gather`` really run
+side by side. Django's own sync_to_async would run them one after another on
+a single thread.
+
+``compute()`` runs CPU-bound pandas / geometry / JSON work on the bounded
+"cpu" pool, so one large map does not block the event loop for everybody
+else. Functions given to compute() must not use the ORM.
+
+Both pools are per worker process and sized by ASYNC_DB_WORKERS and
+ASYNC_CPU_WORKERS.
+
+``streaming_content()`` hands a chunk generator to StreamingHttpResponse so
+that it streams under ASGI as well: Django collects a sync iterator with
+list() there before sending anything.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+from main import telemetry
+
+_executors = {}
+_executors_lock = threading.Lock()
+_thread_state = threading.local()
+
+
+def _executor(kind):
+    executor = _executors.get(kind)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(kind)
+            if executor is None:
+                workers = settings.ASYNC_DB_WORKERS if kind == "db" else settings.ASYNC_CPU_WORKERS
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"mucp-{kind}")
+                _executors[kind] = executor
+    return executor
+
+
+def _run_read(record, func, args, kwargs):
+    # a context per pool thread: its connections are never shared with
+    # another thread and are reused by the next read on the same thread
+    context = getattr(_thread_state, "context", None)
+    if context is None:
+        context = _thread_state.context = contextvars.Context()
+    return context.run(_read_with_connections, record, func, args, kwargs)
+
+
+def _read_with_connections(record, func, args, kwargs):
+    close_old_connections()
+    try:
+        with telemetry.bind(record):
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def read(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` (blocking, may use the ORM) on the db pool."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_run_read, telemetry.current_record(), func, args, kwargs)
+    return await loop.run_in_executor(_executor("db"), call)
+
+
+async def compute(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` (CPU-bound, no ORM) on the cpu pool."""
+    loop = asyncio.get_running_loop()
+    # carry the request context along so telemetry stages are recorded
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor("cpu"), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def _chunks_in_thread(chunks):
+    # one sync thread for every chunk: a generator reading the ORM keeps its
+    # cursor on the connection of the thread it started on
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (chunk := await next_chunk(chunks, done)) is not done:
+        yield chunk
+
+
+def streaming_content(request, chunks):
+    """
+    ``chunks`` (a generator) for a StreamingHttpResponse of ``request``:
+    as it is under WSGI, under ASGI an async iterator reading one chunk at
+    a time off the event loop.
+    """
+    if isinstance(request, ASGIRequest):
+        return _chunks_in_thread(iter(chunks))
+    return chunks
+
+
+async def json_response(data, status=200):
+    """JsonResponse with the encoding done on the cpu pool (large GeoJSON)."""
+    body = await compute(json.dumps, data, cls=DjangoJSONEncoder)
+    return HttpResponse(body, content_type="application/json", status=status)
@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.telemetry.TelemetryMiddleware',
 ]
 
 
@@ -144,6 +145,15 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Custom directory for project uploads
 PROJECTS_ROOT = os.path.join(MEDIA_ROOT, 'projects')
 
+# Ingestion of uploaded project files (see project/ingestion.py)
+PROJECT_INGESTION_BACKGROUND = os.environ.get("PROJECT_INGESTION_BACKGROUND", "1") == "1"
+PROJECT_INGESTION_WORKERS = int(os.environ.get("PROJECT_INGESTION_WORKERS", "2"))
+# projects pending/processing longer than this (e.g. the worker restarted
+# mid-ingestion) are queued again when their detail page opens
+PROJECT_INGESTION_STALE_SECONDS = int(os.environ.get("PROJECT_INGESTION_STALE_SECONDS", "3600"))
+# largest unpacked size of a zipped project upload (see project/bundles.py)
+PROJECT_BUNDLE_MAX_SIZE = int(os.environ.get("PROJECT_BUNDLE_MAX_SIZE", str(2 * 1024 ** 3)))
+
 
 LOGIN_REDIRECT_URL = 'home:home_view'
 LOGOUT_REDIRECT_URL = '/'
@@ -160,3 +170,114 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 SESSION_COOKIE_SECURE=True
+
+
+# Caches. Parsed project files go in a file based cache so every gunicorn
+# worker shares them (see project/tables.py)
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'project_files': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'project_files'),
+        'TIMEOUT': int(os.environ.get("PROJECT_FILE_CACHE_TIMEOUT", str(7 * 24 * 3600))),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # per-scenario aggregates and rebuilt years of saved results (see
+    # visualization/aggregates.py and visualization/results.py)
+    'results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'results'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+PROJECT_TABLE_PAGE_SIZE = 50
+
+# Result maps switch to H3 hexagons (visualization/hexagons.py) in "auto"
+# mode when a project has more GIS mapping features than this
+MAP_HEX_FEATURE_THRESHOLD = int(os.environ.get("MAP_HEX_FEATURE_THRESHOLD", "5000"))
+MAP_HEX_DEFAULT_RESOLUTION = 7
+
+# Saved results keep every row in a keyframe year every N years and only the
+# changed rows in between (1 = every year is a keyframe). Reconstructed years
+# are cached in the "results" cache.
+RESULT_KEYFRAME_INTERVAL = int(os.environ.get("RESULT_KEYFRAME_INTERVAL", "5"))
+RESULT_CACHE_TIMEOUT = int(os.environ.get("RESULT_CACHE_TIMEOUT", "3600"))
+
+# Trim the simulation input frames before the budget engine runs: no
+# geometry, repeating text as category, integers as int32 (planning/dtypes.py).
+# Off until the engine's results are checked on category columns
+SIMULATION_LEAN_INPUTS = os.environ.get("SIMULATION_LEAN_INPUTS", "0") == "1"
+
+# Thread pools of the async visualization views (see main/concurrency.py):
+# blocking database/file reads, and CPU-bound pandas/geometry/JSON work
+ASYNC_DB_WORKERS = int(os.environ.get("ASYNC_DB_WORKERS", "4"))
+ASYNC_CPU_WORKERS = int(os.environ.get("ASYNC_CPU_WORKERS", "2"))
+
+# import pandas/geopandas/matplotlib when the WSGI/ASGI app loads (set by
+# start.sh for preloaded gunicorn masters, see main/warmup.py)
+WARMUP_IMPORTS = os.environ.get("WARMUP_IMPORTS", "0") == "1"
+
+
+# Performance telemetry (see main/telemetry.py)
+TELEMETRY_ENABLED = os.environ.get("TELEMETRY_ENABLED", "1") == "1"
+TELEMETRY_SLOW_REQUEST_MS = int(os.environ.get("TELEMETRY_SLOW_REQUEST_MS", "2000"))
+# "cprofile", "pyinstrument" (if installed) or empty to disable profiling
+TELEMETRY_PROFILER = os.environ.get("TELEMETRY_PROFILER", "") or None
+TELEMETRY_LOG_DIR = os.environ.get("TELEMETRY_LOG_DIR", os.path.join(BASE_DIR, 'logs'))
+TELEMETRY_PROFILE_DIR = os.path.join(TELEMETRY_LOG_DIR, 'profiles')
+TELEMETRY_IGNORE_PATHS = [STATIC_URL, MEDIA_URL, '/metrics']
+TELEMETRY_METRICS_ALLOWED_IPS = os.environ.get("TELEMETRY_METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
+os.makedirs(TELEMETRY_LOG_DIR, exist_ok=True)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'telemetry_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(TELEMETRY_LOG_DIR, 'requests.jsonl'),
+            'maxBytes': 20 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json_line',
+        },
+        'simulation_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(TELEMETRY_LOG_DIR, 'simulation.log'),
+            'maxBytes': 20 * 1024 * 1024,
+            'backupCount': 5,
+        },
+        'slow_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(TELEMETRY_LOG_DIR, 'slow_requests.jsonl'),
+            'maxBytes': 20 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json_line',
+        },
+    },
+    'loggers': {
+        'mucp.telemetry': {'handlers': ['telemetry_file'], 'level': 'INFO', 'propagate': False},
+        'mucp.telemetry.slow': {'handlers': ['slow_file'], 'level': 'WARNING', 'propagate': False},
+        'mucp.simulation': {'handlers': ['simulation_file'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# django-debug-toolbar is opt-in (DJANGO_DEBUG_TOOLBAR=1) and only when installed
+DEBUG_TOOLBAR_ENABLED = False
+if DEBUG and os.environ.get("DJANGO_DEBUG_TOOLBAR") == "1":
+    try:
+        import debug_toolbar  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        DEBUG_TOOLBAR_ENABLED = True
+        INSTALLED_APPS.append('debug_toolbar')
+        MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+        INTERNAL_IPS = ['127.0.0.1']
@@ -0,0 +1,423 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Request-level performance telemetry.
+
+TelemetryMiddleware records, for every request: wall time, database time and
+query count, time spent in named stages (blocks wrapped with ``stage()``,
+e.g. the file reads of the app: gpd.read_file, pd.read_csv, pd.read_excel),
+the peak RSS delta and the response size. Each record is written as one JSON line to the
+``mucp.telemetry`` logger (a rotating file, see LOGGING in settings) and is
+folded into an in-process registry exposed in Prometheus text format by
+``metrics_view``. Requests slower than TELEMETRY_SLOW_REQUEST_MS are also
+logged to ``mucp.telemetry.slow`` and, if TELEMETRY_PROFILER is set, their
+cProfile/pyinstrument capture is written to TELEMETRY_PROFILE_DIR.
+
+The registry lives in the worker process, so every gunicorn worker keeps its
+own counters; the ``pid`` label tells them apart when scraping.
+
+The middleware runs sync or async, whichever the handler is. Async requests
+are not profiled: several of them share the event loop thread, so a
+profile would mix them up. Their query counts only cover the reads run
+through main.concurrency.read(), which binds the record in its thread;
+database connections are per thread, so queries made in other
+sync_to_async threads (e.g. request.auser()) are not seen.
+"""
+import contextvars
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger("mucp.telemetry")
+slow_logger = logging.getLogger("mucp.telemetry.slow")
+
+# the record of the request being served by the current thread / task
+_current_record = contextvars.ContextVar("mucp_telemetry_record", default=None)
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+# -----------------------------
+# Stage timing
+# -----------------------------
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to the current request's ``name`` stage."""
+    record = _current_record.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add_stage(name, time.perf_counter() - start)
+
+
+def current_record():
+    """The record of the request being served, None outside of a request."""
+    return _current_record.get()
+
+
+@contextmanager
+def bind(record):
+    """
+    Attribute the stages and queries of the block to ``record``, e.g. in a
+    worker thread that serves part of a request with its own connections.
+    """
+    if record is None:
+        yield
+        return
+    token = _current_record.set(record)
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(_query_timer(record)))
+            yield
+    finally:
+        _current_record.reset(token)
+
+
+def _query_timer(record):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            record.add_query(time.perf_counter() - start)
+    return wrapper
+
+
+def _max_rss_bytes():
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+# -----------------------------
+# Per request record
+# -----------------------------
+class RequestRecord:
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.view = "unresolved"
+        self.status = None
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.stages = {}
+        self.response_bytes = None
+        self.rss_delta = 0
+        self.user_id = None
+        self._start = time.perf_counter()
+        self._rss_start = _max_rss_bytes()
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.db_time += seconds
+            self.db_queries += 1
+
+    def finish(self, request, response, user=None):
+        self.duration = time.perf_counter() - self._start
+        self.rss_delta = max(0, _max_rss_bytes() - self._rss_start)
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            self.view = match.view_name or match._func_path
+        if user is None:
+            user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            self.user_id = user.pk
+        if response is not None:
+            self.status = response.status_code
+            if not response.streaming:
+                self.response_bytes = len(response.content)
+
+    def as_dict(self):
+        return {
+            "ts": time.time(),
+            "pid": os.getpid(),
+            "method": self.method,
+            "path": self.path,
+            "view": self.view,
+            "status": self.status,
+            "user_id": self.user_id,
+            "duration_ms": round(self.duration * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "db_queries": self.db_queries,
+            "stages_ms": {k: round(v * 1000, 2) for k, v in self.stages.items()},
+            "rss_delta_bytes": self.rss_delta,
+            "response_bytes": self.response_bytes,
+        }
+
+
+# -----------------------------
+# Prometheus registry
+# -----------------------------
+class MetricsRegistry:
+    """Thread-safe counters and histograms rendered as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}        # (view, method, status) -> count
+            self.duration = {}        # view -> [bucket counts..., sum, count]
+            self.db_seconds = {}      # view -> seconds
+            self.db_queries = {}      # view -> queries
+            self.stage_seconds = {}   # (view, stage) -> seconds
+            self.response_bytes = {}  # view -> bytes
+            self.rss_delta = {}       # view -> bytes
+            self.slow = {}            # view -> count
+
+    def observe(self, record, slow=False):
+        view = record.view
+        with self._lock:
+            key = (view, record.method, str(record.status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            hist = self.duration.setdefault(view, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if record.duration <= bound:
+                    hist[i] += 1
+            hist[-2] += record.duration
+            hist[-1] += 1
+
+            self.db_seconds[view] = self.db_seconds.get(view, 0.0) + record.db_time
+            self.db_queries[view] = self.db_queries.get(view, 0) + record.db_queries
+            for name, seconds in record.stages.items():
+                self.stage_seconds[(view, name)] = self.stage_seconds.get((view, name), 0.0) + seconds
+            self.response_bytes[view] = self.response_bytes.get(view, 0) + (record.response_bytes or 0)
+            self.rss_delta[view] = self.rss_delta.get(view, 0) + record.rss_delta
+            if slow:
+                self.slow[view] = self.slow.get(view, 0) + 1
+
+    def render(self):
+        pid = os.getpid()
+        out = io.StringIO()
+
+        def header(name, kind, text):
+            out.write(f"# HELP {name} {text}\n# TYPE {name} {kind}\n")
+
+        def labels(**values):
+            inner = ",".join(f'{k}="{_escape(v)}"' for k, v in values.items())
+            return "{" + inner + "}"
+
+        with self._lock:
+            header("mucp_http_requests_total", "counter", "Requests served.")
+            for (view, method, status), count in sorted(self.requests.items()):
+                out.write(f"mucp_http_requests_total{labels(pid=pid, view=view, method=method, status=status)} {count}\n")
+
+            header("mucp_http_request_duration_seconds", "histogram", "Request wall time.")
+            for view, hist in sorted(self.duration.items()):
+                for i, bound in enumerate(DURATION_BUCKETS):
+                    out.write(f"mucp_http_request_duration_seconds_bucket{labels(pid=pid, view=view, le=bound)} {hist[i]}\n")
+                out.write(f"mucp_http_request_duration_seconds_bucket{labels(pid=pid, view=view, le='+Inf')} {hist[-1]}\n")
+                out.write(f"mucp_http_request_duration_seconds_sum{labels(pid=pid, view=view)} {hist[-2]:.6f}\n")
+                out.write(f"mucp_http_request_duration_seconds_count{labels(pid=pid, view=view)} {hist[-1]}\n")
+
+            header("mucp_http_db_seconds_total", "counter", "Time spent in database queries.")
+            for view, seconds in sorted(self.db_seconds.items()):
+                out.write(f"mucp_http_db_seconds_total{labels(pid=pid, view=view)} {seconds:.6f}\n")
+
+            header("mucp_http_db_queries_total", "counter", "Database queries executed.")
+            for view, count in sorted(self.db_queries.items()):
+                out.write(f"mucp_http_db_queries_total{labels(pid=pid, view=view)} {count}\n")
+
+            header("mucp_http_stage_seconds_total", "counter", "Time spent in instrumented stages.")
+            for (view, name), seconds in sorted(self.stage_seconds.items()):
+                out.write(f"mucp_http_stage_seconds_total{labels(pid=pid, view=view, stage=name)} {seconds:.6f}\n")
+
+            header("mucp_http_response_bytes_total", "counter", "Response body bytes (non-streaming responses).")
+            for view, size in sorted(self.response_bytes.items()):
+                out.write(f"mucp_http_response_bytes_total{labels(pid=pid, view=view)} {size}\n")
+
+            header("mucp_http_rss_delta_bytes_total", "counter", "Growth of the process peak RSS attributed to requests.")
+            for view, size in sorted(self.rss_delta.items()):
+                out.write(f"mucp_http_rss_delta_bytes_total{labels(pid=pid, view=view)} {size}\n")
+
+            header("mucp_http_slow_requests_total", "counter", "Requests slower than the slow request threshold.")
+            for view, count in sorted(self.slow.items()):
+                out.write(f"mucp_http_slow_requests_total{labels(pid=pid, view=view)} {count}\n")
+
+        header("mucp_process_max_rss_bytes", "gauge", "Peak resident set size of this worker.")
+        out.write(f"mucp_process_max_rss_bytes{labels(pid=pid)} {_max_rss_bytes()}\n")
+        return out.getvalue()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+# -----------------------------
+# Profilers
+# -----------------------------
+class _CProfileCapture:
+    extension = "prof"
+
+    def __init__(self):
+        import cProfile
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def save(self, path):
+        self.profiler.dump_stats(path)
+
+
+class _PyinstrumentCapture:
+    extension = "html"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler()
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(self.profiler.output_html())
+
+
+PROFILERS = {
+    "cprofile": _CProfileCapture,
+    "pyinstrument": _PyinstrumentCapture,
+}
+
+
+def _start_profiler(name):
+    if not name:
+        return None
+    try:
+        capture = PROFILERS[name]()
+        capture.start()
+    except (KeyError, ImportError, ValueError) as e:
+        # unknown profiler, optional package missing, or another profiler is
+        # already active on this thread: just serve the request unprofiled
+        logger.debug("Profiler %r not started: %s", name, e)
+        return None
+    return capture
+
+
+# -----------------------------
+# Middleware + metrics view
+# -----------------------------
+class TelemetryMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "TELEMETRY_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, "TELEMETRY_SLOW_REQUEST_MS", 2000) / 1000.0
+        self.profiler_name = getattr(settings, "TELEMETRY_PROFILER", None)
+        self.profile_dir = getattr(settings, "TELEMETRY_PROFILE_DIR", None)
+        self.ignored_prefixes = tuple(getattr(settings, "TELEMETRY_IGNORE_PATHS", ()))
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if self.ignored_prefixes and request.path.startswith(self.ignored_prefixes):
+            return self.get_response(request)
+
+        record = RequestRecord(request)
+        profiler = _start_profiler(self.profiler_name)
+        response = None
+        try:
+            with bind(record):
+                response = self.get_response(request)
+            return response
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            record.finish(request, response)
+            self._emit(record, profiler)
+
+    async def __acall__(self, request):
+        if self.ignored_prefixes and request.path.startswith(self.ignored_prefixes):
+            return await self.get_response(request)
+
+        record = RequestRecord(request)
+        response = None
+        try:
+            # stages are timed here; queries only through concurrency.read(),
+            # the query timers installed here see this thread's connections
+            with bind(record):
+                response = await self.get_response(request)
+            return response
+        finally:
+            # request.user would hit the database synchronously here
+            user = await request.auser() if hasattr(request, "auser") else None
+            record.finish(request, response, user)
+            self._emit(record, None)
+
+    def _emit(self, record, profiler):
+        slow = record.duration >= self.slow_seconds
+        registry.observe(record, slow=slow)
+        payload = record.as_dict()
+
+        if slow and profiler is not None and self.profile_dir:
+            try:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                filename = f"{int(time.time() * 1000)}_{os.getpid()}_{record.view.replace(':', '_')}.{profiler.extension}"
+                path = os.path.join(self.profile_dir, filename)
+                profiler.save(path)
+                payload["profile"] = path
+            except OSError as e:
+                logger.warning("Could not write request profile: %s", e)
+
+        line = json.dumps(payload, default=str)
+        logger.info(line)
+        if slow:
+            slow_logger.warning(line)
+
+
+def metrics_view(request):
+    """Prometheus text exposition of this worker's request metrics."""
+    allowed_ips = getattr(settings, "TELEMETRY_METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+    user = getattr(request, "user", None)
+    is_staff = user is not None and user.is_authenticated and user.is_staff
+    if not is_staff and request.META.get("REMOTE_ADDR") not in allowed_ips:
+        return HttpResponseForbidden("Metrics are only available to staff or allowed hosts.")
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -19,9 +19,12 @@ Author: Kirodh Boodhraj
 
 """
 from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from main.telemetry import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),  # adds login, logout, password_change, etc.
@@ -34,4 +37,8 @@ urlpatterns = [
     path('support/', include('support.urls', namespace='support')),
     path('project/', include('project.urls', namespace='project')),
     path('visualization/', include('visualization.urls', namespace='visualization')),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if settings.DEBUG_TOOLBAR_ENABLED:
+    urlpatterns.append(path('__debug__/', include('debug_toolbar.urls')))
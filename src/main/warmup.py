@@ -0,0 +1,59 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Import the scientific stack, and the app modules built on it, up front.
+
+The views import these lazily so manage.py commands and worker boots stay
+cheap. A gunicorn master started with --preload (GUNICORN_PRELOAD=1 in
+start.sh sets WARMUP_IMPORTS) calls warm_up() once from wsgi.py / asgi.py.
+Every forked worker then shares the imported modules copy-on-write and does
+not pay the import on its first request.
+
+warm_up() must not open database connections or start threads: both would
+be shared by every forked worker.
+"""
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# in dependency order; a missing optional package is skipped
+WARMUP_MODULES = [
+    "numpy",
+    "pandas",
+    "shapely.geometry",
+    "pyogrio",
+    "pyarrow.parquet",
+    "geopandas",
+    "h3",
+    "matplotlib.pyplot",
+    "fpdf",
+    "project.entities",
+    "project.ingestion",
+    "project.tables",
+    "planning.simulation",
+    "visualization.results",
+    "visualization.hexagons",
+    "visualization.aggregates",
+]
+
+
+def warm_up(modules=WARMUP_MODULES):
+    """Import ``modules``, returns the seconds spent per module."""
+    import matplotlib
+    matplotlib.use("Agg")  # before pyplot: no GUI backend on the server
+
+    timings = {}
+    start = time.perf_counter()
+    for name in modules:
+        module_start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Warm-up skipped %s: %s", name, e)
+            continue
+        timings[name] = time.perf_counter() - module_start
+    logger.info("Warm-up imported %d modules in %.2fs", len(timings), time.perf_counter() - start)
+    return timings
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
 application = get_wsgi_application()
+
+# gunicorn --preload: import the scientific stack once in the master so the
+# workers share it (see main/warmup.py)
+from django.conf import settings
+
+if settings.WARMUP_IMPORTS:
+    from main.warmup import warm_up
+    warm_up()
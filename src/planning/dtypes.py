@@ -0,0 +1,99 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Memory-lean input frames for the budget engine. With SIMULATION_LEAN_INPUTS
+(off by default) load_planning_inputs trims its frames before it returns them,
+so the frames as read are not kept for the run:
+
+    geometry     dropped: the engine works on the attribute columns (ids,
+                 area, slope, walk_time, ...), maps read the geometry from
+                 the ingested artifacts
+    text         columns whose values repeat (ids, species, labels) become
+                 category
+    integers     downcast to int32 when every value fits; not smaller, the
+                 engine's arithmetic stays in the column type and would wrap
+
+Floats stay float64: float32 holds fewer digits and would change the sums
+of the run. lean_inputs reports the memory of every frame before and after.
+Whether the engine gives the same results on category columns has not been
+checked against it, hence off by default.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("mucp.simulation")
+
+# inputs (load_planning_inputs) holding frames the engine reads
+FRAME_INPUTS = [
+    "gis_mapping_data", "miu_data", "nbal_data", "compartment_data",
+    "miu_linked_species_data", "nbal_linked_species_data", "compartment_priorities_data",
+    "species",
+]
+# text columns with at most this share of distinct values become category
+CATEGORY_MAX_RATIO = 0.5
+# rough size of one geometry coordinate (two float64), pandas doesn't count them
+COORDINATE_BYTES = 16
+
+
+def frame_bytes(df):
+    """Memory of ``df`` in bytes, geometry coordinates included."""
+    size = int(df.memory_usage(index=True, deep=True).sum())
+    if hasattr(df, "geometry") and "geometry" in df.columns:
+        size += int(df.geometry.count_coordinates().sum()) * COORDINATE_BYTES
+    return size
+
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def lean_frame(df):
+    """
+    ``df`` without geometry, repeating text as category and integers as int32
+    where they fit. The columns of ``df`` itself are converted (no copy), pass
+    a copy to keep it as it is.
+    """
+    if "geometry" in df.columns:
+        df = pd.DataFrame(df.drop(columns="geometry"))
+
+    int32 = np.iinfo(np.int32)
+    for col in df.columns:
+        series = df[col]
+        if _is_text(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.dropna()
+            # mixed columns (e.g. ids read as text and numbers) are left alone
+            if len(values) and pd.api.types.infer_dtype(values, skipna=True) == "string" \
+                    and values.nunique() <= CATEGORY_MAX_RATIO * len(values):
+                df[col] = series.astype("category")
+        elif pd.api.types.is_integer_dtype(series) and series.dtype.itemsize > 4 and len(series) \
+                and int32.min <= series.min() and series.max() <= int32.max:
+            df[col] = series.astype(np.int32)
+    return df
+
+
+def lean_inputs(inputs):
+    """
+    ``inputs`` (load_planning_inputs) with trimmed frames, see lean_frame, and
+    the memory report {input: {"before", "after"}} in bytes, with a "total".
+    """
+    inputs = dict(inputs)
+    report = {}
+    for name in FRAME_INPUTS:
+        df = inputs.get(name)
+        if not isinstance(df, pd.DataFrame):
+            continue
+        before = frame_bytes(df)
+        inputs[name] = lean_frame(df)
+        report[name] = {"before": before, "after": frame_bytes(inputs[name])}
+    report["total"] = {
+        "before": sum(r["before"] for r in report.values()),
+        "after": sum(r["after"] for r in report.values()),
+    }
+    logger.info(
+        "Simulation inputs %.1f MB -> %.1f MB",
+        report["total"]["before"] / 1024 ** 2, report["total"]["after"] / 1024 ** 2,
+    )
+    return inputs, report
@@ -123,14 +123,17 @@ class CostingAssignmentForm(forms.Form):
         user = kwargs.pop("user", None)  # accept user
         super().__init__(*args, **kwargs)
 
-        for val in costing_values:
-            qs = CostingModel.objects.all()
-            if user:
-                qs = qs.filter(user=user)  # only defaults + this user
+        qs = CostingModel.objects.all()
+        if user:
+            qs = qs.filter(user=user)  # only defaults + this user
+        # one query for all the fields, they share the choice list
+        costing_models = {str(model.pk): model for model in qs.order_by("name")}
+        choices = [("", "---------")] + [(pk, str(model)) for pk, model in costing_models.items()]
 
-            self.fields[f"costing_{val}"] = forms.ModelChoiceField(
-                # queryset=CostingModel.objects.all(),
-                queryset=qs.order_by("name"),  # optional ordering, not all the users models now
+        for val in costing_values:
+            self.fields[f"costing_{val}"] = forms.TypedChoiceField(
+                choices=choices,
+                coerce=costing_models.get,  # cleaned to the CostingModel
                 required=True,
                 label=f"Assign model for costing value '{val}'",
                 initial=initial_map.get(val)  # pre-populate if available
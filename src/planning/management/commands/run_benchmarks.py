@@ -0,0 +1,319 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Benchmark the hot paths on the H60B example project (and upscaled copies).
+
+Runs against a throw-away test database and a temporary MEDIA_ROOT, so it is
+safe to run on a machine with real data:
+
+    python manage.py run_benchmarks --scales 1 10 100 --repeat 3 --output bench.json
+    python manage.py run_benchmarks --baseline main.json   # compare with another branch
+
+Startup is measured in fresh interpreters with ``-X importtime``: the boot
+every manage.py command and worker pays (settings, apps, URLconf), the boot
+of a preloaded gunicorn master (plus main/warmup.py) and ``manage.py check``.
+"""
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import geopandas as gpd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from planning.dtypes import lean_inputs
+from planning.models import Planning, PlanningCategory, PlanningCostingMapping
+from planning.simulation import load_planning_inputs, run_simulation, save_simulation_results
+from project.ingestion import run_ingestion, source_path
+from project.synthetic import build_upscaled_project, example_project_files, register_project
+from support.models import Category, ClearingNormSet, CostingModel
+from visualization.models import BudgetScenario, SimulationBudgetYear
+
+# the scientific stack the lazy imports keep out of a plain boot
+HEAVY_MODULES = ["numpy", "pandas", "geopandas", "shapely", "pyarrow", "h3", "matplotlib", "fpdf", "mucp_algorithms"]
+
+# python -c snippets run with -X importtime
+STARTUP_SNIPPETS = {
+    "boot_urlconf": "import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns",
+    "boot_warmup": ("import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns; "
+                    "from main.warmup import warm_up; warm_up()"),
+}
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+class Command(BaseCommand):
+    help = 'Benchmark project, planning and visualization endpoints on the H60B example data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 100],
+                            help='Number of tiled copies of the example catchment to benchmark (1 = H60B as shipped).')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per measurement.')
+        parser.add_argument('--years', type=int, default=10, help='Years to run in the benchmark planning.')
+        parser.add_argument('--output', default='benchmark_report.json', help='Where to write the JSON report.')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare the medians against.')
+
+    def handle(self, *args, **options):
+        # --output / --baseline paths are relative to src/
+        os.chdir(settings.BASE_DIR)
+        repeat = max(1, options['repeat'])
+
+        report = {
+            "meta": self.environment(options),
+            "results": {},
+        }
+
+        self.stdout.write("Startup:")
+        report["startup"] = self.benchmark_startup(repeat)
+
+        setup_test_environment()
+        old_db_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory(prefix="mucp_bench_") as tmp, override_settings(MEDIA_ROOT=os.path.join(tmp, "media")):
+                self.stdout.write("Loading default support data...")
+                with redirect_stdout(io.StringIO()):
+                    call_command('load_default_data')
+                user = User.objects.create_user("benchmark", password="benchmark")
+
+                for scale in options['scales']:
+                    self.stdout.write(f"Scale x{scale}:")
+                    if scale == 1:
+                        files = example_project_files()
+                    else:
+                        files = build_upscaled_project(os.path.join(tmp, f"x{scale}"), scale)
+                    report["results"][f"x{scale}"] = self.benchmark_scale(user, scale, files, repeat, options['years'])
+        finally:
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+
+        if options['baseline']:
+            self.compare(options['baseline'], report)
+
+    # -----------------------------
+    # setup
+    # -----------------------------
+    def environment(self, options):
+        def git(*args):
+            try:
+                return subprocess.run(["git", *args], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                return None
+
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git("rev-parse", "HEAD"),
+            "git_branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": connection.vendor,
+            "scales": options['scales'],
+            "repeat": options['repeat'],
+            "years": options['years'],
+        }
+
+    def create_planning(self, user, project, years):
+        planning = Planning.objects.create(
+            user=user,
+            project=project,
+            clearing_norm_model=ClearingNormSet.objects.get(name="APO Default", user=None),
+            budget_plan_1=5_000_000, budget_plan_2=10_000_000, budget_plan_3=20_000_000, budget_plan_4=40_000_000,
+            escalation_plan_1=5, escalation_plan_2=5, escalation_plan_3=5, escalation_plan_4=5,
+            start_year=datetime.now().year,
+            years_to_run=years,
+            save_results=True,
+        )
+
+        # default categories that have a column in the priorities csv
+        with open(project.compartment_priorities_csv.path, encoding='utf-8') as fh:
+            priorities_columns = {c.strip().lower() for c in fh.readline().split(",")}
+        for category in Category.objects.filter(is_default=True, user=None):
+            if category.name.lower() in priorities_columns:
+                PlanningCategory.objects.create(planning=planning, category=category)
+
+        costing_model, _ = CostingModel.objects.get_or_create(
+            user=user, name="benchmark",
+            defaults={
+                "initial_team_size": 10, "initial_cost_per_day": 2500, "followup_team_size": 8,
+                "followup_cost_per_day": 2000, "vehicle_cost_per_day": 800, "fuel_cost_per_hour": 150,
+            },
+        )
+        costing_values = gpd.read_file(source_path(project, "compartment_shp"), ignore_geometry=True)
+        costing_values.columns = costing_values.columns.str.lower()
+        for value in costing_values["costing"].dropna().unique().tolist():
+            PlanningCostingMapping.objects.create(planning=planning, costing_value=value, costing_model=costing_model)
+        return planning
+
+    # -----------------------------
+    # measurements
+    # -----------------------------
+    def measure(self, name, func, repeat, setup=None):
+        samples, queries, size, error = [], [], None, None
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                result = func()
+                samples.append(time.perf_counter() - start)
+            queries.append(len(ctx.captured_queries))
+            status = getattr(result, "status_code", None)
+            if status is not None:
+                if status != 200:
+                    error = f"HTTP {status}"
+                size = len(result.content) if not result.streaming else None
+
+        stats = {
+            "min_s": round(min(samples), 4),
+            "median_s": round(statistics.median(samples), 4),
+            "mean_s": round(statistics.fmean(samples), 4),
+            "max_s": round(max(samples), 4),
+            "queries": int(statistics.median(queries)),
+            "response_bytes": size,
+        }
+        if error:
+            stats["error"] = error
+        self.stdout.write(f"  {name:<36} median {stats['median_s']:>9.4f}s  queries {stats['queries']:>6}" + (f"  [{error}]" if error else ""))
+        return stats
+
+    # -----------------------------
+    # startup
+    # -----------------------------
+    def benchmark_startup(self, repeat):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "main.settings", "WARMUP_IMPORTS": "0"}
+        results = {}
+        for name, snippet in STARTUP_SNIPPETS.items():
+            check = f"; import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+            command = [sys.executable, "-X", "importtime", "-c", snippet + check]
+            runs = []
+            results[name] = self.measure(name, lambda: runs.append(self.run_startup(command, env)), repeat)
+            results[name].update(self.importtime_summary(runs[-1]))
+
+        command = [sys.executable, "manage.py", "check"]
+        results["manage_check"] = self.measure("manage.py check", lambda: self.run_startup(command, env), repeat)
+        return results
+
+    @staticmethod
+    def run_startup(command, env):
+        return subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+
+    @staticmethod
+    def importtime_summary(process):
+        """Total and slowest top-level imports from ``-X importtime`` output."""
+        top_level = {}
+        for line in process.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            # one space of indent marks a module imported at top level
+            if match and len(match.group(3)) == 1:
+                top_level[match.group(4)] = top_level.get(match.group(4), 0) + int(match.group(2))
+        slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:10]
+        loaded = process.stdout.strip().splitlines()[-1] if process.stdout.strip() else ""
+        return {
+            "import_total_s": round(sum(top_level.values()) / 1e6, 4),
+            "slowest_imports_s": {name: round(us / 1e6, 4) for name, us in slowest},
+            "heavy_modules_loaded": [m for m in loaded.split(",") if m],
+        }
+
+    def benchmark_scale(self, user, scale, files, repeat, years):
+        results = {}
+        project = register_project(user, f"benchmark_x{scale}", files)
+        results["ingestion"] = self.measure("ingestion", lambda: run_ingestion(project.pk), 1)
+        project.refresh_from_db()
+        planning = self.create_planning(user, project, years)
+
+        client = Client()
+        client.force_login(user)
+
+        def get(url_name, *args, **params):
+            return lambda: client.get(reverse(url_name, args=args), params)
+
+        results["project_detail"] = self.measure("project_detail", get("project:project_detail", project.pk), repeat)
+        results["planning_validation_load"] = self.measure(
+            "planning_validation (load)", get("planning:planning_validation", planning.pk), repeat,
+            setup=lambda: planning.validation_reports.all().delete(),
+        )
+        # stored validation reports reused (planning/validation.py)
+        results["planning_validation_reuse"] = self.measure("planning_validation (reuse)", get("planning:planning_validation", planning.pk), repeat)
+
+        inputs, validations = load_planning_inputs(planning, user)
+        errors = {k: v["errors"] for k, v in validations.items() if v.get("errors")}
+        if errors:
+            results["validation_errors"] = errors
+            self.stdout.write(self.style.WARNING(f"  inputs did not validate, skipping simulation: {errors}"))
+            return results
+
+        # bytes of the engine frames before / after planning/dtypes.py
+        results["input_memory"] = lean_inputs(copy.deepcopy(inputs))[1]
+
+        simulation = {}
+
+        def simulate():
+            simulation["output"] = run_simulation(copy.deepcopy(inputs))
+
+        results["simulation"] = self.measure("simulation", simulate, repeat)
+        sim_results, budgets = simulation["output"]
+
+        def clear_results():
+            BudgetScenario.objects.filter(planning=planning).delete()
+            SimulationBudgetYear.objects.filter(planning=planning).delete()
+
+        results["result_save"] = self.measure(
+            "result save", lambda: save_simulation_results(planning, sim_results, budgets), repeat, setup=clear_results,
+        )
+
+        year = min(budgets) if budgets else planning.start_year
+        for level in ("compartment", "miu", "nbal"):
+            results[f"visualization_data_{level}"] = self.measure(
+                f"visualization_data ({level})",
+                get("visualization:visualization_data", planning.pk, year=year, budget="budget_1", level=level), repeat,
+            )
+        results["visualization_timeseries"] = self.measure(
+            "visualization_timeseries", get("visualization:visualization_timeseries", planning.pk), repeat,
+        )
+        results["map_data"] = self.measure(
+            "map_data", get("visualization:map_data", planning.pk, year=year, budget="budget_1"), repeat,
+        )
+        results["visualization_pdf"] = self.measure(
+            "visualization_pdf", get("visualization:visualization_pdf", planning.pk, year, "budget_1"), repeat,
+        )
+        return results
+
+    # -----------------------------
+    # comparison
+    # -----------------------------
+    def compare(self, baseline_path, report):
+        with open(baseline_path, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        base_commit = (baseline.get("meta", {}).get("git_commit") or "?")[:10]
+        this_commit = (report["meta"].get("git_commit") or "?")[:10]
+        self.stdout.write(f"\nMedian times: baseline {base_commit} -> current {this_commit}")
+        sections = [("startup", report.get("startup", {}), baseline.get("startup", {}))]
+        sections += [(scale, measurements, baseline.get("results", {}).get(scale, {}))
+                     for scale, measurements in report["results"].items()]
+        for scale, measurements, base_measurements in sections:
+            self.stdout.write(f"Scale {scale}:")
+            for name, stats in measurements.items():
+                base = base_measurements.get(name)
+                if not isinstance(stats, dict) or "median_s" not in stats or not base or "median_s" not in base:
+                    continue
+                ratio = stats["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+                self.stdout.write(f"  {name:<36} {base['median_s']:>9.4f}s -> {stats['median_s']:>9.4f}s  (x{ratio:.2f})")
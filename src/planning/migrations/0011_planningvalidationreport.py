@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0010_alter_planning_budget_plan_1_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanningValidationReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('input', models.CharField(max_length=50)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('report', models.JSONField()),
+                ('validated_at', models.DateTimeField(auto_now=True)),
+                ('planning', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='validation_reports', to='planning.planning')),
+            ],
+            options={
+                'unique_together': {('planning', 'input')},
+            },
+        ),
+    ]
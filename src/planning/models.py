@@ -113,3 +113,17 @@ class PlanningCostingMapping(models.Model):
 
     def __str__(self):
         return f"{self.planning} - {self.costing_value} → {self.costing_model}"
+
+# validation result of one planning input, kept while its fingerprint holds (planning/validation.py)
+class PlanningValidationReport(models.Model):
+    planning = models.ForeignKey("Planning", on_delete=models.CASCADE, related_name="validation_reports")
+    input = models.CharField(max_length=50)  # e.g. miu, species, costing
+    fingerprint = models.CharField(max_length=64)  # sha256 of what the validation depends on
+    report = models.JSONField()  # {"errors": [...], "warnings": [...]}
+    validated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("planning", "input")
+
+    def __str__(self):
+        return f"{self.input} validation for {self.planning}"
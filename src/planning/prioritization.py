@@ -0,0 +1,136 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Compiled prioritisation categories. The categories chosen for a plan are
+read once into arrays and cached per category set (by a digest of their
+weights, bands and values):
+
+    numeric   sorted band edges, a value is matched with np.searchsorted
+              (low <= value <= high; on a shared edge the higher band wins)
+    text      categorical codes over the allowed values (lowercase, stripped)
+
+The engine scores the compartments itself (from read_prioritization_categories);
+the compiled model finds the compartment priorities values that match no band
+/ value of their category, which the engine silently scores 0.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+
+from support.models import Category, NumericPriorityBand, TextPriorityValue
+
+MODEL_CACHE_TIMEOUT = 24 * 3600
+
+
+def planning_categories(planning):
+    """
+    Categories of a plan flattened into plain dicts, the structure the MUCP
+    data reader takes: {"name", "weight", "type", "ranges" | "allowed"}.
+    """
+    categories = list(Category.objects.filter(planningcategory__planning=planning).order_by("pk").values(
+        "pk", "name", "weight", "category_type"
+    ))
+    ids = [c["pk"] for c in categories]
+    ranges, allowed = {}, {}
+    for category_id, low, high, priority in NumericPriorityBand.objects.filter(category_id__in=ids).order_by(
+        "range_low"
+    ).values_list("category_id", "range_low", "range_high", "priority"):
+        ranges.setdefault(category_id, []).append((low, high, priority))
+    for category_id, value, priority in TextPriorityValue.objects.filter(category_id__in=ids).order_by(
+        "text_value"
+    ).values_list("category_id", "text_value", "priority"):
+        allowed.setdefault(category_id, []).append({"value": value, "priority": priority})
+
+    flattened = []
+    for c in categories:
+        if c["category_type"] == "numeric":
+            flattened.append({"name": c["name"], "weight": c["weight"], "type": "numeric", "ranges": ranges.get(c["pk"], [])})
+        elif c["category_type"] == "text":
+            flattened.append({"name": c["name"], "weight": c["weight"], "type": "text", "allowed": allowed.get(c["pk"], [])})
+    return flattened
+
+
+def _normalize(values):
+    return pd.Series(values, dtype="object").astype("string").str.strip().str.lower()
+
+
+def compile_categories(categories):
+    """Arrays for matching values from flattened ``categories`` (see planning_categories)."""
+    compiled = []
+    for category in categories:
+        entry = {"name": category["name"], "type": category["type"]}
+        if category["type"] == "numeric":
+            bands = sorted(category["ranges"], key=lambda band: (band[0], band[1]))
+            entry["low"] = np.array([band[0] for band in bands], dtype=np.float64)
+            entry["high"] = np.array([band[1] for band in bands], dtype=np.float64)
+        else:
+            entry["values"] = pd.Index(_normalize([a["value"] for a in category["allowed"]]).unique())
+        compiled.append(entry)
+    return {"categories": compiled}
+
+
+def category_digest(categories):
+    return hashlib.sha1(json.dumps(categories, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def prioritization_model(categories):
+    """compile_categories(``categories``), cached per category set."""
+    key = f"prioritization:{category_digest(categories)}"
+    model = cache.get(key)
+    if model is None:
+        model = compile_categories(categories)
+        cache.set(key, model, MODEL_CACHE_TIMEOUT)
+    return model
+
+
+def _numeric_matches(entry, column):
+    values = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    if not len(entry["low"]):
+        return np.zeros(len(values), dtype=bool)
+    band = np.searchsorted(entry["low"], values, side="right") - 1
+    return (band >= 0) & (values <= entry["high"][np.maximum(band, 0)])
+
+
+def _text_matches(entry, column):
+    if not len(entry["values"]):
+        return np.zeros(len(column), dtype=bool)
+    return entry["values"].get_indexer(_normalize(column.to_numpy()).to_numpy(dtype=object, na_value=None)) >= 0
+
+
+def _category_columns(model, priorities):
+    """(category index, entry, column of ``priorities`` or None) per category."""
+    columns = {str(c).strip().lower(): c for c in priorities.columns}
+    return [(j, entry, columns.get(entry["name"].strip().lower())) for j, entry in enumerate(model["categories"])]
+
+
+def matched_values(model, priorities):
+    """Mask of the cells of ``priorities`` (rows) per category (columns) whose value matched a band / value."""
+    matched = np.zeros((len(priorities), len(model["categories"])), dtype=bool)
+    for j, entry, column in _category_columns(model, priorities):
+        if column is None:
+            continue
+        match = _numeric_matches if entry["type"] == "numeric" else _text_matches
+        matched[:, j] = match(entry, priorities[column])
+    return matched
+
+
+def unmatched_warnings(model, priorities, sample=5):
+    """Warnings for values in the table that match no band / value of their category."""
+    matched = matched_values(model, priorities)
+    warnings = []
+    for j, entry, column in _category_columns(model, priorities):
+        if column is None:
+            continue
+        values = priorities[column]
+        unmatched = values[values.notna().to_numpy() & ~matched[:, j]]
+        if len(unmatched):
+            examples = ", ".join(str(v) for v in pd.unique(unmatched.to_numpy(dtype=object))[:sample])
+            warnings.append(
+                f"Category '{entry['name']}': {len(unmatched)} compartment value(s) match no priority "
+                f"{'band' if entry['type'] == 'numeric' else 'value'} and score 0, e.g. {examples}"
+            )
+    return warnings
@@ -0,0 +1,335 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Simulation pipeline for a planning: load + validate the inputs, run the MUCP
+budget engine and save the results. Split out of planning_validation so the
+stages can be run (and timed) on their own, e.g. by the benchmark command.
+"""
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from mucp_algorithms import support_data_reader
+from mucp_algorithms.algorithms.compartment_cost import calculate_budgets as mucp_calculate_budgets
+
+from main import telemetry
+from project.entities import ID_COLUMNS, ensure_entities
+from project.ingestion import LAYERS, read_ingested_inputs, read_project_inputs
+from support.models import GrowthForm, TreatmentMethod, Species
+from support.norms import cached_norm_frame
+from planning.dtypes import lean_inputs
+from planning.models import PlanningCostingMapping
+from planning.prioritization import planning_categories, prioritization_model, unmatched_warnings
+from visualization.models import BudgetScenario, YearlyResult, SimulationRow, SimulationBudgetYear
+from visualization.aggregates import precompute_aggregates
+from visualization.results import delta_rows, result_state
+
+# order of the result list returned by the engine
+SCENARIO_ORDER = ["optimal", "budget_1", "budget_2", "budget_3", "budget_4"]
+
+# order of the positional planning variables returned by read_planning_variables
+PLANNING_VARIABLES = [
+    "budget_plan_1", "budget_plan_2", "budget_plan_3", "budget_plan_4",
+    "escalation_plan_1", "escalation_plan_2", "escalation_plan_3", "escalation_plan_4",
+    "standard_working_day", "standard_working_year_days", "start_year", "years_to_run",
+    "currency", "save_results",
+]
+
+COSTING_HEADERS = ["Costing Model Name", "Initial Team Size", "Initial Cost/Day", "Follow-up Team Size", "Follow-up Cost/Day", "Vehicle Cost/Day", "Fuel Cost/Hour", "Maintenance Level", "Cost/Day"]
+
+
+# helper functions:
+def is_data_valid(validation_result: dict) -> bool:
+    """Check if validation result has no errors or warnings."""
+    return not validation_result.get("errors")
+
+def load_planning_inputs(planning, user, validations=None):
+    """
+    Read and validate every input the engine needs for ``planning``.
+    ``validations`` are results kept from an earlier run by input name
+    (planning/validation.py); those inputs are read without validating them
+    again.
+
+    Returns ``(inputs, validations)``: ``inputs`` holds the engine arguments by
+    name, ``validations`` maps each input name to its {"errors", "warnings"}.
+    """
+    project = planning.project
+    validations = dict(validations or {})
+
+    def validate(name, reader, *args, **kwargs):
+        if name not in validations:
+            validations[name] = reader(*args, validate=True, **kwargs)
+
+    # -----------------------------
+    # 0. Read the user files: the attribute columns of the ingested artifacts
+    #    and their stored validations, the uploads until the project is ready
+    # -----------------------------
+    with telemetry.stage("inputs.project_files"):
+        ingested = read_ingested_inputs(project)
+        if ingested is not None:
+            project_data, project_validations = ingested
+        else:
+            kept = {name: validations[name] for name in LAYERS if name in validations}
+            project_data, project_validations = read_project_inputs(project, kept if len(kept) == len(LAYERS) else None)
+    validations.update(project_validations)
+    gis_mapping_data = project_data["gis_mapping"]
+    miu_data = project_data["miu"]
+    nbal_data = project_data["nbal"]
+    compartment_data = project_data["compartment"]
+    miu_linked_species_data = project_data["miu_linked_species"]
+    nbal_linked_species_data = project_data["nbal_linked_species"]
+    compartment_priorities_data = project_data["compartment_priorities"]
+
+    # -----------------------------
+    # 2. Get and validate user support data
+    # -----------------------------
+    #--- growth form
+    growth_forms = GrowthForm.objects.filter(
+        Q(user=user) | Q(user__isnull=True)
+    ).values_list("growth_form", flat=True).distinct()
+    growth_forms = list(growth_forms)
+
+    #--- treatment method
+    treatment_method = TreatmentMethod.objects.filter(
+        Q(user=user) | Q(user__isnull=True)
+    ).values_list("treatment_method", flat=True).distinct()
+    treatment_method = list(treatment_method)
+
+    #--- species
+    # 1. User species
+    user_species_qs = Species.objects.filter(user=user).select_related("growth_form").prefetch_related("treatment_methods")
+
+    # 2. Default species not overridden by user
+    default_species_qs = Species.objects.filter(
+        user__isnull=True
+    ).exclude(
+        species_name__in=user_species_qs.values_list("species_name", flat=True)
+    ).select_related("growth_form").prefetch_related("treatment_methods")
+
+    # 3. Merge
+    species_qs = user_species_qs.union(default_species_qs)
+
+    species = pd.DataFrame.from_records(species_qs.values())
+
+    # 1) Rename the FK column
+    species.rename(columns={"growth_form_id": "growth_form"}, inplace=True)
+
+    # 2) Build an ID->name lookup from the ORM
+    gf_lookup = dict(GrowthForm.objects.values_list("id", "growth_form"))
+
+    # 3) Replace IDs with the actual growth_form text using a lambda
+    species["growth_form"] = species["growth_form"].apply(
+        lambda v: gf_lookup.get(int(v)) if pd.notna(v) and str(v).strip() != "" else None
+    )
+
+    #--- herbicides (not in algorithms yet)
+
+    #--- clearing norms
+    # read once per norm set version (support/norms.py)
+    clearing_norms = cached_norm_frame(planning.clearing_norm_model).copy()
+
+    #--- prioritization model
+    # flatten so we dont use django queries in the data reader, makes for uniform data structures
+    categories = planning_categories(planning)
+
+    # open and validate all the support data here
+    # growth form validate (use list (growth_form) above for data)
+    validate("growth_forms", support_data_reader.read_growth_form, growth_forms,clearing_norms["growth_form"].tolist(), species["growth_form"].tolist())
+
+    # treatment method validate (use list (treatment_method) above for data)
+    validate("treatment_methods", support_data_reader.read_treatment_methods, treatment_method,clearing_norms["treatment_method"].tolist())
+
+    # species validate and data
+    validate("species", support_data_reader.read_species, species,miu_linked_species_data["species"].tolist(), nbal_linked_species_data["species"].tolist())
+    if is_data_valid(validations["species"]):
+        species = support_data_reader.read_species(species,miu_linked_species_data["species"].tolist(), nbal_linked_species_data["species"].tolist(), validate=False)
+
+    # clearing norms validate and data
+    clearing_norms_df = None
+    validate("clearing_norms", support_data_reader.read_clearing_norms, clearing_norms, miu_linked_species_data["age"].tolist(), nbal_linked_species_data["age"].tolist(), species["growth_form"].tolist())
+    if is_data_valid(validations["clearing_norms"]):
+        clearing_norms_df = support_data_reader.read_clearing_norms(clearing_norms, miu_linked_species_data["age"].tolist(), nbal_linked_species_data["age"].tolist(), species["growth_form"].tolist(), validate=False)
+
+    validated = "prioritization_model" not in validations
+    validate("prioritization_model", support_data_reader.read_prioritization_categories, compartment_priorities_data, categories, headers_required=["compt_id"])
+    if is_data_valid(validations["prioritization_model"]):
+        prioritization_model_data = support_data_reader.read_prioritization_categories(compartment_priorities_data, categories, validate=False, headers_required=["compt_id"])
+        if validated:
+            # compiled once per category set (planning/prioritization.py), the engine does the scoring
+            validations["prioritization_model"].setdefault("warnings", []).extend(
+                unmatched_warnings(prioritization_model(categories), compartment_priorities_data)
+            )
+    else:
+        prioritization_model_data = None
+
+    # --- costing model (after the form)
+    existing_mappings = PlanningCostingMapping.objects.filter(planning=planning).select_related("costing_model")
+    # mappings that are for the cost model to the options in the compartment shp
+    costing_model_mappings = {m.costing_value: m.costing_model for m in existing_mappings}
+    # use the following with the mucp engine as it doesnt understand the query objects but only names
+    costing_model_mappings_mucp_use = {int(m.costing_value): m.costing_model.name for m in existing_mappings}
+    # int needed because it used it as string so the cost didnt go through to the algorithms and merge properly into the master df, all nans basically
+
+    # Build records for DataFrame
+    records = []
+    for obj in costing_model_mappings.values():
+        records.append({
+            "Costing Model Name": obj.name,
+            "Initial Team Size": obj.initial_team_size,
+            "Initial Cost/Day": obj.initial_cost_per_day,
+            "Follow-up Team Size": obj.followup_team_size,
+            "Follow-up Cost/Day": obj.followup_cost_per_day,
+            "Vehicle Cost/Day": obj.vehicle_cost_per_day,
+            "Fuel Cost/Hour": obj.fuel_cost_per_hour,
+            "Maintenance Level": obj.maintenance_level,
+            "Cost/Day": obj.total_cost_per_day,  # uses your property
+        })
+
+    costing_before_validation = pd.DataFrame(records)
+    validate("costing", support_data_reader.read_costing_model, costing_before_validation, required_headers = COSTING_HEADERS)
+    if is_data_valid(validations["costing"]):
+        costing_data = support_data_reader.read_costing_model(costing_before_validation, required_headers = COSTING_HEADERS, validate = False)
+    else:
+        costing_data = None
+
+    planning_values = [getattr(planning, name) for name in PLANNING_VARIABLES]
+    validate("planning", support_data_reader.read_planning_variables, *planning_values)
+    if is_data_valid(validations["planning"]):
+        planning_variables = dict(zip(PLANNING_VARIABLES, support_data_reader.read_planning_variables(*planning_values, validate = False)))
+    else:
+        planning_variables = dict.fromkeys(PLANNING_VARIABLES)
+
+    inputs = {
+        "gis_mapping_data": gis_mapping_data,
+        "miu_data": miu_data,
+        "nbal_data": nbal_data,
+        "compartment_data": compartment_data,
+        "miu_linked_species_data": miu_linked_species_data,
+        "nbal_linked_species_data": nbal_linked_species_data,
+        "compartment_priorities_data": compartment_priorities_data,
+        "growth_forms": growth_forms,
+        "treatment_method": treatment_method,
+        "clearing_norms_df": clearing_norms_df,
+        "species": species,
+        "costing_data": costing_data,
+        "planning_variables": planning_variables,
+        "costing_model_mappings": costing_model_mappings_mucp_use,
+        "categories": categories,
+        "prioritization_model_data": prioritization_model_data,
+    }
+    if settings.SIMULATION_LEAN_INPUTS:
+        # smaller frames, no geometry (planning/dtypes.py); only the trimmed
+        # frames outlive this function
+        with telemetry.stage("inputs.lean"):
+            inputs, _ = lean_inputs(inputs)
+    return inputs, validations
+
+
+def run_simulation(inputs):
+    """Run the MUCP budget engine on the output of load_planning_inputs."""
+    p = inputs["planning_variables"]
+    with telemetry.stage("mucp.calculate_budgets"):
+        return mucp_calculate_budgets(
+            inputs["gis_mapping_data"], inputs["miu_data"], inputs["nbal_data"], inputs["compartment_data"],
+            inputs["miu_linked_species_data"], inputs["nbal_linked_species_data"], inputs["compartment_priorities_data"],
+            inputs["growth_forms"], inputs["treatment_method"], inputs["clearing_norms_df"], inputs["species"], inputs["costing_data"],
+            p["budget_plan_1"], p["budget_plan_2"], p["budget_plan_3"], p["budget_plan_4"],
+            p["escalation_plan_1"], p["escalation_plan_2"], p["escalation_plan_3"], p["escalation_plan_4"],
+            p["standard_working_day"], p["standard_working_year_days"], p["start_year"], p["years_to_run"],
+            p["currency"], p["save_results"],
+            inputs["costing_model_mappings"], inputs["categories"], inputs["prioritization_model_data"],
+        )
+
+
+def result_entity_keys(project, results):
+    """
+    Entity keys of the rows of every scenario/year of ``results``, as
+    {(scenario index, year): keys}. The ids of the whole run are resolved
+    (and new entities created) in one go.
+    """
+    parts, ids = [], []
+    for scenario_idx, scenario_data in enumerate(results):
+        for year, year_rows in scenario_data.items():
+            columns = [c for c in year_rows.columns if c.lower() in ID_COLUMNS]
+            parts.append(((scenario_idx, year), len(year_rows)))
+            ids.append(year_rows[columns].rename(columns=str.lower))
+    if not ids:
+        return {}
+    keys = ensure_entities(project, pd.concat(ids, ignore_index=True))
+    bounds = np.cumsum([0] + [length for _, length in parts])
+    return {part: keys[bounds[i]:bounds[i + 1]] for i, (part, _) in enumerate(parts)}
+
+
+def save_simulation_results(planning, results, budgets):
+    """Persist the propagated budgets and every scenario/year row of a run."""
+    with telemetry.stage("results.save"), transaction.atomic():
+        # --- Save yearly propagated budgets ---
+        for year, budget_values in budgets.items():
+            SimulationBudgetYear.objects.update_or_create(
+                planning=planning,
+                year=year,
+                defaults={
+                    "plan_1": budget_values.get("plan_1", 0),
+                    "plan_2": budget_values.get("plan_2", 0),
+                    "plan_3": budget_values.get("plan_3", 0),
+                    "plan_4": budget_values.get("plan_4", 0),
+                },
+            )
+
+        # --- Save yearly simulation rows ---
+        # every RESULT_KEYFRAME_INTERVAL-th year keeps all rows, the years in
+        # between only the rows that changed (see visualization/results.py)
+        interval = max(settings.RESULT_KEYFRAME_INTERVAL, 1)
+        # rows reference the project's entity dictionary by integer key
+        entity_keys = result_entity_keys(planning.project, results)
+        for scenario_idx, scenario_data in enumerate(results):
+            scenario_name = SCENARIO_ORDER[scenario_idx]  # map list index to scenario name
+
+            previous = None
+            for position, year in enumerate(sorted(scenario_data)):
+                year_rows = scenario_data[year]
+                current = result_state(entity_keys[scenario_idx, year], year_rows)
+                is_keyframe = previous is None or position % interval == 0
+                stored = current.assign(removed=False) if is_keyframe else delta_rows(previous, current)
+                previous = current
+
+                # BudgetScenario + YearlyResult are lightweight, fine with get_or_create
+                budget_scenario, _ = BudgetScenario.objects.get_or_create(
+                    planning=planning,
+                    name=scenario_name,
+                )
+                yearly_result, _ = YearlyResult.objects.update_or_create(
+                    budget=budget_scenario,
+                    year=year,
+                    defaults={"is_keyframe": is_keyframe},
+                )
+
+                # --- Collect SimulationRows ---
+                row_objects = []
+                for row in stored.reset_index().itertuples(index=False):
+                    row_objects.append(
+                        SimulationRow(
+                            yearly_result=yearly_result,
+                            entity_key=int(row.entity_key),
+                            occurrence=int(row.occurrence),
+                            removed=bool(row.removed),
+                            person_days=row.person_days,
+                            cost=None if pd.isna(row.cost) else row.cost, # production
+                            density=row.density,
+                            flow=row.flow,
+                            priority=None if pd.isna(row.priority) else row.priority,
+                            cleared_now=bool(row.cleared_now),
+                            cleared_fully=bool(row.cleared_fully),
+                        )
+                    )
+
+                # --- Bulk insert in one query ---
+                SimulationRow.objects.bulk_create(row_objects, batch_size=1000)
+
+    # per-compartment aggregates for the comparison view
+    with telemetry.stage("results.aggregates"):
+        precompute_aggregates(planning)
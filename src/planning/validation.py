@@ -0,0 +1,125 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Validation results of a planning kept between visits of the validation page.
+Every input of load_planning_inputs gets a fingerprint: a digest of the data
+its validation depends on,
+
+    files        digests of the project files (project/storage.py)
+    growth_forms, treatment_methods, species
+                 the support data the user sees
+    norms        clearing norm set and its version (support/norms.py)
+    categories   the prioritization categories of the planning
+    costing      the costing mappings and their costing models
+    planning     the planning variables
+
+The reports (PlanningValidationReport) of inputs whose fingerprint is
+unchanged are reused as they are; only the others are validated again.
+Working out the fingerprints takes a few small queries and no file reads.
+"""
+import hashlib
+import json
+
+from django.db.models import Q, Sum
+
+from project.ingestion import LAYERS
+from project.storage import source_keys
+from support.models import GrowthForm, Species, TreatmentMethod
+from planning.models import PlanningCostingMapping, PlanningValidationReport
+from planning.prioritization import planning_categories
+from planning.simulation import PLANNING_VARIABLES, load_planning_inputs
+
+# bump to validate everything again, e.g. when the validators change
+REPORT_VERSION = 1
+
+# input -> the data its validation depends on
+DEPENDENCIES = {
+    **{layer: ["files"] for layer in LAYERS},
+    "growth_forms": ["growth_forms", "norms", "species"],
+    "treatment_methods": ["treatment_methods", "norms"],
+    "species": ["species", "files"],
+    "clearing_norms": ["norms", "growth_forms", "treatment_methods", "species", "files"],
+    "prioritization_model": ["categories", "files"],
+    "costing": ["costing"],
+    "planning": ["planning"],
+}
+
+
+def _names(model, field, user):
+    return sorted(model.objects.filter(Q(user=user) | Q(user__isnull=True)).values_list(field, flat=True).distinct())
+
+
+def _costing(planning):
+    return list(PlanningCostingMapping.objects.filter(planning=planning).annotate(
+        daily_items_cost=Sum("costing_model__daily_cost_items__daily_item_cost"),
+    ).order_by("costing_value").values_list(
+        "costing_value", "costing_model__name", "costing_model__initial_team_size",
+        "costing_model__initial_cost_per_day", "costing_model__followup_team_size",
+        "costing_model__followup_cost_per_day", "costing_model__vehicle_cost_per_day",
+        "costing_model__fuel_cost_per_hour", "costing_model__maintenance_level", "daily_items_cost",
+    ))
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def fingerprints(planning, user):
+    """Input name -> fingerprint of the data its validation depends on."""
+    norm_set = planning.clearing_norm_model
+    parts = {
+        "files": source_keys(planning.project),
+        "growth_forms": _names(GrowthForm, "growth_form", user),
+        "treatment_methods": _names(TreatmentMethod, "treatment_method", user),
+        "species": list(Species.objects.filter(Q(user=user) | Q(user__isnull=True)).order_by("pk").values_list(
+            *[field.attname for field in Species._meta.concrete_fields], "growth_form__growth_form",
+        )),
+        "norms": [norm_set.pk, norm_set.version],
+        "categories": planning_categories(planning),
+        "costing": _costing(planning),
+        "planning": [getattr(planning, name) for name in PLANNING_VARIABLES],
+    }
+    digests = {name: _digest(value) for name, value in parts.items()}
+    return {
+        name: _digest([REPORT_VERSION, name, [digests[part] for part in depends_on]])
+        for name, depends_on in DEPENDENCIES.items()
+    }
+
+
+def kept_reports(planning, prints):
+    """Stored reports of ``planning`` whose fingerprint matches ``prints``."""
+    return {
+        report.input: report.report
+        for report in planning.validation_reports.all()
+        if prints.get(report.input) == report.fingerprint
+    }
+
+
+def save_reports(planning, prints, validations, kept):
+    """Store the validations that were not in ``kept``."""
+    for name, result in validations.items():
+        if name in kept or name not in prints:
+            continue
+        PlanningValidationReport.objects.update_or_create(
+            planning=planning, input=name,
+            # stored as JSON, like the ingestion manifest
+            defaults={"fingerprint": prints[name], "report": json.loads(json.dumps(result, default=str))},
+        )
+
+
+def planning_validations(planning, user, load=False):
+    """
+    Validation results of every input of ``planning``, reusing the stored
+    reports that are still current. Returns ``(inputs, validations)``;
+    ``inputs`` (load_planning_inputs) is None when every report was reused
+    and ``load`` is false, nothing is read then.
+    """
+    prints = fingerprints(planning, user)
+    kept = kept_reports(planning, prints)
+    if not load and len(kept) == len(prints):
+        return None, kept
+
+    inputs, validations = load_planning_inputs(planning, user, kept)
+    save_reports(planning, prints, validations, kept)
+    return inputs, validations
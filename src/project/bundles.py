@@ -0,0 +1,98 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Project files uploaded as one ZIP (like MUCP_example_files.zip) instead of
+one input per file. Members are matched to the project fields by name and
+extension:
+
+    *gis_mapping*.shp/.shx/.prj/.dbf   gis_mapping_<part>   (also .cpg/.sbn/.sbx)
+    *compartment*.<part>               compartment_<part>
+    *miu*.<part> / *nbal*.<part>       miu_<part> / nbal_<part>
+    *.csv                              compartment_priorities_csv
+    *miu*.xls(x) / *nbal*.xls(x)       miu/nbal_linked_species_excel
+
+Other members (.shp.xml metadata, folders, __MACOSX) are ignored. Members
+are streamed straight from the archive into the content store
+(project/storage.py), so neither the archive nor a member is held in memory.
+"""
+import os
+import zipfile
+
+from django.conf import settings
+
+from .storage import SHAPEFILE_PARTS, SIDECAR_PARTS, store
+
+# checked in this order, "compartment" also matches the priorities csv name
+SHAPEFILE_LAYERS = [
+    ("gis_mapping", ("gis_mapping", "gis mapping", "gismapping")),
+    ("compartment", ("compartment",)),
+    ("miu", ("miu",)),
+    ("nbal", ("nbal",)),
+]
+CHUNK_SIZE = 1024 * 1024
+
+
+def _layer(name):
+    lowered = name.lower()
+    for layer, keywords in SHAPEFILE_LAYERS:
+        if any(keyword in lowered for keyword in keywords):
+            return layer
+    return None
+
+
+def _field(filename):
+    """Project field for a member file name, None if it is not a project file."""
+    stem, ext = os.path.splitext(filename)
+    ext = ext.lower().lstrip(".")
+    if ext in SHAPEFILE_PARTS or ext in SIDECAR_PARTS:
+        layer = _layer(stem)
+        return f"{layer}_{ext}" if layer else None
+    if ext == "csv":
+        return "compartment_priorities_csv"
+    if ext in ("xls", "xlsx"):
+        layer = _layer(stem)
+        return f"{layer}_linked_species_excel" if layer in ("miu", "nbal") else None
+    return None
+
+
+def bundle_members(file):
+    """
+    Project field -> ZipInfo for the members of an uploaded ZIP. Raises
+    ValueError when the archive can't be read or a field matches twice.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not a valid ZIP archive: {e}")
+
+    members = {}
+    total = 0
+    with archive:
+        infos = archive.infolist()
+    for info in infos:
+        filename = os.path.basename(info.filename)
+        if info.is_dir() or not filename or filename.startswith(".") or "__MACOSX" in info.filename:
+            continue
+        field = _field(filename)
+        if field is None:
+            continue
+        if field in members:
+            raise ValueError(f"Both {members[field].filename} and {info.filename} in the ZIP match {field}.")
+        members[field] = info
+        total += info.file_size
+
+    if total > settings.PROJECT_BUNDLE_MAX_SIZE:
+        raise ValueError(f"The ZIP unpacks to {total / 1e6:.0f} MB, more than the {settings.PROJECT_BUNDLE_MAX_SIZE / 1e6:.0f} MB allowed.")
+    return members
+
+
+def extract_members(file, members):
+    """Stream ``members`` (from bundle_members) into the store: field -> blob name."""
+    names = {}
+    with zipfile.ZipFile(file) as archive:
+        for field, info in members.items():
+            with archive.open(info) as fh:
+                names[field] = store(settings.MEDIA_ROOT, iter(lambda: fh.read(CHUNK_SIZE), b""),
+                                     os.path.splitext(info.filename)[1])
+    return names
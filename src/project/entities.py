@@ -0,0 +1,136 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Per-project entity dictionary: every (compt_id, miu_id, nbal_id) triple of a
+project gets a dense integer key (0, 1, 2, ...), built from the GIS mapping at
+ingestion and extended when the engine returns a triple we have not seen.
+
+Simulation rows store only the key. Lookups compare normalised ids
+(lowercase, stripped, blanks as None) so "C_H60B400299 " and "c_h60b400299"
+are the same entity; the entity keeps the spelling it was first seen with.
+The index (arrays by key) is kept in a small per process LRU keyed by the
+project and its number of entities, which only ever grows.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from .models import Project, ProjectEntity
+
+ID_COLUMNS = ["compt_id", "miu_id", "nbal_id"]
+
+# indexes of the projects used last, per process
+ENTITY_INDEX_CACHE_SIZE = 16
+
+
+def normalize_id(values):
+    """Lowercase/strip ids; blanks and "nan" become None."""
+    values = pd.Series(values, dtype="object").astype("string").str.lower().str.strip()
+    values = values.mask(values.isin(["", "nan", "none"]))
+    return values.astype(object).where(values.notna(), None)
+
+
+def normalized_triples(df):
+    """DataFrame of the normalised id columns of ``df`` (missing columns -> None)."""
+    columns = {col.lower(): col for col in df.columns}
+    return pd.DataFrame({
+        col: normalize_id(df[columns[col]]).to_numpy() if col in columns else [None] * len(df)
+        for col in ID_COLUMNS
+    })
+
+
+def _build_index(project_id, entities):
+    keys = np.asarray([e[0] for e in entities], dtype=np.int64)
+    size = int(keys.max()) + 1 if len(keys) else 0
+    index = {"project_id": project_id, "size": size}
+    for i, col in enumerate(ID_COLUMNS, start=1):
+        values = np.full(size, None, dtype=object)
+        values[keys] = [e[i] for e in entities]
+        index[col] = values
+
+    norm = normalized_triples(pd.DataFrame({col: index[col] for col in ID_COLUMNS}))
+    norm["key"] = np.arange(size)
+    # unused keys (gaps) have no ids; duplicates can't match twice
+    index["normalized"] = norm[np.isin(norm["key"], keys)].drop_duplicates(ID_COLUMNS)
+
+    # group codes per key for compartment / MIU level aggregation
+    index["compt_code"], _ = pd.factorize(norm["compt_id"], use_na_sentinel=False)
+    index["miu_code"], _ = pd.factorize(norm["compt_id"].astype(str) + "\x1f" + norm["miu_id"].astype(str), use_na_sentinel=False)
+    return index
+
+
+@lru_cache(maxsize=ENTITY_INDEX_CACHE_SIZE)
+def _cached_index(project_id, count):
+    entities = list(ProjectEntity.objects.filter(project_id=project_id).values_list("key", *ID_COLUMNS))
+    return _build_index(project_id, entities)
+
+
+def entity_index(project):
+    """Arrays by entity key for ``project`` (ids, normalised ids, level codes)."""
+    # entities are never removed, a new count means new entities
+    return _cached_index(project.pk, ProjectEntity.objects.filter(project=project).count())
+
+
+def lookup_keys(index, df):
+    """Entity key of every row of ``df`` (by its id columns), -1 if unknown."""
+    triples = normalized_triples(df)
+    if not index["size"]:
+        return np.full(len(df), -1, dtype=np.int64)
+    # pandas merges None with None, which is what we want for missing ids
+    merged = triples.merge(index["normalized"], on=ID_COLUMNS, how="left", sort=False)
+    return merged["key"].fillna(-1).to_numpy(dtype=np.int64)
+
+
+def ensure_entities(project, df):
+    """Entity keys for the rows of ``df``, creating entities for new triples."""
+    index = entity_index(project)
+    keys = lookup_keys(index, df)
+    missing = keys < 0
+    if not missing.any():
+        return keys
+
+    with transaction.atomic():
+        # serialise key allocation per project
+        Project.objects.select_for_update().filter(pk=project.pk).first()
+        index = entity_index(project)
+        keys = lookup_keys(index, df)
+        missing = keys < 0
+        if missing.any():
+            originals = df.loc[missing, [c for c in df.columns if c.lower() in ID_COLUMNS]].copy()
+            originals.columns = [c.lower() for c in originals.columns]
+            originals = originals.reindex(columns=ID_COLUMNS)
+            new = normalized_triples(originals)
+            new["row"] = np.arange(len(new))
+            first_rows = new.drop_duplicates(ID_COLUMNS)["row"].to_numpy()
+
+            next_key = index["size"]
+            entities = []
+            for offset, row in enumerate(first_rows):
+                values = [None if pd.isna(v) else str(v).strip() for v in originals.iloc[row]]
+                entities.append(ProjectEntity(project=project, key=next_key + offset,
+                                              compt_id=values[0], miu_id=values[1], nbal_id=values[2]))
+            ProjectEntity.objects.bulk_create(entities, batch_size=5000)
+            keys = lookup_keys(entity_index(project), df)
+    return keys
+
+
+def build_entities(project, gis_mapping):
+    """Register every triple of the GIS mapping (called at ingestion)."""
+    ensure_entities(project, gis_mapping)
+    return entity_index(project)
+
+
+def fallback_keys(index, df):
+    """
+    Keys to match features against results the way the map always has:
+    (compt, miu, nbal), then (compt, miu, None), then (compt, None, None).
+    Returns three arrays, -1 where that entity does not exist.
+    """
+    triples = normalized_triples(df)
+    exact = lookup_keys(index, triples)
+    miu_only = lookup_keys(index, triples.assign(nbal_id=None))
+    compt_only = lookup_keys(index, triples.assign(miu_id=None, nbal_id=None))
+    return exact, miu_only, compt_only
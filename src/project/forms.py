@@ -6,18 +6,49 @@ Author: Kirodh Boodhraj
 import os
 from django import forms
 from .models import Project
+from .bundles import bundle_members, extract_members
 from django.core.exceptions import ValidationError
 
 
 # project form
 class ProjectForm(forms.ModelForm):
+    # all files in one ZIP instead of one input per file (see project/bundles.py),
+    # files chosen one by one take precedence over the ZIP
+    bundle = forms.FileField(required=False)
+
     class Meta:
         model = Project
-        exclude = ['user', 'created_at']
+        exclude = ['user', 'created_at', 'status', 'status_message', 'ingested_at', 'status_changed_at', 'upload_names']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # required files may come from the ZIP, clean() checks them
+        for field in self.fields.values():
+            if isinstance(field, forms.FileField):
+                field.required = False
+        self.bundle_members = {}
 
     def clean(self):
         cleaned_data = super().clean()
 
+        bundle = cleaned_data.get('bundle')
+        if bundle:
+            if not bundle.name.lower().endswith('.zip'):
+                raise ValidationError("The project bundle must be a .zip file")
+            try:
+                members = bundle_members(bundle)
+            except ValueError as e:
+                raise ValidationError(str(e))
+            self.bundle_members = {field: info for field, info in members.items() if not cleaned_data.get(field)}
+
+        def file_name(field_name):
+            file = cleaned_data.get(field_name)
+            if file:
+                return file.name
+            if field_name in self.bundle_members:
+                return os.path.basename(self.bundle_members[field_name].filename)
+            return None
+
         # Define file groups and required extensions
         shapefile_groups = {
             "Compartments": ['compartment_shp', 'compartment_shx', 'compartment_prj', 'compartment_dbf'],
@@ -31,13 +62,19 @@ class ProjectForm(forms.ModelForm):
         for group_name, fields in shapefile_groups.items():
             base_names = set()
             for field_name in fields:
-                file = cleaned_data.get(field_name)
-                if not file:
+                name = file_name(field_name)
+                if not name:
                     raise ValidationError(f"{group_name}: missing required file {field_name}")
-                name_without_ext = os.path.splitext(file.name)[0]
-                base_names.add(name_without_ext)
+                base_names.add(os.path.splitext(name)[0])
+
+            # optional .cpg/.sbn/.sbx belong to the same shapefile
+            layer = fields[0][:-len('_shp')]
+            for part in ('cpg', 'sbn', 'sbx'):
+                name = file_name(f"{layer}_{part}")
+                if name:
+                    base_names.add(os.path.splitext(name)[0])
 
-            # Check all four files in group have same base name
+            # Check all files in group have same base name
             if len(base_names) != 1:
                 raise ValidationError(
                     f"{group_name}: all files must have the same base name, e.g. miu.shp, miu.shx, miu.prj, miu.dbf"
@@ -55,17 +92,30 @@ class ProjectForm(forms.ModelForm):
             seen_names.add(base_name)
 
         # Validate CSV/Excel files
-        csv_file = cleaned_data.get('compartment_priorities_csv')
-        if csv_file and not csv_file.name.lower().endswith('.csv'):
+        csv_file = file_name('compartment_priorities_csv')
+        if csv_file and not csv_file.lower().endswith('.csv'):
             self.add_error('compartment_priorities_csv', "Must be a .csv file")
 
-        miu_excel = cleaned_data.get('miu_linked_species_excel')
-        if miu_excel and not miu_excel.name.lower().endswith(('.xls', '.xlsx')):
+        miu_excel = file_name('miu_linked_species_excel')
+        if miu_excel and not miu_excel.lower().endswith(('.xls', '.xlsx')):
             self.add_error('miu_linked_species_excel', "Must be an Excel file (.xls or .xlsx)")
 
-        nbal_excel = cleaned_data.get('nbal_linked_species_excel')
-        if nbal_excel and not nbal_excel.name.lower().endswith(('.xls', '.xlsx')):
+        nbal_excel = file_name('nbal_linked_species_excel')
+        if nbal_excel and not nbal_excel.lower().endswith(('.xls', '.xlsx')):
             self.add_error('nbal_linked_species_excel', "Must be an Excel file (.xls or .xlsx)")
 
         return cleaned_data
 
+    def save(self, commit=True):
+        project = super().save(commit=False)
+        if self.bundle_members:
+            # unpacked straight into the content store
+            names = extract_members(self.cleaned_data['bundle'], self.bundle_members)
+            for field, name in names.items():
+                setattr(project, field, name)
+                project.upload_names[field] = os.path.basename(self.bundle_members[field].filename)
+        if commit:
+            project.save()
+            self._save_m2m()
+        return project
+
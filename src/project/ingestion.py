@@ -0,0 +1,450 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Ingestion of the uploaded project files. Runs once after upload (in a
+background thread; again from the detail page when a worker died mid-way,
+see requeue_stale) and writes cleaned artifacts into the content store
+(project/storage.py), keyed by the digest of all project files:
+
+    blobs/artifacts/<digest>/
+        manifest.json             validations, row counts, id sets, bounds,
+                                  costing values
+        <layer>.parquet           lowercase columns, stripped values, EPSG:4326,
+                                  repaired geometry (GeoParquet for shapefiles)
+        gis_mapping_display.parquet   simplified copy of gis_mapping for maps
+
+Views read the artifacts through read_layer(), which falls back to cleaning
+the original upload when a project has not been ingested (yet); with
+geometry=False only the attribute columns are read (the DBF of a shapefile,
+no geometry parsed or repaired). Only map views need the geometry, the
+simulation reads the attribute columns of the artifacts and the validations
+of the manifest (read_ingested_inputs). A project uploaded with the same
+files as an earlier one reuses its artifacts and only builds its entity
+dictionary.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from mucp_algorithms import data_reader
+
+from main import telemetry
+
+from .entities import build_entities
+from .storage import artifact_root, shapefile_path, source_keys
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 2
+
+# layer -> (project file field, kind)
+LAYERS = {
+    "gis_mapping": ("gis_mapping_shp", "shapefile"),
+    "compartment": ("compartment_shp", "shapefile"),
+    "miu": ("miu_shp", "shapefile"),
+    "nbal": ("nbal_shp", "shapefile"),
+    "compartment_priorities": ("compartment_priorities_csv", "csv"),
+    "miu_linked_species": ("miu_linked_species_excel", "excel"),
+    "nbal_linked_species": ("nbal_linked_species_excel", "excel"),
+}
+DISPLAY_LAYER = "gis_mapping_display"
+# columns the MUCP data reader requires per layer (shapefiles also have geometry)
+REQUIRED_COLUMNS = {
+    "gis_mapping": ["nbal_id", "miu_id", "compt_id", "area"],
+    "miu": ["miu_id", "area", "riparian_c"],
+    "nbal": ["nbal_id", "area", "stage"],
+    "compartment": ["compt_id", "area_ha", "slope", "walk_time", "drive_time", "costing", "grow_con"],
+    "miu_linked_species": ["miu_id", "species", "idenscode", "age"],
+    "nbal_linked_species": ["nbal_id", "species", "idenscode", "age"],
+    "compartment_priorities": ["compt_id"],
+}
+ID_COLUMNS = ("compt_id", "miu_id", "nbal_id")
+
+# background ingestion, one executor per process
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# -----------------------------
+# paths / manifest
+# -----------------------------
+def artifact_dir(project):
+    return artifact_root(project)
+
+
+def artifact_path(project, layer):
+    return os.path.join(artifact_dir(project), f"{layer}.parquet")
+
+
+def source_path(project, field):
+    """Path to read a project file from (shapefiles with their parts next to them)."""
+    if field.endswith("_shp"):
+        return shapefile_path(project, field[:-len("_shp")])
+    return getattr(project, field).path
+
+
+def _read_manifest(project):
+    try:
+        with open(os.path.join(artifact_dir(project), "manifest.json"), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("sources") != source_keys(project):
+        return None
+    return manifest
+
+
+def load_manifest(project):
+    """The manifest of a ready project, or None if missing or out of date."""
+    if not project.is_ready:
+        return None
+    return _read_manifest(project)
+
+
+# -----------------------------
+# cleaning
+# -----------------------------
+def normalise_table(df):
+    """Lowercase column names, strip text values and turn blanks into NA."""
+    df = df.copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    for col in df.columns:
+        if col == "geometry" or pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "mixed", "mixed-integer"):
+            continue
+        values = df[col].astype("string").str.strip()
+        values = values.mask(values.isin(["", "nan", "None"]))
+        df[col] = values.astype(object).where(values.notna(), None)
+    return df
+
+
+def clean_geometry(gdf):
+    """Reproject to EPSG:4326 and repair invalid polygons."""
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs(epsg=4326)
+    invalid = ~gdf.geometry.is_valid
+    if invalid.any():
+        gdf.loc[invalid, "geometry"] = gdf.geometry[invalid].buffer(0)  # fixes minor invalid polygons
+    return gdf
+
+
+def display_geometry(gdf):
+    """Simplify to ~1/5000 of the map width for drawing."""
+    bounds = gdf.total_bounds  # [minx, miny, maxx, maxy]
+    tolerance = max(bounds[2] - bounds[0], bounds[3] - bounds[1]) / 5000
+    gdf = gdf.copy()
+    gdf["geometry"] = gdf.geometry.simplify(tolerance=tolerance, preserve_topology=True)
+    return gdf
+
+
+def read_source(project, layer, geometry=True):
+    """Read and clean an original upload (no artifacts involved)."""
+    field, kind = LAYERS[layer]
+    path = source_path(project, field)
+    if kind == "csv":
+        with telemetry.stage("pd.read_csv"):
+            return normalise_table(pd.read_csv(path))
+    if kind == "excel":
+        with telemetry.stage("pd.read_excel"):
+            return normalise_table(pd.read_excel(path))
+    with telemetry.stage("gpd.read_file"):
+        # pyogrio read_geometry=False: the attribute table only
+        gdf = gpd.read_file(path, ignore_geometry=not geometry)
+    if not geometry:
+        return normalise_table(gdf)
+    return clean_geometry(normalise_table(gdf))
+
+
+def read_layer(project, layer, geometry=True):
+    """
+    Cleaned layer of a project (see LAYERS, plus "gis_mapping_display").
+    Reads the ingested artifact when there is one. ``geometry=False`` gives
+    the attribute columns as a DataFrame.
+    """
+    path = artifact_path(project, layer)
+    if project.is_ready and os.path.exists(path):
+        if not geometry:
+            columns = [c for c in pq.read_schema(path).names if c != "geometry"]
+            return pd.read_parquet(path, columns=columns)
+        if layer == DISPLAY_LAYER or LAYERS[layer][1] == "shapefile":
+            return gpd.read_parquet(path)
+        return pd.read_parquet(path)
+
+    if layer == DISPLAY_LAYER:
+        if not geometry:
+            return read_source(project, "gis_mapping", geometry=False)
+        return display_geometry(read_source(project, "gis_mapping"))
+    return read_source(project, layer, geometry=geometry)
+
+
+def _costing_values(compartment):
+    if "costing" not in compartment.columns:
+        return []
+    return compartment["costing"].dropna().unique().tolist()
+
+
+def costing_values(project):
+    """
+    Distinct costing values of the compartments (the ones a planning maps to
+    costing models). Stored in the manifest at ingestion; projects ingested
+    before read the one column from the artifact, others the shapefile table
+    without geometry.
+    """
+    manifest = load_manifest(project)
+    if manifest is not None and "costing_values" in manifest:
+        return manifest["costing_values"]
+    return _costing_values(read_layer(project, "compartment", geometry=False))
+
+
+# -----------------------------
+# validation (mucp data reader)
+# -----------------------------
+def read_project_inputs(project, validations=None):
+    """
+    Read the project files with the MUCP data reader, the way the engine
+    expects them. ``validations`` are the stored results of an earlier run
+    (from the manifest); without them every file is validated first.
+
+    Returns ``(data, validations)`` keyed by input name.
+    """
+    validate = validations is None
+    validations = {} if validate else dict(validations)
+    data = {}
+
+    def load(name, reader, path, *args, empty, **kwargs):
+        if validate:
+            validations[name] = reader(path, *args, validate=True, **kwargs)
+        if not validations.get(name, {}).get("errors"):
+            data[name] = reader(path, *args, validate=False, **kwargs)
+        else:
+            data[name] = empty
+
+    def path(field):
+        return source_path(project, field)
+
+    def empty_gdf(layer):
+        return gpd.GeoDataFrame(columns=REQUIRED_COLUMNS[layer] + ["geometry"], geometry="geometry", crs="EPSG:4326")
+
+    load("gis_mapping", data_reader.read_gis_mapping_shapefile, path("gis_mapping_shp"),
+         headers_required=REQUIRED_COLUMNS["gis_mapping"], headers_other=["geometry"],
+         empty=empty_gdf("gis_mapping"))
+    gis_mapping = data["gis_mapping"]
+
+    load("miu", data_reader.read_miu_shapefile, path("miu_shp"), gis_mapping["miu_id"].tolist(),
+         headers_required=REQUIRED_COLUMNS["miu"], headers_other=["geometry"],
+         empty=empty_gdf("miu"))
+    load("nbal", data_reader.read_nbal_shapefile, path("nbal_shp"), gis_mapping["nbal_id"].tolist(),
+         headers_required=REQUIRED_COLUMNS["nbal"], headers_other=["geometry", "contractid", "first_date", "last_date"],
+         empty=empty_gdf("nbal"))
+    load("compartment", data_reader.read_compartment_shapefile, path("compartment_shp"), gis_mapping["compt_id"].tolist(),
+         headers_required=REQUIRED_COLUMNS["compartment"], headers_other=["geometry", "terrain"],
+         empty=empty_gdf("compartment"))
+    load("miu_linked_species", data_reader.read_miu_linked_species_excel, path("miu_linked_species_excel"),
+         headers_required=REQUIRED_COLUMNS["miu_linked_species"],
+         empty=pd.DataFrame(columns=REQUIRED_COLUMNS["miu_linked_species"]))
+    load("nbal_linked_species", data_reader.read_nbal_linked_species_excel, path("nbal_linked_species_excel"),
+         headers_required=REQUIRED_COLUMNS["nbal_linked_species"],
+         empty=pd.DataFrame(columns=REQUIRED_COLUMNS["nbal_linked_species"]))
+    load("compartment_priorities", data_reader.read_compartment_priorities_csv, path("compartment_priorities_csv"),
+         headers_required=REQUIRED_COLUMNS["compartment_priorities"],
+         empty=pd.DataFrame(columns=REQUIRED_COLUMNS["compartment_priorities"]))
+
+    return data, validations
+
+
+def read_ingested_inputs(project):
+    """
+    read_project_inputs from the ingested artifacts: the attribute columns of
+    every layer (no geometry, the engine doesn't use it) and the validations
+    stored in the manifest. Layers whose file had errors are empty, like the
+    data reader leaves them. None when the project has no current artifacts.
+    """
+    manifest = load_manifest(project)
+    if manifest is None:
+        return None
+    validations = manifest["validations"]
+    data = {}
+    for layer in LAYERS:
+        if validations.get(layer, {}).get("errors"):
+            data[layer] = pd.DataFrame(columns=REQUIRED_COLUMNS[layer])
+        else:
+            data[layer] = read_layer(project, layer, geometry=False)
+    return data, dict(validations)
+
+
+# -----------------------------
+# ingestion
+# -----------------------------
+def _id_summary(layers):
+    """Id counts per layer and ids referenced by the GIS mapping but missing from their layer."""
+    gis_mapping = layers["gis_mapping"]
+    summary = {"counts": {}, "missing": {}}
+    for layer, df in layers.items():
+        for col in ID_COLUMNS:
+            if col in df.columns:
+                summary["counts"][f"{layer}.{col}"] = int(df[col].dropna().nunique())
+
+    for layer, col in (("compartment", "compt_id"), ("miu", "miu_id"), ("nbal", "nbal_id"), ("compartment_priorities", "compt_id")):
+        if col in gis_mapping.columns and col in layers[layer].columns:
+            missing = sorted(set(gis_mapping[col].dropna().astype(str)) - set(layers[layer][col].dropna().astype(str)))
+            summary["missing"][f"{layer}.{col}"] = {"count": len(missing), "sample": missing[:20]}
+    return summary
+
+
+def ingest_project(project):
+    """
+    Validate, clean and persist the artifacts of ``project``. Raises on failure.
+    Files ingested before (for any project) are not read again.
+    """
+    manifest = _read_manifest(project)
+    if manifest is not None:
+        with telemetry.stage("ingestion.entities"):
+            build_entities(project, gpd.read_parquet(artifact_path(project, "gis_mapping")))
+        return manifest
+
+    with telemetry.stage("ingestion.validate"):
+        data, validations = read_project_inputs(project)
+
+    layers = {}
+    manifest_layers = {}
+    with telemetry.stage("ingestion.clean"):
+        for layer, (field, kind) in LAYERS.items():
+            # valid files were read for validation already, files with
+            # errors come back empty and are read again as they are
+            if validations.get(layer, {}).get("errors"):
+                df = read_source(project, layer)
+            elif kind == "shapefile":
+                df = clean_geometry(normalise_table(data[layer]))
+            else:
+                df = normalise_table(data[layer])
+            layers[layer] = df
+            info = {"file": f"{layer}.parquet", "source": project.upload_name(field),
+                    "rows": len(df), "columns": [c for c in df.columns if c != "geometry"]}
+            if kind == "shapefile":
+                info["bounds"] = [float(b) for b in df.total_bounds]
+            manifest_layers[layer] = info
+
+    with telemetry.stage("ingestion.entities"):
+        entities = build_entities(project, layers["gis_mapping"])
+
+    # written next to the final folder and moved in place when complete
+    out_dir = artifact_dir(project)
+    os.makedirs(os.path.dirname(out_dir), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(out_dir), prefix=f"{os.path.basename(out_dir)}.")
+    try:
+        with telemetry.stage("ingestion.write"):
+            for layer, df in layers.items():
+                df.to_parquet(os.path.join(tmp_dir, f"{layer}.parquet"), index=False)
+            display = display_geometry(layers["gis_mapping"])
+            display.to_parquet(os.path.join(tmp_dir, f"{DISPLAY_LAYER}.parquet"), index=False)
+            manifest_layers[DISPLAY_LAYER] = {"file": f"{DISPLAY_LAYER}.parquet", "rows": len(display)}
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "sources": source_keys(project),
+            "crs": "EPSG:4326",
+            "bounds": manifest_layers["gis_mapping"]["bounds"],
+            "layers": manifest_layers,
+            "ids": _id_summary(layers),
+            "entities": entities["size"],
+            "costing_values": _costing_values(layers["compartment"]),
+            "validations": validations,
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2, default=str)
+
+        # replaces an out of date folder; loses to one written meanwhile
+        shutil.rmtree(out_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, out_dir)
+        except OSError:
+            pass
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return manifest
+
+
+def run_ingestion(project_id):
+    """Ingest a project by id and record the outcome on its status."""
+    from .models import Project
+
+    project = Project.objects.filter(pk=project_id).first()
+    if project is None:
+        return
+    Project.objects.filter(pk=project_id).update(
+        status=Project.STATUS_PROCESSING, status_message="", status_changed_at=datetime.now(timezone.utc),
+    )
+    try:
+        manifest = ingest_project(project)
+    except Exception as e:
+        logger.exception("Ingestion of project %s failed", project_id)
+        Project.objects.filter(pk=project_id).update(
+            status=Project.STATUS_FAILED, status_message=str(e), status_changed_at=datetime.now(timezone.utc),
+        )
+        return
+
+    errors = sum(len(v.get("errors", [])) for v in manifest["validations"].values())
+    message = f"{errors} validation error(s), see the planning validation page." if errors else ""
+    now = datetime.now(timezone.utc)
+    Project.objects.filter(pk=project_id).update(
+        status=Project.STATUS_READY, status_message=message, ingested_at=now, status_changed_at=now,
+    )
+
+
+def _run_in_background(project_id):
+    # worker threads get their own db connection, don't leave it open
+    close_old_connections()
+    try:
+        run_ingestion(project_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_ingestion(project):
+    """Ingest ``project`` in the background once the current transaction commits."""
+    global _executor
+    if not settings.PROJECT_INGESTION_BACKGROUND:
+        transaction.on_commit(lambda: run_ingestion(project.pk))
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PROJECT_INGESTION_WORKERS, thread_name_prefix="mucp-ingest")
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, project.pk))
+
+
+def requeue_stale(project):
+    """
+    Schedule ``project`` again if it has been pending/processing for longer
+    than PROJECT_INGESTION_STALE_SECONDS, i.e. the worker ingesting it
+    stopped. Returns True if it was queued.
+    """
+    from .models import Project
+
+    if project.status not in (Project.STATUS_PENDING, Project.STATUS_PROCESSING):
+        return False
+    now = datetime.now(timezone.utc)
+    if (project.status_changed_at or project.created_at) > now - timedelta(seconds=settings.PROJECT_INGESTION_STALE_SECONDS):
+        return False
+    # only the first request (of any worker) seeing it stale queues it
+    claimed = Project.objects.filter(
+        pk=project.pk, status=project.status, status_changed_at=project.status_changed_at,
+    ).update(status=Project.STATUS_PENDING, status_message="", status_changed_at=now)
+    if not claimed:
+        return False
+    logger.warning("Project %s was %s since %s, ingesting it again", project.pk, project.status,
+                   project.status_changed_at or project.created_at)
+    project.status, project.status_changed_at = Project.STATUS_PENDING, now
+    schedule_ingestion(project)
+    return True
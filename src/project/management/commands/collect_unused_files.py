@@ -0,0 +1,22 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Remove stored files, shapefile links and artifacts no project uses any more,
+e.g. blobs of uploads that never became a project (project/storage.py).
+Scans the whole store, run it now and then (cron):
+
+    python manage.py collect_unused_files
+"""
+from django.core.management.base import BaseCommand
+
+from project.models import Project
+from project.storage import collect_unused_files
+
+
+class Command(BaseCommand):
+    help = 'Remove stored project files that no project uses'
+
+    def handle(self, *args, **options):
+        collect_unused_files(Project.objects.all())
+        self.stdout.write(self.style.SUCCESS("Unused project files removed."))
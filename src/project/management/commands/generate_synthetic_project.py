@@ -0,0 +1,88 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Synthesise a large project from the H60B example files for scale testing:
+
+    python manage.py generate_synthetic_project --user alice --nbal 10000
+    python manage.py generate_synthetic_project --user alice --copies 50 --jitter 0.5 --name big_test
+"""
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from project.ingestion import run_ingestion
+from project.models import Project
+from project.synthetic import EXAMPLE_DIR, build_upscaled_project, copies_for, example_counts, register_project
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic project by tiling the example project and register it for a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username that will own the project.')
+        parser.add_argument('--name', help='Project name (default: synthetic_<copies>x).')
+        parser.add_argument('--copies', type=int, help='Number of tiled copies of the example catchment.')
+        parser.add_argument('--compartments', type=int, help='Minimum number of compartments.')
+        parser.add_argument('--miu', type=int, help='Minimum number of MIUs.')
+        parser.add_argument('--nbal', type=int, help='Minimum number of NBALs.')
+        parser.add_argument('--jitter', type=float, default=0.0,
+                            help='Randomly shift each tile by up to this fraction of the gap between tiles (0-1).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the jitter.')
+        parser.add_argument('--source-dir', default=EXAMPLE_DIR, help='Folder with the H60B example files.')
+        parser.add_argument('--output-dir', help='Keep the generated files here instead of a temporary folder.')
+        parser.add_argument('--no-register', action='store_true', help='Only write the files into --output-dir, do not create a Project.')
+
+    def handle(self, *args, **options):
+        if options['no_register'] and not options['output_dir']:
+            raise CommandError("--no-register needs --output-dir to keep the files.")
+        if options['copies'] is not None and options['copies'] <= 0:
+            raise CommandError("--copies must be at least 1.")
+
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        counts = example_counts(options['source_dir'])
+        if options['copies'] is not None:
+            copies = options['copies']
+        else:
+            targets = {"compartment": options['compartments'], "miu": options['miu'], "nbal": options['nbal']}
+            if not any(targets.values()):
+                raise CommandError("Give --copies or at least one of --compartments, --miu, --nbal.")
+            copies = copies_for(targets, counts)
+
+        name = options['name'] or f"synthetic_{copies}x"
+        if not options['no_register'] and Project.objects.filter(user=user, name=name).exists():
+            raise CommandError(f"Project '{name}' already exists for {user.username}.")
+
+        self.stdout.write(
+            f"Generating {copies} copies: {counts['compartment'] * copies} compartments, "
+            f"{counts['miu'] * copies} MIUs, {counts['nbal'] * copies} NBALs, "
+            f"{counts['gis_mapping'] * copies} GIS mapping polygons..."
+        )
+
+        out_dir = options['output_dir'] or tempfile.mkdtemp(prefix="mucp_synthetic_")
+        try:
+            try:
+                files = build_upscaled_project(out_dir, copies, options['source_dir'], prefix=name,
+                                               jitter=options['jitter'], seed=options['seed'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            if options['no_register']:
+                self.stdout.write(self.style.SUCCESS(f"Files written to {out_dir}"))
+                return
+
+            project = register_project(user, name, files)
+            self.stdout.write(f"Project '{project.name}' (id {project.pk}) created for {user.username}, ingesting...")
+            run_ingestion(project.pk)
+            project.refresh_from_db()
+            self.stdout.write(self.style.SUCCESS(f"Project '{project.name}' is {project.status}. {project.status_message}".strip()))
+        finally:
+            # the project keeps its own copy under MEDIA_ROOT
+            if not options['output_dir']:
+                shutil.rmtree(out_dir, ignore_errors=True)
@@ -0,0 +1,41 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+(Re)build the cleaned artifacts of projects in the foreground, e.g. for
+projects uploaded before ingestion existed:
+
+    python manage.py ingest_projects --pending
+    python manage.py ingest_projects 12 15
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from project.ingestion import run_ingestion
+from project.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Validate and clean project files into GeoParquet artifacts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Project ids to ingest.')
+        parser.add_argument('--pending', action='store_true', help='Ingest every project that is not ready.')
+        parser.add_argument('--all', action='store_true', help='Re-ingest every project.')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('pk')
+        if options['all']:
+            pass
+        elif options['pending']:
+            projects = projects.exclude(status=Project.STATUS_READY)
+        elif options['ids']:
+            projects = projects.filter(pk__in=options['ids'])
+        else:
+            raise CommandError("Give project ids, --pending or --all.")
+
+        for project_id in projects.values_list('pk', flat=True):
+            run_ingestion(project_id)
+            project = Project.objects.get(pk=project_id)
+            style = self.style.SUCCESS if project.is_ready else self.style.ERROR
+            message = f" ({project.status_message})" if project.status_message else ""
+            self.stdout.write(style(f"{project}: {project.status}{message}"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0004_project_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.PositiveIntegerField()),
+                ('compt_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('miu_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('nbal_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='project.project')),
+            ],
+            options={
+                'ordering': ['project', 'key'],
+                'unique_together': {('project', 'key')},
+            },
+        ),
+    ]
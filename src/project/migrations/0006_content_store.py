@@ -0,0 +1,152 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+import functools
+import os
+import shutil
+
+import project.models
+import project.storage
+from django.conf import settings
+from django.db import migrations, models
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def store_existing_uploads(apps, schema_editor):
+    # Move the uploads of existing projects into the content store. Their old
+    # folders (with the artifacts) go, run `manage.py ingest_projects --all`
+    # afterwards to rebuild the artifacts in the store.
+    Project = apps.get_model('project', 'Project')
+    fields = [f.name for f in Project._meta.fields if isinstance(f, models.FileField)]
+    projects_root = os.path.join(settings.MEDIA_ROOT, 'projects')
+
+    for item in Project.objects.all():
+        folders = set()
+        for field in fields:
+            file = getattr(item, field)
+            if not file or project.storage.blob_digest(file.name):
+                continue
+            path = os.path.join(settings.MEDIA_ROOT, file.name)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as fh:
+                name = project.storage.store(settings.MEDIA_ROOT, iter(lambda: fh.read(CHUNK_SIZE), b''), os.path.splitext(path)[1])
+            item.upload_names.setdefault(field, os.path.basename(file.name))
+            setattr(item, field, name)
+            folders.add(os.path.dirname(path))
+        item.save()
+
+        for folder in folders:
+            if os.path.dirname(os.path.dirname(folder)) == projects_root:
+                shutil.rmtree(folder, ignore_errors=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0005_project_entity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='upload_names',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='compartment_dbf',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_dbf',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='compartment_priorities_csv',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_priorities_csv',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='compartment_prj',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_prj',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='compartment_shp',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_shp',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='compartment_shx',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_shx',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='gis_mapping_dbf',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_dbf',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='gis_mapping_prj',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_prj',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='gis_mapping_shp',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_shp',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='gis_mapping_shx',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_shx',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='miu_dbf',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_dbf',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='miu_linked_species_excel',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_linked_species_excel',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='miu_prj',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_prj',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='miu_shp',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_shp',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='miu_shx',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_shx',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='nbal_dbf',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_dbf',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='nbal_linked_species_excel',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_linked_species_excel',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='nbal_prj',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_prj',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='nbal_shp',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_shp',), **{})),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='nbal_shx',
+            field=models.FileField(storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_shx',), **{})),
+        ),
+        migrations.RunPython(store_existing_uploads, migrations.RunPython.noop),
+    ]
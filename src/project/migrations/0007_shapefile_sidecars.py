@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:03
+
+import functools
+import project.models
+import project.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0006_content_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='compartment_cpg',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_cpg',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='compartment_sbn',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_sbn',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='compartment_sbx',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('compartment_sbx',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gis_mapping_cpg',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_cpg',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gis_mapping_sbn',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_sbn',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gis_mapping_sbx',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('gis_mapping_sbx',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='miu_cpg',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_cpg',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='miu_sbn',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_sbn',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='miu_sbx',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('miu_sbx',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nbal_cpg',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_cpg',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nbal_sbn',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_sbn',), **{})),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nbal_sbx',
+            field=models.FileField(blank=True, null=True, storage=project.storage.upload_storage, upload_to=functools.partial(project.models.upload_path, *('nbal_sbx',), **{})),
+        ),
+    ]
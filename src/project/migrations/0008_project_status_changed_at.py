@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0007_shapefile_sidecars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -7,9 +7,24 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from functools import partial
 import os
 
+from .storage import BLOB_DIR, upload_storage
+
 # Helper functions:
+def upload_path(field, instance, filename):
+    # The content store names the file by its digest (project/storage.py),
+    # the name as uploaded is kept on the project for display
+    instance.upload_names[field] = os.path.basename(filename)
+    return os.path.join(BLOB_DIR, filename)
+
+
+def upload_to(field):
+    return partial(upload_path, field)
+
+
+# per-project upload folder, used before the content store (older migrations)
 def project_directory_path(instance, filename):
     # Store files under media/projects/user_<id>/<project_name>/<filename>
     # Base path comes from settings
@@ -22,37 +37,71 @@ def project_directory_path(instance, filename):
 
 # Project model
 class Project(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_READY, "Ready"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="projects")
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    compartment_priorities_csv = models.FileField(upload_to=project_directory_path, blank=True, null=True)
-    miu_linked_species_excel = models.FileField(upload_to=project_directory_path, blank=True, null=True)
-    nbal_linked_species_excel = models.FileField(upload_to=project_directory_path, blank=True, null=True)
+    # ingestion of the uploaded files (see project/ingestion.py)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    status_message = models.TextField(blank=True, default="")
+    ingested_at = models.DateTimeField(blank=True, null=True)
+    status_changed_at = models.DateTimeField(blank=True, null=True)
+
+    compartment_priorities_csv = models.FileField(upload_to=upload_to("compartment_priorities_csv"), storage=upload_storage, blank=True, null=True)
+    miu_linked_species_excel = models.FileField(upload_to=upload_to("miu_linked_species_excel"), storage=upload_storage, blank=True, null=True)
+    nbal_linked_species_excel = models.FileField(upload_to=upload_to("nbal_linked_species_excel"), storage=upload_storage, blank=True, null=True)
 
-    # Compartments shapefile parts
-    compartment_shp = models.FileField(upload_to=project_directory_path)
-    compartment_shx = models.FileField(upload_to=project_directory_path)
-    compartment_prj = models.FileField(upload_to=project_directory_path)
-    compartment_dbf = models.FileField(upload_to=project_directory_path)
+    # Compartments shapefile parts (here and below .cpg encoding and
+    # .sbn/.sbx spatial index are optional)
+    compartment_shp = models.FileField(upload_to=upload_to("compartment_shp"), storage=upload_storage)
+    compartment_shx = models.FileField(upload_to=upload_to("compartment_shx"), storage=upload_storage)
+    compartment_prj = models.FileField(upload_to=upload_to("compartment_prj"), storage=upload_storage)
+    compartment_dbf = models.FileField(upload_to=upload_to("compartment_dbf"), storage=upload_storage)
+    compartment_cpg = models.FileField(upload_to=upload_to("compartment_cpg"), storage=upload_storage, blank=True, null=True)
+    compartment_sbn = models.FileField(upload_to=upload_to("compartment_sbn"), storage=upload_storage, blank=True, null=True)
+    compartment_sbx = models.FileField(upload_to=upload_to("compartment_sbx"), storage=upload_storage, blank=True, null=True)
 
     # GIS mapping shapefile parts
-    gis_mapping_shp = models.FileField(upload_to=project_directory_path)
-    gis_mapping_shx = models.FileField(upload_to=project_directory_path)
-    gis_mapping_prj = models.FileField(upload_to=project_directory_path)
-    gis_mapping_dbf = models.FileField(upload_to=project_directory_path)
+    gis_mapping_shp = models.FileField(upload_to=upload_to("gis_mapping_shp"), storage=upload_storage)
+    gis_mapping_shx = models.FileField(upload_to=upload_to("gis_mapping_shx"), storage=upload_storage)
+    gis_mapping_prj = models.FileField(upload_to=upload_to("gis_mapping_prj"), storage=upload_storage)
+    gis_mapping_dbf = models.FileField(upload_to=upload_to("gis_mapping_dbf"), storage=upload_storage)
+    gis_mapping_cpg = models.FileField(upload_to=upload_to("gis_mapping_cpg"), storage=upload_storage, blank=True, null=True)
+    gis_mapping_sbn = models.FileField(upload_to=upload_to("gis_mapping_sbn"), storage=upload_storage, blank=True, null=True)
+    gis_mapping_sbx = models.FileField(upload_to=upload_to("gis_mapping_sbx"), storage=upload_storage, blank=True, null=True)
 
     # MIU shapefile parts
-    miu_shp = models.FileField(upload_to=project_directory_path)
-    miu_shx = models.FileField(upload_to=project_directory_path)
-    miu_prj = models.FileField(upload_to=project_directory_path)
-    miu_dbf = models.FileField(upload_to=project_directory_path)
+    miu_shp = models.FileField(upload_to=upload_to("miu_shp"), storage=upload_storage)
+    miu_shx = models.FileField(upload_to=upload_to("miu_shx"), storage=upload_storage)
+    miu_prj = models.FileField(upload_to=upload_to("miu_prj"), storage=upload_storage)
+    miu_dbf = models.FileField(upload_to=upload_to("miu_dbf"), storage=upload_storage)
+    miu_cpg = models.FileField(upload_to=upload_to("miu_cpg"), storage=upload_storage, blank=True, null=True)
+    miu_sbn = models.FileField(upload_to=upload_to("miu_sbn"), storage=upload_storage, blank=True, null=True)
+    miu_sbx = models.FileField(upload_to=upload_to("miu_sbx"), storage=upload_storage, blank=True, null=True)
 
     # NBAL shapefile parts
-    nbal_shp = models.FileField(upload_to=project_directory_path)
-    nbal_shx = models.FileField(upload_to=project_directory_path)
-    nbal_prj = models.FileField(upload_to=project_directory_path)
-    nbal_dbf = models.FileField(upload_to=project_directory_path)
+    nbal_shp = models.FileField(upload_to=upload_to("nbal_shp"), storage=upload_storage)
+    nbal_shx = models.FileField(upload_to=upload_to("nbal_shx"), storage=upload_storage)
+    nbal_prj = models.FileField(upload_to=upload_to("nbal_prj"), storage=upload_storage)
+    nbal_dbf = models.FileField(upload_to=upload_to("nbal_dbf"), storage=upload_storage)
+    nbal_cpg = models.FileField(upload_to=upload_to("nbal_cpg"), storage=upload_storage, blank=True, null=True)
+    nbal_sbn = models.FileField(upload_to=upload_to("nbal_sbn"), storage=upload_storage, blank=True, null=True)
+    nbal_sbx = models.FileField(upload_to=upload_to("nbal_sbx"), storage=upload_storage, blank=True, null=True)
+
+    # file field -> file name as uploaded (the stored files are named by digest);
+    # declared after the file fields, saving them fills it in (upload_path)
+    upload_names = models.JSONField(default=dict, blank=True)
 
     def clean(self):
         """Ensure all shapefile parts are present for each category."""
@@ -67,6 +116,14 @@ class Project(models.Model):
             if any(f is None for f in files):
                 raise ValidationError(f"All files for {category} must be uploaded: .shp, .shx, .prj, .dbf")
 
+    def upload_name(self, field):
+        file = getattr(self, field)
+        return self.upload_names.get(field) or (os.path.basename(file.name) if file else None)
+
+    @property
+    def is_ready(self):
+        return self.status == self.STATUS_READY
+
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
@@ -75,4 +132,23 @@ class Project(models.Model):
         ordering = ['-created_at']
 
 
+# entity model
+class ProjectEntity(models.Model):
+    """
+    One (compartment, MIU, NBAL) combination of a project with a compact
+    integer key. Keys are dense per project (0, 1, 2, ...) so simulation
+    results can be stored and joined as integer arrays (see project/entities.py).
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="entities")
+    key = models.PositiveIntegerField()
+
+    compt_id = models.CharField(max_length=50, null=True, blank=True)
+    miu_id = models.CharField(max_length=50, null=True, blank=True)
+    nbal_id = models.CharField(max_length=50, null=True, blank=True)
 
+    class Meta:
+        unique_together = ("project", "key")
+        ordering = ["project", "key"]
+
+    def __str__(self):
+        return f"{self.key}: {self.compt_id} / {self.miu_id} / {self.nbal_id} ({self.project.name})"
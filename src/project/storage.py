@@ -0,0 +1,283 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Content-addressed store for project uploads. Every uploaded file is hashed
+(sha256) while it is streamed to disk and kept once under its digest, so the
+same catchment files uploaded for several projects share one copy:
+
+    blobs/<aa>/<sha256>.<ext>                   uploaded files
+    blobs/shapefiles/<digest>/<layer>.<part>    hard links grouping the parts
+                                                of one shapefile for GDAL
+    blobs/artifacts/<digest>/                   ingested artifacts of one set
+                                                of project files (ingestion.py)
+
+Nothing in the store changes once written, so paths inside it can key caches
+(content_key). Files are only removed when no project refers to them any more:
+those of a deleted project right away (release_files), anything else left
+over by the collect_unused_files command.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Q
+
+BLOB_DIR = "blobs"
+SHAPEFILE_DIR = "shapefiles"
+ARTIFACT_DIR = "artifacts"
+SHAPEFILE_PARTS = ["shp", "shx", "prj", "dbf"]
+# optional: encoding (.cpg) and spatial index (.sbn/.sbx)
+SIDECAR_PARTS = ["cpg", "sbn", "sbx"]
+
+# blobs written or re-uploaded this recently are never removed, an upload
+# of the same content may be about to reference them
+BLOB_GRACE_SECONDS = 3600
+
+BLOB_NAME = re.compile(rf"^{BLOB_DIR}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.\w+)?$")
+
+
+# -----------------------------
+# blobs
+# -----------------------------
+def blob_name(digest, ext):
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{ext.lower()}"
+
+
+def blob_digest(name):
+    """Digest of a stored file name, None for files stored before the content store."""
+    match = BLOB_NAME.match(name or "")
+    return match.group(1) if match else None
+
+
+def store(root, chunks, ext):
+    """
+    Write ``chunks`` (bytes) into the store under ``root`` and return the
+    blob name. Content that is stored already is not written twice.
+    """
+    tmp_dir = os.path.join(root, BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=ext)
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                digest.update(chunk)
+                fh.write(chunk)
+        name = blob_name(digest.hexdigest(), ext)
+        path = os.path.join(root, name)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            os.utime(path)  # restarts the grace period, see BLOB_GRACE_SECONDS
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return name
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names every file by the sha256 of its content."""
+
+    def get_available_name(self, name, max_length=None):
+        # the name is chosen by _save, equal content is meant to collide
+        return name
+
+    def _save(self, name, content):
+        if hasattr(content, "seek") and content.seekable():
+            content.seek(0)
+        name = store(self.location, content.chunks(), os.path.splitext(name)[1])
+        if self.file_permissions_mode is not None:
+            os.chmod(self.path(name), self.file_permissions_mode)
+        return name
+
+
+def upload_storage():
+    return ContentAddressedStorage()
+
+
+# -----------------------------
+# project files
+# -----------------------------
+def project_file_names(project):
+    """Project file field -> stored name, for the files a project has."""
+    names = {}
+    for field in project._meta.fields:
+        if field.get_internal_type() == "FileField":
+            file = getattr(project, field.name)
+            if file:
+                names[field.name] = file.name
+    return names
+
+
+def _file_key(name):
+    digest = blob_digest(name)
+    if digest:
+        return digest
+    # uploaded before the content store: name, size and modification time
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if not os.path.exists(path):
+        return name
+    stat = os.stat(path)
+    return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def source_keys(project):
+    """Project file field -> digest of the stored file."""
+    return {field: _file_key(name) for field, name in sorted(project_file_names(project).items())}
+
+
+def source_digest(project):
+    """One digest over all files of a project; equal files give equal digests."""
+    keys = source_keys(project)
+    return hashlib.sha256("\n".join(f"{field}:{key}" for field, key in keys.items()).encode()).hexdigest()
+
+
+def artifact_root(project):
+    return os.path.join(settings.MEDIA_ROOT, BLOB_DIR, ARTIFACT_DIR, source_digest(project))
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _shapefile_parts(project, layer):
+    """Part -> stored file of shapefile ``layer``, and the folder linking them (None before the store)."""
+    files = {part: getattr(project, f"{layer}_{part}", None) for part in SHAPEFILE_PARTS + SIDECAR_PARTS}
+    files = {part: file for part, file in files.items() if file}
+    digests = {part: blob_digest(file.name) for part, file in files.items()}
+    if not all(digests.values()):
+        return files, None
+    bundle = hashlib.sha256("".join(f"{part}:{digest}" for part, digest in digests.items()).encode()).hexdigest()
+    return files, os.path.join(settings.MEDIA_ROOT, BLOB_DIR, SHAPEFILE_DIR, bundle)
+
+
+def shapefile_path(project, layer):
+    """
+    Path of the .shp of shapefile ``layer`` (e.g. "gis_mapping") with its
+    .shx/.prj/.dbf (and sidecars) next to it under the same name, as GDAL
+    expects them.
+    """
+    files, directory = _shapefile_parts(project, layer)
+    if directory is None:
+        # stored before the content store, the parts sit side by side
+        return files["shp"].path
+
+    if not os.path.isdir(directory):
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(directory))
+        for part, file in files.items():
+            _link(file.path, os.path.join(tmp_dir, f"{layer}.{part}"))
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # another worker linked the same shapefile meanwhile
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return os.path.join(directory, f"{layer}.shp")
+
+
+def _shapefile_dirs(project):
+    dirs = set()
+    for layer in {field.rsplit("_", 1)[0] for field in project_file_names(project) if field.endswith("_shp")}:
+        _, directory = _shapefile_parts(project, layer)
+        if directory is not None:
+            dirs.add(directory)
+    return dirs
+
+
+def content_key(path):
+    """
+    Cache key part for a file: its place in the store (which only ever holds
+    one content) or, outside the store, its path, size and modification time.
+    """
+    store_root = os.path.join(os.path.abspath(settings.MEDIA_ROOT), BLOB_DIR) + os.sep
+    path = os.path.abspath(path)
+    if path.startswith(store_root):
+        return hashlib.sha1(path[len(store_root):].encode()).hexdigest()
+    stat = os.stat(path)
+    return hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def _project_paths(projects):
+    """Stored files, shapefile folders and artifact folders of ``projects``."""
+    paths = set()
+    for project in projects:
+        paths.update(os.path.join(settings.MEDIA_ROOT, name) for name in project_file_names(project).values())
+        paths.update(_shapefile_dirs(project))
+        paths.add(artifact_root(project))
+    return paths
+
+
+def _remove_old(path, is_dir, cutoff):
+    try:
+        if os.path.getmtime(path) >= cutoff:
+            return
+        if is_dir:
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def release_files(project):
+    """
+    Remove the stored files, shapefile links and artifacts of a deleted
+    ``project`` that no other project uses and that are older than
+    BLOB_GRACE_SECONDS. Only the projects sharing one of its files are
+    looked at, so the cost doesn't grow with the installation.
+    """
+    from .models import Project
+
+    names = project_file_names(project)
+    if not names:
+        return
+    fields = [field.name for field in Project._meta.fields if field.get_internal_type() == "FileField"]
+    sharing = Q()
+    for field in fields:
+        sharing |= Q(**{f"{field}__in": list(names.values())})
+    used = _project_paths(Project.objects.filter(sharing).exclude(pk=project.pk))
+
+    root = os.path.join(settings.MEDIA_ROOT, BLOB_DIR) + os.sep
+    cutoff = time.time() - BLOB_GRACE_SECONDS
+    for path in _project_paths([project]) - used:
+        # files stored before the content store go with their project folder
+        if path.startswith(root) and os.path.exists(path):
+            _remove_old(path, os.path.isdir(path), cutoff)
+
+
+def collect_unused_files(projects):
+    """
+    Remove stored files, shapefile links and artifacts that none of
+    ``projects`` (all projects left) use and that are older than
+    BLOB_GRACE_SECONDS. Also clears blobs of uploads that never became a
+    project. Scans the whole store: run from the collect_unused_files
+    command, not in a request.
+    """
+    used = _project_paths(projects)
+
+    root = os.path.join(settings.MEDIA_ROOT, BLOB_DIR)
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - BLOB_GRACE_SECONDS
+    for entry in os.scandir(root):
+        if entry.name == "tmp" or not entry.is_dir():
+            continue
+        if entry.name in (SHAPEFILE_DIR, ARTIFACT_DIR):
+            candidates = [(d.path, True) for d in os.scandir(entry.path) if d.is_dir()]
+        else:
+            candidates = [(f.path, False) for f in os.scandir(entry.path) if f.is_file()]
+        for path, is_dir in candidates:
+            if path not in used:
+                _remove_old(path, is_dir, cutoff)
@@ -0,0 +1,180 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Synthetic project inputs for scale testing. The example catchment (H60B) is
+tiled into a grid of copies: every copy gets its geometries shifted next to
+the previous one and a ``_T<n>`` suffix on every compartment/MIU/NBAL id, so
+the links between the shapefiles, the linked species sheets and the
+priorities csv stay consistent.
+"""
+import math
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files import File
+
+from .models import Project
+from .storage import SIDECAR_PARTS
+
+# example project files that ship with the tool
+EXAMPLE_DIR = os.path.join(settings.BASE_DIR, "home", "static", "example_case_files")
+EXAMPLE_FILES = {
+    "compartment_shp": "H60B_compartments_tm19.shp",
+    "gis_mapping_shp": "H60B_GIS_mapping_tm19.shp",
+    "miu_shp": "H60B_MIU_tm19.shp",
+    "nbal_shp": "H60B_NBAL_tm19.shp",
+    "compartment_priorities_csv": "H60B_compartments_priorities.csv",
+    "miu_linked_species_excel": "H60B_MIU_linked_species.xlsx",
+    "nbal_linked_species_excel": "H60B_NBAL_linked_species.xlsx",
+}
+
+SHAPEFILE_PARTS = ["shp", "shx", "prj", "dbf"]
+
+# id columns (lowercase) present in each input
+ID_COLUMNS = ("compt_id", "miu_id", "nbal_id")
+
+# rows in an xlsx sheet, header included
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def example_paths(source_dir=EXAMPLE_DIR):
+    return {key: os.path.join(source_dir, name) for key, name in EXAMPLE_FILES.items()}
+
+
+def example_project_files(source_dir=EXAMPLE_DIR):
+    """Project field name -> path for the unmodified example project."""
+    files = {}
+    for key, path in example_paths(source_dir).items():
+        if key.endswith("_shp"):
+            layer = key[:-len("_shp")]
+            for part in SHAPEFILE_PARTS:
+                files[f"{layer}_{part}"] = os.path.splitext(path)[0] + f".{part}"
+            for part in SIDECAR_PARTS:
+                sidecar = os.path.splitext(path)[0] + f".{part}"
+                if os.path.exists(sidecar):
+                    files[f"{layer}_{part}"] = sidecar
+        else:
+            files[key] = path
+    return files
+
+
+def tile_suffix(tile):
+    # the first tile keeps the original ids so scale 1 equals the example
+    return "" if tile == 0 else f"_T{tile}"
+
+
+def _suffix_ids(df, tile):
+    suffix = tile_suffix(tile)
+    if not suffix:
+        return df
+    df = df.copy()
+    for col in df.columns:
+        if col.lower() in ID_COLUMNS:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str) + suffix)
+    return df
+
+
+def _tile_offsets(copies, bounds, gap=0.05, jitter=0.0, seed=0):
+    """
+    Grid offsets (dx, dy) for ``copies`` tiles of a layer with ``bounds``.
+    ``jitter`` moves every tile (except the first) by up to that fraction of
+    the gap, so the copies are not perfectly regular.
+    """
+    width = bounds[2] - bounds[0]
+    height = bounds[3] - bounds[1]
+    columns = math.ceil(math.sqrt(copies))
+    rng = np.random.default_rng(seed)
+    offsets = []
+    for i in range(copies):
+        dx = (i % columns) * width * (1 + gap)
+        dy = (i // columns) * height * (1 + gap)
+        if jitter and i:
+            dx += rng.uniform(-jitter, jitter) * width * gap / 2
+            dy += rng.uniform(-jitter, jitter) * height * gap / 2
+        offsets.append((dx, dy))
+    return offsets
+
+
+def tile_layer(gdf, copies, offsets):
+    tiles = []
+    for tile in range(copies):
+        dx, dy = offsets[tile]
+        part = _suffix_ids(gdf, tile)
+        if dx or dy:
+            part = part.set_geometry(part.geometry.translate(xoff=dx, yoff=dy))
+        tiles.append(part)
+    return gpd.GeoDataFrame(pd.concat(tiles, ignore_index=True), geometry=gdf.geometry.name, crs=gdf.crs)
+
+
+def tile_table(df, copies):
+    return pd.concat([_suffix_ids(df, tile) for tile in range(copies)], ignore_index=True)
+
+
+def example_counts(source_dir=EXAMPLE_DIR):
+    """Number of features per layer in the example project, e.g. {"nbal": 87, ...}."""
+    return {
+        layer: len(gpd.read_file(path, ignore_geometry=True))
+        for layer, path in ((key[:-len("_shp")], path) for key, path in example_paths(source_dir).items() if key.endswith("_shp"))
+    }
+
+
+def copies_for(targets, counts):
+    """Tiles needed so every layer in ``targets`` (layer -> count) reaches its count."""
+    return max([1] + [math.ceil(n / counts[layer]) for layer, n in targets.items() if n])
+
+
+def build_upscaled_project(out_dir, copies, source_dir=EXAMPLE_DIR, prefix="synthetic", jitter=0.0, seed=0):
+    """
+    Write an upscaled copy of the example project (``copies`` tiles) to
+    ``out_dir``. Returns a dict of Project field name -> written path, with
+    the .shx/.prj/.dbf parts keyed like the model fields.
+    """
+    source = example_paths(source_dir)
+    written = {}
+
+    # the linked species sheets are the first thing to hit a hard limit
+    species_links = {key: pd.read_excel(source[key]) for key in ("miu_linked_species_excel", "nbal_linked_species_excel")}
+    for key, df in species_links.items():
+        if len(df) * copies >= EXCEL_MAX_ROWS:
+            raise ValueError(
+                f"{key} would have {len(df) * copies} rows, more than an Excel sheet can hold "
+                f"(at most {(EXCEL_MAX_ROWS - 1) // len(df)} copies of the example)."
+            )
+    os.makedirs(out_dir, exist_ok=True)
+
+    # one set of offsets for all layers so the tiles stay aligned
+    gis_mapping = gpd.read_file(source["gis_mapping_shp"])
+    offsets = _tile_offsets(copies, gis_mapping.total_bounds, jitter=jitter, seed=seed)
+
+    for layer in ("compartment", "gis_mapping", "miu", "nbal"):
+        gdf = gis_mapping if layer == "gis_mapping" else gpd.read_file(source[f"{layer}_shp"])
+        path = os.path.join(out_dir, f"{prefix}_{layer}.shp")
+        tile_layer(gdf, copies, offsets).to_file(path)
+        for part in SHAPEFILE_PARTS:
+            written[f"{layer}_{part}"] = os.path.splitext(path)[0] + f".{part}"
+
+    priorities = pd.read_csv(source["compartment_priorities_csv"])
+    path = os.path.join(out_dir, f"{prefix}_compartments_priorities.csv")
+    tile_table(priorities, copies).to_csv(path, index=False)
+    written["compartment_priorities_csv"] = path
+
+    for key, df in species_links.items():
+        path = os.path.join(out_dir, f"{prefix}_{key.split('_')[0].upper()}_linked_species.xlsx")
+        tile_table(df, copies).to_excel(path, index=False)
+        written[key] = path
+
+    return written
+
+
+def register_project(user, name, files):
+    """Create a Project for ``user`` from a field name -> path mapping."""
+    project = Project(user=user, name=name)
+    for field, path in files.items():
+        with open(path, "rb") as fh:
+            getattr(project, field).save(os.path.basename(path), File(fh), save=False)
+    project.save()
+    return project
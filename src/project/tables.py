@@ -0,0 +1,132 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Parsed project files. Reading the shapefiles and Excel sheets is the slow
+part of every project page, so the parsed tables are kept in the
+"project_files" cache keyed by the content of the file: its place in the
+content store (project/storage.py), so projects with the same files share
+their entries. Files outside the store are keyed by path, size and
+modification time. Stale entries are never served and simply expire.
+"""
+import json
+import math
+import os
+
+import geopandas as gpd
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from shapely.geometry import mapping
+
+from main import telemetry
+
+from .ingestion import DISPLAY_LAYER, artifact_path, read_layer, source_path
+from .storage import content_key
+
+# table key -> (tab label, project file field, reader, ingested layer)
+PROJECT_TABLES = {
+    "priorities": ("CSV: Compartment Priorities", "compartment_priorities_csv", "csv", "compartment_priorities"),
+    "miu_species": ("Excel: MIU Linked Species", "miu_linked_species_excel", "excel", "miu_linked_species"),
+    "nbal_species": ("Excel: NBAL Linked Species", "nbal_linked_species_excel", "excel", "nbal_linked_species"),
+    "compartments": ("Shapefile: Compartments", "compartment_shp", "shapefile", "compartment"),
+    "miu": ("Shapefile: MIU", "miu_shp", "shapefile", "miu"),
+    "nbal": ("Shapefile: NBAL", "nbal_shp", "shapefile", "nbal"),
+    "gis_mapping": ("Shapefile: GIS Mapping", "gis_mapping_shp", "shapefile", "gis_mapping"),
+}
+
+
+def project_file_cache():
+    return caches["project_files"]
+
+
+def cached(kind, path, build):
+    """Return build(path), cached per file content under ``kind``."""
+    cache = project_file_cache()
+    key = f"{kind}:{content_key(path)}"
+    value = cache.get(key)
+    if value is None:
+        value = build(path)
+        cache.set(key, value)
+    return value
+
+
+def _read_attributes(path, reader):
+    if reader == "csv":
+        with telemetry.stage("pd.read_csv"):
+            return pd.read_csv(path)
+    if reader == "excel":
+        with telemetry.stage("pd.read_excel"):
+            return pd.read_excel(path)
+    # shapefile attributes only, the map has its own endpoint
+    with telemetry.stage("gpd.read_file"):
+        return gpd.read_file(path, ignore_geometry=True)
+
+
+def read_table(project, key):
+    """Attribute table ``key`` (see PROJECT_TABLES) of a project as a DataFrame."""
+    _, field, reader, layer = PROJECT_TABLES[key]
+    artifact = artifact_path(project, layer)
+    if project.is_ready and os.path.exists(artifact):
+        return cached("table:artifact", artifact, lambda p: read_layer(project, layer, geometry=False))
+    path = source_path(project, field)
+    return cached(f"table:{reader}", path, lambda p: _read_attributes(p, reader))
+
+
+def table_metadata(project):
+    """Tabs for the detail page, without reading any file."""
+    tables = []
+    for key, (label, field, _, _) in PROJECT_TABLES.items():
+        file = getattr(project, field)
+        tables.append({
+            "key": key,
+            "label": label,
+            "file_name": project.upload_name(field),
+            "file_size": file.size if file and os.path.exists(file.path) else None,
+        })
+    return tables
+
+
+def table_page(project, key, page=1, page_size=None):
+    """One page of a table as a JSON-ready dict."""
+    page_size = page_size or settings.PROJECT_TABLE_PAGE_SIZE
+    df = read_table(project, key)
+    total = len(df)
+    num_pages = max(1, math.ceil(total / page_size))
+    page = min(max(1, page), num_pages)
+    start = (page - 1) * page_size
+
+    # to_json takes care of NaN -> null and timestamps
+    rows = json.loads(df.iloc[start:start + page_size].to_json(orient="values", date_format="iso"))
+    return {
+        "key": key,
+        "columns": [str(c) for c in df.columns],
+        "rows": rows,
+        "page": page,
+        "page_size": page_size,
+        "num_pages": num_pages,
+        "total_rows": total,
+    }
+
+
+def _gis_mapping_geojson(gis_mapping_df):
+    features = []
+    for compt_id, miu_id, nbal_id, geom in zip(gis_mapping_df["compt_id"], gis_mapping_df["miu_id"], gis_mapping_df["nbal_id"], gis_mapping_df.geometry):
+        features.append({
+            "type": "Feature",
+            "properties": {"name": f"Compartment: {compt_id}, MIU: {miu_id}, NBAL: {nbal_id}"},
+            "geometry": mapping(geom),
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "bbox": [float(b) for b in gis_mapping_df.total_bounds],
+        "features": features,
+    }
+
+
+def gis_mapping_geojson(project):
+    """GIS mapping polygons in EPSG:4326 as a GeoJSON FeatureCollection dict."""
+    artifact = artifact_path(project, DISPLAY_LAYER)
+    path = artifact if project.is_ready and os.path.exists(artifact) else source_path(project, "gis_mapping_shp")
+    return cached("geojson:gis_mapping", path, lambda p: _gis_mapping_geojson(read_layer(project, DISPLAY_LAYER)))
@@ -4,7 +4,7 @@ Author: Kirodh Boodhraj
 """
 # project/urls.py
 from django.urls import path, include
-from .views import project_view, project_list, project_create, project_detail, project_delete
+from .views import project_view, project_list, project_create, project_detail, project_delete, project_table, project_map
 app_name = 'project'
 
 urlpatterns = [
@@ -13,5 +13,7 @@ urlpatterns = [
     path('create/', project_create, name='project_create'),
     path('<int:pk>/', project_detail, name='project_detail'),
     path('<int:pk>/delete/', project_delete, name='project_delete'),
+    path('<int:pk>/table/<str:table>/', project_table, name='project_table'),
+    path('<int:pk>/map/', project_map, name='project_map'),
 ]
 
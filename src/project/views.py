@@ -6,18 +6,18 @@ Author: Kirodh Boodhraj
 import os
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-import pandas as pd
-import geopandas as gpd
 import shutil
-import json
-from django.utils.safestring import mark_safe
-from shapely.geometry import mapping
-from django.http import JsonResponse, HttpResponseServerError
+from django.conf import settings
+from django.http import JsonResponse, Http404
 
 from .models import (
     Project
 )
 from .forms import ProjectForm
+from .storage import blob_digest, release_files
+
+# .ingestion and .tables pull in pandas/geopandas, so the views below import
+# them on use and the list/form pages stay light
 
 # project home view
 def project_view(request):
@@ -45,6 +45,9 @@ def project_create(request):
             except Exception as e:
                 form.add_error(None, f"This project name already exists. {e}")
             else:
+                # validate + clean the files in the background
+                from .ingestion import schedule_ingestion
+                schedule_ingestion(project)
                 return redirect('project:project_list')
     else:
         form = ProjectForm()
@@ -55,133 +58,55 @@ def project_create(request):
 # project details view
 @login_required
 def project_detail(request, pk):
+    from .ingestion import requeue_stale
+    from .tables import table_metadata
     project = get_object_or_404(Project, pk=pk, user=request.user)
+    # ingestion cut short by a worker restart
+    requeue_stale(project)
 
-    # Load CSVs
-    csv_df = pd.read_csv(project.compartment_priorities_csv.path)
-
-    # Load Excel files
-    miu_df = pd.read_excel(project.miu_linked_species_excel.path)
-    nbal_df = pd.read_excel(project.nbal_linked_species_excel.path)
-
-    # Load shapefiles (only attributes table)
-    compartments_df = gpd.read_file(project.compartment_shp.path).drop(columns='geometry', errors='ignore')
-    miu_shp_df = gpd.read_file(project.miu_shp.path).drop(columns='geometry', errors='ignore')
-    nbal_shp_df = gpd.read_file(project.nbal_shp.path).drop(columns='geometry', errors='ignore')
-    gis_mapping_df = gpd.read_file(project.gis_mapping_shp.path) #.drop(columns='geometry', errors='ignore')
-    # Convert all column names to lowercase
-    gis_mapping_df.columns = gis_mapping_df.columns.str.lower() # for consistency
-
-    ### Convert geometries to GeoJSON for Leaflet
-     # first clean
-    if gis_mapping_df.crs != "EPSG:4326":
-        gis_mapping_df = gis_mapping_df.to_crs(epsg=4326)
-
-    # simplify geometry a bit
-    bounds = gis_mapping_df.total_bounds  # [minx, miny, maxx, maxy]
-    width = bounds[2] - bounds[0]
-    height = bounds[3] - bounds[1]
-    extent = max(width, height)
-
-    # e.g. simplify to ~1/5000 of map width
-    tolerance = extent / 5000
-    gis_mapping_df["geometry"] = gis_mapping_df["geometry"].buffer(0)  # fixes minor invalid polygons
-    gis_mapping_df["geometry"] = gis_mapping_df["geometry"].simplify(tolerance=tolerance, preserve_topology=True)
-
-
-    # Convert to GeoJSON-like dict
-    features = []
-    for _, row in gis_mapping_df.iterrows():
-        # Combine the three fields into a single string for the name
-        name_str = f"Compartment: {row['compt_id']}, MIU: {row['miu_id']}, NBAL: {row['nbal_id']}"
-        features.append({
-            "type": "Feature",
-            "properties": {"name": name_str},
-            # "geometry": json.loads(row["geometry"].to_json())
-            "geometry": mapping(row["geometry"])
-        })
-
-    polygon_geojson = {
-        "type": "FeatureCollection",
-        "features": features
-    }
-
-    # # Example GeoJSON (could be from shapefile processing)
-    # polygon_geojson = {
-    #     "type": "FeatureCollection",
-    #     "features": [
-    #         {
-    #             "type": "Feature",
-    #             "properties": {"name": "Polygon 1"},
-    #             "geometry": {
-    #                 "type": "Polygon",
-    #                 "coordinates": [
-    #                     [
-    #                         [19.2, -33.9],
-    #                         [19.21, -33.9],
-    #                         [19.21, -33.91],
-    #                         [19.2, -33.91],
-    #                         [19.2, -33.9]
-    #                     ]
-    #                 ]
-    #             }
-    #         },
-    #         {
-    #             "type": "Feature",
-    #             "properties": {"name": "Polygon 2"},
-    #             "geometry": {
-    #                 "type": "Polygon",
-    #                 "coordinates": [
-    #                     [
-    #                         [19.22, -33.88],
-    #                         [19.23, -33.88],
-    #                         [19.23, -33.89],
-    #                         [19.22, -33.89],
-    #                         [19.22, -33.88]
-    #                     ]
-    #                 ]
-    #             }
-    #         },
-    #         {
-    #             "type": "Feature",
-    #             "properties": {"name": "Polygon 3"},
-    #             "geometry": {
-    #                 "type": "Polygon",
-    #                 "coordinates": [
-    #                     [
-    #                         [19.18, -33.92],
-    #                         [19.19, -33.92],
-    #                         [19.19, -33.93],
-    #                         [19.18, -33.93],
-    #                         [19.18, -33.92]
-    #                     ]
-    #                 ]
-    #             }
-    #         }
-    #     ]
-    # }
-
-    # geometry to json end
-
-    # Drop the geometry columns for efficiency
-    gis_mapping_df = gis_mapping_df.drop(columns='geometry', errors='ignore')
-
+    # tables and map are fetched by the page from project_table / project_map
     context = {
         'project': project,
-        'csv_table': csv_df.to_html(classes='table table-striped', index=False),
-        'miu_table': miu_df.to_html(classes='table table-striped', index=False),
-        'nbal_table': nbal_df.to_html(classes='table table-striped', index=False),
-        'compartments_table': compartments_df.to_html(classes='table table-striped', index=False),
-        'miu_shp_table': miu_shp_df.to_html(classes='table table-striped', index=False),
-        'nbal_shp_table': nbal_shp_df.to_html(classes='table table-striped', index=False),
-        'gis_mapping_table': gis_mapping_df.to_html(classes='table table-striped', index=False),
-        # GeoJSON for map
-        'gis_mapping_geojson': json.dumps(polygon_geojson),
+        'tables': table_metadata(project),
+        'page_size': settings.PROJECT_TABLE_PAGE_SIZE,
     }
 
     return render(request, 'project/project_detail.html', context)
 
 
+# project table page view (json)
+@login_required
+def project_table(request, pk, table):
+    from .tables import PROJECT_TABLES, table_page
+    project = get_object_or_404(Project, pk=pk, user=request.user)
+    if table not in PROJECT_TABLES:
+        raise Http404("Unknown table")
+
+    try:
+        page = int(request.GET.get("page", 1))
+        page_size = min(int(request.GET.get("page_size", settings.PROJECT_TABLE_PAGE_SIZE)), 500)
+    except ValueError:
+        return JsonResponse({"error": "page and page_size must be integers"}, status=400)
+
+    try:
+        data = table_page(project, table, page, max(1, page_size))
+    except Exception as e:
+        return JsonResponse({"error": f"Could not read {PROJECT_TABLES[table][0]}: {e}"}, status=500)
+    return JsonResponse(data)
+
+
+# project map view (json)
+@login_required
+def project_map(request, pk):
+    from .tables import gis_mapping_geojson
+    project = get_object_or_404(Project, pk=pk, user=request.user)
+    try:
+        geojson = gis_mapping_geojson(project)
+    except Exception as e:
+        return JsonResponse({"error": f"Could not read the GIS mapping shapefile: {e}"}, status=500)
+    return JsonResponse(geojson)
+
+
 # project delete view
 @login_required
 def project_delete(request, pk):
@@ -189,18 +114,22 @@ def project_delete(request, pk):
 
     if request.method == 'POST':
 
-        # Remove project folder if it exists and is empty
+        # Remove the folder of a project uploaded before the content store
         try:
-            # Assuming project_directory_path saves all files under the same folder per project
-            project_folder = os.path.dirname(project.compartment_priorities_csv.path) if project.compartment_priorities_csv else None
-            if project_folder and os.path.isdir(project_folder):
-                shutil.rmtree(project_folder)
+            file = project.compartment_shp
+            if file and not blob_digest(file.name):
+                project_folder = os.path.dirname(file.path)
+                if os.path.isdir(project_folder):
+                    shutil.rmtree(project_folder)
         except Exception:
-            pass  # ignore if missing or not empty
+            pass  # ignore if missing
 
         # Finally delete project record
         project.delete()
 
+        # stored files are shared, only those no other project uses go
+        release_files(project)
+
         return redirect('project:project_list')
 
     return render(request, 'project/project_confirm_delete.html', {'project': project})
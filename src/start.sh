@@ -6,9 +6,13 @@ set -e
 : "${WEB_CONCURRENCY:=3}"
 : "${GUNICORN_THREADS:=4}"
 : "${DJANGO_MANAGE:=src/manage.py}"
+# wsgi: gthread workers, asgi: uvicorn workers (async visualization views)
+: "${SERVER_INTERFACE:=wsgi}"
+# 1: load the app (and the scientific stack) once in the master, workers share it
+: "${GUNICORN_PRELOAD:=1}"
 
 echo "Starting container with DJANGO_SETTINGS_MODULE=${DJANGO_SETTINGS_MODULE} ..."
-echo "WEB_CONCURRENCY=${WEB_CONCURRENCY}, GUNICORN_TIMEOUT=${GUNICORN_TIMEOUT}, THREADS=${GUNICORN_THREADS}"
+echo "WEB_CONCURRENCY=${WEB_CONCURRENCY}, GUNICORN_TIMEOUT=${GUNICORN_TIMEOUT}, THREADS=${GUNICORN_THREADS}, INTERFACE=${SERVER_INTERFACE}"
 
 # Run migrations & collectstatic (non-interactive)
 cd src
@@ -19,9 +23,31 @@ python manage.py migrate --noinput
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Preload: import the scientific stack in the gunicorn master only (after
+# migrate/collectstatic, which do not need it)
+PRELOAD_ARGS=""
+if [ "${GUNICORN_PRELOAD}" = "1" ]; then
+    PRELOAD_ARGS="--preload"
+    export WARMUP_IMPORTS=1
+fi
+
 # Start Gunicorn
-echo "Starting Gunicorn..."
 # Calculate workers: allow overriding via WEB_CONCURRENCY env var
+if [ "${SERVER_INTERFACE}" = "asgi" ]; then
+    echo "Starting Gunicorn with uvicorn workers..."
+    exec gunicorn main.asgi:application\
+        --chdir /app/src \
+        --bind 0.0.0.0:8000 \
+        --workers ${WEB_CONCURRENCY} \
+        --timeout ${GUNICORN_TIMEOUT} \
+        --worker-class uvicorn_worker.UvicornWorker \
+        ${PRELOAD_ARGS} \
+        --log-level info \
+        --access-logfile '-' \
+        --error-logfile '-'
+fi
+
+echo "Starting Gunicorn..."
 exec gunicorn main.wsgi:application\
     --chdir /app/src \
     --bind 0.0.0.0:8000 \
@@ -29,6 +55,7 @@ exec gunicorn main.wsgi:application\
     --threads ${GUNICORN_THREADS} \
     --timeout ${GUNICORN_TIMEOUT} \
     --worker-class gthread \
+    ${PRELOAD_ARGS} \
     --log-level info \
     --access-logfile '-' \
     --error-logfile '-'
@@ -64,7 +64,7 @@ class SpeciesForm(forms.ModelForm):
 
     def clean_treatment_frequency(self):
         value = self.cleaned_data.get('treatment_frequency')
-        allowed = [3, 4, 6, 12, 18, 24]
+        allowed = Species.TREATMENT_FREQUENCIES
         if value not in allowed:
             raise forms.ValidationError(
                 f"Invalid treatment frequency. Allowed values: {', '.join(map(str, allowed))} months."
@@ -72,6 +72,22 @@ class SpeciesForm(forms.ModelForm):
         return value
 
 
+
+# species import form: a CSV / XLSX species list added to the user's library
+class SpeciesImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV or Excel file in the layout of the species export (Species Name, Genus, Growth Form, WC ... NW, Initial Reduction ... Flow Coppice)."
+    )
+    on_conflict = forms.ChoiceField(
+        choices=[
+            ("update", "Update species I already have"),
+            ("skip", "Keep species I already have"),
+        ],
+        initial="update",
+        widget=forms.RadioSelect,
+        label="Species with a name you already use",
+    )
+
 # herbicide form
 class HerbicideForm(forms.ModelForm):
     class Meta:
@@ -106,6 +122,24 @@ class ClearingNormSetForm(forms.ModelForm):
         exclude = ['user']
 
 
+# clearing norm set import form: a new set from a .csv / .xlsx of norms
+class ClearingNormSetImportForm(forms.Form):
+    name = forms.CharField(max_length=100)
+    file = forms.FileField(
+        help_text="CSV or Excel file with columns Density, Process, Growth Form, Size Class, Treatment Method, Terrain, PPD."
+    )
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def clean_name(self):
+        name = self.cleaned_data['name'].strip()
+        if ClearingNormSet.objects.filter(name=name, user=self.user).exists():
+            raise ValidationError(_("You already have a clearing norm set with this name."))
+        return name
+
+
 # category form
 class CategoryForm(forms.ModelForm):
     class Meta:
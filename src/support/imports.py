@@ -0,0 +1,79 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Shared pieces of the support data file imports (norm_sets.py, species_library.py):
+reading an uploaded .csv / .xls(x) as text columns and reporting problems
+with the file rows they occur in.
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import Q
+
+from main import telemetry
+
+# rows listed per problem in an import error
+ERROR_SAMPLE = 10
+
+
+class ImportFileError(ValueError):
+    """An import file that can't be loaded, with every problem found."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def read_table_file(file):
+    """DataFrame of an uploaded .csv / .xls(x), every cell as text."""
+    name = file.name.lower()
+    try:
+        if name.endswith(".csv"):
+            with telemetry.stage("pd.read_csv"):
+                return pd.read_csv(file, dtype=str, keep_default_na=False)
+        if name.endswith((".xls", ".xlsx")):
+            with telemetry.stage("pd.read_excel"):
+                return pd.read_excel(file, dtype=str, keep_default_na=False)
+    except Exception as e:
+        raise ImportFileError([f"Could not read {file.name}: {e}"])
+    raise ImportFileError(["The file must be a .csv, .xls or .xlsx file."])
+
+
+def file_columns(df, expected):
+    """
+    File column -> column of ``df`` for the ``expected`` headers, matched in
+    any case. Raises ImportFileError naming the missing ones.
+    """
+    columns = {str(c).strip().lower(): c for c in df.columns}
+    missing = [c for c in expected if c.lower() not in columns]
+    if missing:
+        raise ImportFileError([f"Missing column(s): {', '.join(missing)}"])
+    if df.empty:
+        raise ImportFileError(["The file has no rows."])
+    return {c: columns[c.lower()] for c in expected}
+
+
+def file_rows(mask):
+    """File row numbers (header is row 1) of a mask, shortened."""
+    rows = (np.flatnonzero(mask) + 2).tolist()
+    listed = ", ".join(str(r) for r in rows[:ERROR_SAMPLE])
+    return listed + (f" and {len(rows) - ERROR_SAMPLE} more" if len(rows) > ERROR_SAMPLE else "")
+
+
+def parse_numbers(raw):
+    """Numbers of a text column, NaN where a cell is not a number."""
+    numbers = pd.to_numeric(raw, errors="coerce").astype(np.float64)
+    valid = numbers.notna()
+    # to_numeric may be off in the last digit, parse the valid ones exactly
+    numbers[valid] = raw[valid].astype(np.float64)
+    return numbers
+
+
+def name_ids(model, field, user):
+    """Lowercase name -> id of the user's and the default objects, the user's first."""
+    ids = {}
+    for pk, value, owner in model.objects.filter(Q(user=user) | Q(user__isnull=True)).values_list("pk", field, "user"):
+        key = value.strip().lower()
+        if key not in ids or owner is not None:
+            ids[key] = pk
+    return ids
@@ -1,373 +1,402 @@
+"""
+Load the default (user = None) support data: growth forms, treatment
+methods, species, herbicides, the APO Default clearing norms and the
+prioritisation categories.
+
+Each CSV is read once and diffed in memory against the defaults already in
+the database, keyed as below; new rows go in with bulk_create and rows whose
+other fields differ with bulk_update, all in one transaction. Running it
+again changes nothing. --dry-run prints the diff and rolls back. The search
+indexes (support/search.py) are rebuilt when anything changed.
+
+    growth forms / treatment methods   name
+    species / herbicides               name
+    clearing norms                     density, process, growth form, size class,
+                                       treatment method, terrain (ppd is updated)
+    categories                         name (weight is updated)
+    numeric bands / text values        category and range / value (priority is updated)
+"""
 import csv
+import os
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+
 from support.models import GrowthForm, TreatmentMethod, Species, Herbicide, ClearingNorm, ClearingNormSet, Category, NumericPriorityBand, TextPriorityValue
+from support.norms import bump_version
+from support.search import rebuild_index
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZE = 2000
+# bulk_update builds a CASE per field over the batch, small batches are quicker
+UPDATE_BATCH_SIZE = 100
+PROVINCES = ["WC", "NC", "KZN", "GTG", "MPL", "FS", "EC", "LMP", "NW"]
+
+GROWTH_FORMS = [
+    "All",
+    "Aquatic weed",
+    "Cactus",
+    "Creeper",
+    "Grass",
+    "Herbaceous",
+    "Non sprouting tree",
+    "Sprouting tree",
+]
+
+TREATMENT_METHODS = [
+    "Bark Strip",
+    "Basal Stem + diesel",
+    "Cut below ground",
+    "Cut & Spray",
+    "Cut & Spray + Diesel",
+    "Cut stump",
+    "Cut stump + diesel",
+    "Cut stump + oil",
+    "Dig out and burn",
+    "Felling",
+    "Foliar Spray",
+    "Frill",
+    "Hand pull",
+    "Lopping / Pruning",
+    "Manual Removal",
+    "Ring bark",
+    "Soil application",
+    "Spray from boat",
+    "Spray from shoreline (bakkie sakkie)",
+    "Spray from shoreline (knapsack)",
+    "Stem inject",
+]
+
+DEFAULT_NUMERIC_CATEGORIES = [
+    "Aggression", "Diversity", "Density", "Elevation", "Erosion", "Flood", "Forage",
+    "Fuel", "Invasion", "Products", "Quality", "Rain", "Riparian", "River",
+    "Runoff", "Seepage", "Siltation", "Slope", "Soil", "Stress", "Tourism",
+    "Treat", "Veld Age", "Zone"
+]
+
+DEFAULT_TEXT_CATEGORIES = ["Owner", "Vegetation Status"]
+
+CATEGORY_WEIGHTS = {
+    "Aggression": 0.23,
+    "Diversity": 0.49,
+    "Density": 0.14,
+    "Elevation": 0.43,
+    "Erosion": 0.17,
+    "Flood": 0.14,
+    "Forage": 0.41,
+    "Fuel": 0.29,
+    "Invasion": 0.34,
+    "Products": 0.12,
+    "Owner": 0.4,
+    "Quality": 0.21,
+    "Rain": 0.0,
+    "Riparian": 0.0,
+    "River": 0.0,
+    "Runoff": 0.5,
+    "Seepage": 0.09,
+    "Siltation": 0.56,
+    "Slope": 0.42,
+    "Soil": 0.34,
+    "Vegetation Status": 0.05,
+    "Stress": 0.1,
+    "Treat": 0.28,
+    "Tourism": 0.4,
+    "Veld Age": 0.23,
+    "Zone": 0.21,
+}
+
+NUMERIC_BANDS = {
+    "Aggression": [
+        (0, 10, 1),
+        (11, 20, 2),
+        (21, 30, 3),
+        (31, 40, 4),
+    ],
+    "Density": [
+        (0, 5, 1),
+        (6, 10, 2),
+        (11, 15, 3),
+        (16, 20, 4),
+        (21, 25, 5),
+        (26, 30, 6),
+        (31, 40, 7),
+        (41, 60, 8),
+        (61, 80, 9),
+        (81, 100, 10),
+    ],
+    "Elevation": [
+        (0, 400, 1),
+        (401, 800, 2),
+        (801, 1000, 3),
+        (1001, 1200, 4),
+        (1201, 1400, 5),
+        (1401, 1600, 6),
+        (1601, 1800, 7),
+        (1801, 2000, 8),
+    ],
+    "Erosion": [
+        (0, 10, 1),
+        (11, 20, 2),
+        (21, 30, 3),
+        (31, 40, 4),
+        (41, 50, 5),
+        (51, 60, 6),
+        (61, 70, 7),
+        (71, 80, 8),
+        (81, 90, 9),
+    ],
+    "Rain": [
+        (0, 200, 1),
+        (201, 400, 2),
+        (401, 600, 3),
+        (601, 800, 4),
+        (801, 1000, 5),
+        (1001, 1200, 6),
+        (1201, 1400, 7),
+        (1401, 1600, 8),
+        (1601, 1800, 9),
+        (1801, 2400, 10),
+        (2401, 3000, 11),
+    ],
+    "Riparian": [
+        (0, 3, 1),
+        (4, 7, 2),
+        (8, 11, 3),
+        (12, 15, 4),
+        (16, 19, 5),
+        (20, 23, 6),
+        (24, 27, 7),
+        (28, 31, 8),
+        (32, 35, 9),
+    ],
+    "Runoff": [
+        (0, 100, 1),
+        (101, 200, 2),
+        (201, 300, 3),
+        (301, 400, 4),
+        (401, 500, 5),
+        (501, 600, 6),
+        (601, 700, 7),
+        (701, 3500, 8),
+    ],
+    "Seepage": [
+        (0, 3, 1),
+        (4, 7, 2),
+        (8, 11, 3),
+        (12, 15, 4),
+        (16, 19, 5),
+        (20, 23, 6),
+        (24, 27, 7),
+        (28, 31, 8),
+        (32, 35, 9),
+    ],
+    "Siltation": [
+        (0, 100, 1),
+        (101, 200, 2),
+        (201, 300, 3),
+        (301, 400, 4),
+        (401, 500, 5),
+        (501, 600, 6),
+        (601, 700, 7),
+        (701, 800, 8),
+        (801, 900, 9),
+    ],
+    "Soil": [
+        (0, 1, 1),
+        (2, 3, 2),
+        (4, 5, 3),
+        (6, 7, 4),
+        (8, 9, 5),
+        (10, 11, 6),
+    ],
+    "Veld Age": [
+        (1, 5, 1),
+        (6, 10, 2),
+        (11, 15, 3),
+        (16, 20, 4),
+        (21, 25, 5),
+        (26, 30, 6),
+        (31, 35, 7),
+    ]
+}
+
+TEXT_VALUES = {
+    "Owner": [
+        ("CapeNature", 1),
+        ("Dam Surroundings", 2),
+        ("Farm", 3),
+        ("Home owner", 4),
+        ("Urban", 5),
+        ("Private mountain catchment", 6),
+        ("State Land", 7),
+    ],
+    "Vegetation Status": [
+        ("LT", 1),
+        ("E", 2),
+        ("DE", 3),
+        ("CE", 4),
+        ("T", 5),
+    ]
+}
+
+
+def read_csv(name):
+    with open(os.path.join(DATA_DIR, name), newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def name_ids(model, field):
+    """Name -> id of the default objects of ``model``."""
+    return dict(model.objects.filter(user=None).values_list(field, "pk"))
 
 
 class Command(BaseCommand):
     help = 'Load default data for the support app'
 
-    def handle(self, *args, **kwargs):
-        # Your custom logic here
-        #############################
-        ## Growth forms
-        #############################
-        # Run in shell or a migration
-        growth_form_defults = [
-            "All",
-            "Aquatic weed",
-            "Cactus",
-            "Creeper",
-            "Grass",
-            "Herbaceous",
-            "Non sprouting tree",
-            "Sprouting tree",
-        ]
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only print what would be added and updated, write nothing.')
 
-        for growth_form in growth_form_defults:
-            print("Loading growth form: ", growth_form)
-            GrowthForm.objects.get_or_create(growth_form=growth_form.lower(), user=None)
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.changes = 0
+        with transaction.atomic():
+            self.load()
+            if self.changes:
+                rebuild_index()
+            if dry_run:
+                transaction.set_rollback(True)
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was written.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Default data loaded successfully.'))
 
-        #############################
-        ## Treatment methods
-        #############################
+    def sync(self, label, model, rows, key, scope=None):
+        """
+        Bring the ``scope`` rows of ``model`` in line with ``rows`` (dicts of
+        field values): insert rows whose ``key`` fields are new, update the
+        other fields of rows that differ. Returns the number of changes.
+        """
+        fields = [field for field in rows[0] if field not in key] if rows else []
+        existing = {}
+        for current in model.objects.filter(**(scope or {})).order_by("pk").values("pk", *key, *fields):
+            existing.setdefault(tuple(current[k] for k in key), current)
 
-        treatment_method_defults = ["Bark Strip",
-                                    "Basal Stem + diesel",
-                                    "Cut below ground",
-                                    "Cut & Spray",
-                                    "Cut & Spray + Diesel",
-                                    "Cut stump",
-                                    "Cut stump + diesel",
-                                    "Cut stump + oil",
-                                    "Dig out and burn",
-                                    "Felling",
-                                    "Foliar Spray",
-                                    "Frill",
-                                    "Hand pull",
-                                    "Lopping / Pruning",
-                                    "Manual Removal",
-                                    "Ring bark",
-                                    "Soil application",
-                                    "Spray from boat",
-                                    "Spray from shoreline (bakkie sakkie)",
-                                    "Spray from shoreline (knapsack)",
-                                    "Stem inject",
-                                    ]
+        new, changed, changed_fields = [], [], set()
+        for row in rows:
+            current = existing.get(tuple(row[k] for k in key))
+            if current is None:
+                new.append(model(**row))
+                continue
+            differ = [field for field in fields if current[field] != row[field]]
+            if differ:
+                changed.append(model(pk=current["pk"], **{field: row[field] for field in fields}))
+                changed_fields.update(differ)
 
-        for treatment_method in treatment_method_defults:
-            print("Loading treatment method: ", treatment_method)
-            TreatmentMethod.objects.get_or_create(treatment_method=treatment_method.lower(), user=None)
+        model.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        if changed:
+            model.objects.bulk_update(changed, sorted(changed_fields), batch_size=UPDATE_BATCH_SIZE)
+        self.stdout.write(f"{label}: {len(new)} added, {len(changed)} updated, "
+                          f"{len(rows) - len(new) - len(changed)} unchanged")
+        self.changes += len(new) + len(changed)
+        return len(new) + len(changed)
 
+    def load(self):
         #############################
-        ## Species
+        ## Growth forms and treatment methods
         #############################
-        with open('support/management/commands/species.csv', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                print("Loading species: ", row['Genus'].title())
-                growth_form_obj = GrowthForm.objects.get(growth_form=(row['Growth Form']).lower(), user=None)
+        self.sync("Growth forms", GrowthForm,
+                  [{"growth_form": name.lower(), "user": None} for name in GROWTH_FORMS],
+                  key=["growth_form"], scope={"user": None})
+        self.sync("Treatment methods", TreatmentMethod,
+                  [{"treatment_method": name.lower(), "user": None} for name in TREATMENT_METHODS],
+                  key=["treatment_method"], scope={"user": None})
+        growth_forms = name_ids(GrowthForm, "growth_form")
+        treatment_methods = name_ids(TreatmentMethod, "treatment_method")
 
-                Species.objects.get_or_create(
-                    species_name=row['Species Name'].title(),
-                    user=None,
-                    defaults={
-                        # 'ref_id': int(row['Ref ID']),
-                        'genus': row['Genus'].title(),
-                        'english_name': row['English Name'].title(),
-                        'afrikaans_name': row['Afrikaans Name'].title(),
-                        'growth_form': growth_form_obj,
-                        'WC': bool(int(row['WC'])),
-                        'NC': bool(int(row['NC'])),
-                        'KZN': bool(int(row['KZN'])),
-                        'GTG': bool(int(row['GTG'])),
-                        'MPL': bool(int(row['MPL'])),
-                        'FS': bool(int(row['FS'])),
-                        'EC': bool(int(row['EC'])),
-                        'LMP': bool(int(row['LMP'])),
-                        'NW': bool(int(row['NW'])),
-                        'initial_reduction': row['Initial Reduction'],
-                        'follow_up_reduction': row['Follow-up Reduction'],
-                        'treatment_frequency': row['Treatment Frequency'],
-                        'densification': row['Densification'],
-                        'flow_optimal': row['Flow Optimal'],
-                        'flow_sub_optimal': row['Flow Sub Optimal'],
-                        'flow_young': row['Flow Young'],
-                        'flow_seedling': row['Flow Seedling'],
-                        'flow_coppice': row['Flow Coppice'],
-                    }
-                )
+        #############################
+        ## Species
+        #############################
+        species = [{
+            "species_name": row['Species Name'].title(),
+            "user": None,
+            "genus": row['Genus'].title(),
+            "english_name": row['English Name'].title(),
+            "afrikaans_name": row['Afrikaans Name'].title(),
+            "growth_form_id": growth_forms[row['Growth Form'].lower()],
+            **{province: bool(int(row[province])) for province in PROVINCES},
+            "initial_reduction": float(row['Initial Reduction']),
+            "follow_up_reduction": float(row['Follow-up Reduction']),
+            "treatment_frequency": int(row['Treatment Frequency']),
+            "densification": int(row['Densification']),
+            "flow_optimal": float(row['Flow Optimal']),
+            "flow_sub_optimal": float(row['Flow Sub Optimal']),
+            "flow_young": float(row['Flow Young']),
+            "flow_seedling": float(row['Flow Seedling']),
+            "flow_coppice": float(row['Flow Coppice']),
+        } for row in read_csv('species.csv')]
+        self.sync("Species", Species, species, key=["species_name", "user"], scope={"user": None})
 
         #############################
         ## Herbicides
         #############################
-        with open('support/management/commands/herbicides.csv', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                print("Loading herbicide: ", row['Herbicide'].title())
-
-                Herbicide.objects.get_or_create(
-                    herbicide=row['Herbicide'].title(),
-                    user=None,
-                    defaults={
-                        # 'ref_id': int(row['Ref ID']),
-                        'cost_per_litre': row['Cost/Ltr'],
-                        'litres_per_hectare': row['Ltr/HA'],
-                        'active_ingredient': row['Active Ingredient'].lower(),
-                        'registration_status': row['Registration'].lower(),
-                    }
-                )
-
-
+        herbicides = [{
+            "herbicide": row['Herbicide'].title(),
+            "user": None,
+            "cost_per_litre": float(row['Cost/Ltr']),
+            "litres_per_hectare": float(row['Ltr/HA']),
+            "active_ingredient": row['Active Ingredient'].lower(),
+            "registration_status": row['Registration'].lower(),
+        } for row in read_csv('herbicides.csv')]
+        self.sync("Herbicides", Herbicide, herbicides, key=["herbicide", "user"], scope={"user": None})
 
         #############################
         ## clearing norms
         #############################
-        # 1. create the clearing norm default set
-        clearing_norm_default_set, _ = ClearingNormSet.objects.get_or_create(
-            name="APO Default",
-            user=None,
-        )
-
-        # 2. create the norms in the default set
-        with open('support/management/commands/clearing_norm.csv', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            print("Loading clearing norms. May take a while...")
-            for row in reader:
-                growth_form_obj = GrowthForm.objects.get(growth_form=(row['Growth Form']).lower(), user=None)
-                # print((row['Treatment Method']).lower())
-                treatment_method_obj = TreatmentMethod.objects.get(treatment_method=(row['Treatment Method']).lower(), user=None)
-
-                ClearingNorm.objects.get_or_create(
-                    density=row['Density'],
-                    process=row['Process'].lower(),
-                    growth_form=growth_form_obj,
-                    size_class=row["Size Class"].lower(),
-                    treatment_method=treatment_method_obj,
-                    terrain=row["Terrain"].lower(),
-                    ppd=row["PPD"],
-                    clearing_norm_set=clearing_norm_default_set,
-                )
+        # bulk writes send no signals, the set's version is bumped below
+        norm_set, _ = ClearingNormSet.objects.get_or_create(name="APO Default", user=None)
+        norms = [{
+            "density": float(row['Density']),
+            "process": row['Process'].lower(),
+            "growth_form_id": growth_forms[row['Growth Form'].lower()],
+            "size_class": row["Size Class"].lower(),
+            "treatment_method_id": treatment_methods[row['Treatment Method'].lower()],
+            "terrain": row["Terrain"].lower(),
+            "ppd": float(row["PPD"]),
+            "clearing_norm_set_id": norm_set.pk,
+        } for row in read_csv('clearing_norm.csv')]
+        key = ["density", "process", "growth_form_id", "size_class", "treatment_method_id", "terrain", "clearing_norm_set_id"]
+        if self.sync("Clearing norms", ClearingNorm, norms, key=key, scope={"clearing_norm_set": norm_set}):
+            bump_version(norm_set.pk)
 
         #############################
         ## prioritization categories
         #############################
-        DEFAULT_NUMERIC_CATEGORIES = [
-            "Aggression", "Diversity", "Density", "Elevation", "Erosion", "Flood", "Forage",
-            "Fuel", "Invasion", "Products", "Quality", "Rain", "Riparian", "River",
-            "Runoff", "Seepage", "Siltation", "Slope", "Soil", "Stress", "Tourism",
-            "Treat", "Veld Age", "Zone"
+        # Category.save() lowercases the name, so do the rows here
+        categories = [
+            {"name": name.lower(), "category_type": category_type, "is_default": True, "user": None,
+             "weight": round(CATEGORY_WEIGHTS.get(name, 0), 3)}
+            for names, category_type in ((DEFAULT_NUMERIC_CATEGORIES, "numeric"), (DEFAULT_TEXT_CATEGORIES, "text"))
+            for name in names
         ]
-
-        DEFAULT_TEXT_CATEGORIES = ["Owner", "Vegetation Status"]
-
-        CATEGORY_WEIGHTS = {
-            "Aggression": 0.23,
-            "Diversity": 0.49,
-            "Density": 0.14,
-            "Elevation": 0.43,
-            "Erosion": 0.17,
-            "Flood": 0.14,
-            "Forage": 0.41,
-            "Fuel": 0.29,
-            "Invasion": 0.34,
-            "Products": 0.12,
-            "Owner": 0.4,
-            "Quality": 0.21,
-            "Rain": 0.0,
-            "Riparian": 0.0,
-            "River": 0.0,
-            "Runoff": 0.5,
-            "Seepage": 0.09,
-            "Siltation": 0.56,
-            "Slope": 0.42,
-            "Soil": 0.34,
-            "Vegetation Status": 0.05,
-            "Stress": 0.1,
-            "Treat": 0.28,
-            "Tourism": 0.4,
-            "Veld Age": 0.23,
-            "Zone": 0.21,
+        self.sync("Categories", Category, categories, key=["name", "category_type", "is_default", "user"],
+                  scope={"user": None, "is_default": True})
+        category_ids = {
+            name: pk for name, pk in Category.objects.filter(user=None, is_default=True).values_list("name", "pk")
         }
 
-        # Step 1: Create defaults
-        category_objs = {}
-        for cat in DEFAULT_NUMERIC_CATEGORIES:
-            obj, _ = Category.objects.get_or_create(
-                name=cat,
-                category_type='numeric',
-                is_default=True,
-                user=None,
-                defaults={'weight': CATEGORY_WEIGHTS.get(cat, 0)}
-            )
-            category_objs[cat] = obj
-
-        for cat in DEFAULT_TEXT_CATEGORIES:
-            obj, _ = Category.objects.get_or_create(
-                name=cat,
-                category_type='text',
-                is_default=True,
-                user=None,
-                defaults={'weight': CATEGORY_WEIGHTS.get(cat, 0)}
-            )
-            category_objs[cat] = obj
-
-        # Step 2: Add default priority bands for numeric categories
-        numeric_defaults = {
-            "Aggression": [
-                (0, 10, 1),
-                (11, 20, 2),
-                (21, 30, 3),
-                (31, 40, 4),
-            ],
-            "Density": [
-                (0, 5, 1),
-                (6, 10, 2),
-                (11, 15, 3),
-                (16, 20, 4),
-                (21, 25, 5),
-                (26, 30, 6),
-                (31, 40, 7),
-                (41, 60, 8),
-                (61, 80, 9),
-                (81, 100, 10),
-            ],
-            "Elevation": [
-                (0, 400, 1),
-                (401, 800, 2),
-                (801, 1000, 3),
-                (1001, 1200, 4),
-                (1201, 1400, 5),
-                (1401, 1600, 6),
-                (1601, 1800, 7),
-                (1801, 2000, 8),
-            ],
-            "Erosion": [
-                (0, 10, 1),
-                (11, 20, 2),
-                (21, 30, 3),
-                (31, 40, 4),
-                (41, 50, 5),
-                (51, 60, 6),
-                (61, 70, 7),
-                (71, 80, 8),
-                (81, 90, 9),
-            ],
-            "Rain": [
-                (0, 200, 1),
-                (201, 400, 2),
-                (401, 600, 3),
-                (601, 800, 4),
-                (801, 1000, 5),
-                (1001, 1200, 6),
-                (1201, 1400, 7),
-                (1401, 1600, 8),
-                (1601, 1800, 9),
-                (1801, 2400, 10),
-                (2401, 3000, 11),
-            ],
-            "Riparian": [
-                (0, 3, 1),
-                (4, 7, 2),
-                (8, 11, 3),
-                (12, 15, 4),
-                (16, 19, 5),
-                (20, 23, 6),
-                (24, 27, 7),
-                (28, 31, 8),
-                (32, 35, 9),
-            ],
-            "Runoff": [
-                (0, 100, 1),
-                (101, 200, 2),
-                (201, 300, 3),
-                (301, 400, 4),
-                (401, 500, 5),
-                (501, 600, 6),
-                (601, 700, 7),
-                (701, 3500, 8),
-            ],
-            "Seepage": [
-                (0, 3, 1),
-                (4, 7, 2),
-                (8, 11, 3),
-                (12, 15, 4),
-                (16, 19, 5),
-                (20, 23, 6),
-                (24, 27, 7),
-                (28, 31, 8),
-                (32, 35, 9),
-            ],
-            "Siltation": [
-                (0, 100, 1),
-                (101, 200, 2),
-                (201, 300, 3),
-                (301, 400, 4),
-                (401, 500, 5),
-                (501, 600, 6),
-                (601, 700, 7),
-                (701, 800, 8),
-                (801, 900, 9),
-            ],
-            "Soil": [
-                (0, 1, 1),
-                (2, 3, 2),
-                (4, 5, 3),
-                (6, 7, 4),
-                (8, 9, 5),
-                (10, 11, 6),
-            ],
-            "Veld Age": [
-                (1, 5, 1),
-                (6, 10, 2),
-                (11, 15, 3),
-                (16, 20, 4),
-                (21, 25, 5),
-                (26, 30, 6),
-                (31, 35, 7),
-            ]
-        }
-
-        for cat_name, bands in numeric_defaults.items():
-            print("Loading numeric categories: ", cat_name)
-
-            cat = category_objs[cat_name]
-            for low, high, priority in bands:
-                NumericPriorityBand.objects.get_or_create(
-                    category=cat,
-                    range_low=low,
-                    range_high=high,
-                    priority=priority
-                )
-
-        # Step 3: Add default text priority values
-        text_defaults = {
-            "Owner": [
-                ("CapeNature", 1),
-                ("Dam Surroundings", 2),
-                ("Farm", 3),
-                ("Home owner", 4),
-                ("Urban", 5),
-                ("Private mountain catchment", 6),
-                ("State Land", 7),
-            ],
-            "Vegetation Status": [
-                ("LT", 1),
-                ("E", 2),
-                ("DE", 3),
-                ("CE", 4),
-                ("T", 5),
-            ]
-        }
-
-        for cat_name, values in text_defaults.items():
-            print("Loading text categories: ", cat_name)
-
-            cat = category_objs[cat_name]
-            for value, priority in values:
-                TextPriorityValue.objects.get_or_create(
-                    category=cat,
-                    text_value=value,
-                    priority=priority
-                )
+        bands = [
+            {"category_id": category_ids[name.lower()], "range_low": float(low), "range_high": float(high), "priority": priority}
+            for name, ranges in NUMERIC_BANDS.items()
+            for low, high, priority in ranges
+        ]
+        self.sync("Numeric priority bands", NumericPriorityBand, bands, key=["category_id", "range_low", "range_high"],
+                  scope={"category_id__in": category_ids.values()})
 
-        self.stdout.write(self.style.SUCCESS('Default data loaded successfully.'))
+        values = [
+            {"category_id": category_ids[name.lower()], "text_value": value, "priority": priority}
+            for name, entries in TEXT_VALUES.items()
+            for value, priority in entries
+        ]
+        self.sync("Text priority values", TextPriorityValue, values, key=["category_id", "text_value"],
+                  scope={"category_id__in": category_ids.values()})
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0015_alter_category_weight_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clearingnormset',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:20
+
+from django.db import migrations
+
+# FTS5 tables of support/search.py as they were at this migration:
+# index -> model and the text columns (ORM paths) it holds
+INDEXES = {
+    'species': ('Species', ['species_name', 'english_name', 'afrikaans_name']),
+    'herbicide': ('Herbicide', ['herbicide']),
+    'clearing_norm': ('ClearingNorm', ['process', 'size_class', 'terrain',
+                                       'growth_form__growth_form', 'treatment_method__treatment_method']),
+}
+BATCH_SIZE = 900
+
+
+def create_search_indexes(apps, schema_editor):
+    # SQLite only (elsewhere the lists search with icontains); without FTS5
+    # trigram (SQLite < 3.34) no tables are made and search falls back too
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    for index, (model, paths) in INDEXES.items():
+        columns = [path.replace('__', '_') for path in paths]
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS support_search_{index} '
+                    f'USING fts5({", ".join(columns)}, tokenize="trigram")'
+                )
+            except Exception:
+                return
+            rows = [[pk, *('' if value is None else str(value) for value in values)]
+                    for pk, *values in apps.get_model('support', model).objects.values_list('pk', *paths)]
+            sql = (f'INSERT INTO support_search_{index} (rowid, {", ".join(columns)}) '
+                   f'VALUES ({", ".join(["%s"] * (len(columns) + 1))})')
+            for start in range(0, len(rows), BATCH_SIZE):
+                cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for index in INDEXES:
+            cursor.execute(f'DROP TABLE IF EXISTS support_search_{index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0016_clearing_norm_set_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
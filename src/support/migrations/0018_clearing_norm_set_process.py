@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0017_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clearingnorm',
+            index=models.Index(fields=['clearing_norm_set', 'process'], name='clearing_norm_set_process'),
+        ),
+    ]
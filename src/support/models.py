@@ -37,6 +37,9 @@ class TreatmentMethod(models.Model):
 
 # species model
 class Species(models.Model):
+    # months between treatments a species can be given
+    TREATMENT_FREQUENCIES = [3, 4, 6, 12, 18, 24]
+
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)  # null = default data
 
     species_name = models.CharField(max_length=200)
@@ -91,6 +94,8 @@ class ClearingNormSet(models.Model):
     """
     name = models.CharField(max_length=100)
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)  # null = default data
+    # goes up with every change to the norms, keys the cached norms (support/norms.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -136,6 +141,12 @@ class ClearingNorm(models.Model):
     def __str__(self):
         return f"{self.process} - {self.growth_form} - {self.size_class} ({self.terrain})"
 
+    class Meta:
+        indexes = [
+            # the norm list pages through each set in process order (support/norm_sets.py)
+            models.Index(fields=['clearing_norm_set', 'process'], name='clearing_norm_set_process'),
+        ]
+
 
 
 # choice options
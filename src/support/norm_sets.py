@@ -0,0 +1,198 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Whole clearing norm sets at once: clone a set (e.g. APO Default into a user
+set), export a set to CSV/XLSX, import one from such a file and list the
+norms of many sets a page at a time (norm_pages). The file
+layout is that of support/management/commands/clearing_norm.csv:
+
+    Density, Process, Growth Form, Size Class, Treatment Method, Terrain, PPD
+
+Imports are validated column by column over the whole table (no per-row
+queries) and inserted with bulk_create in one transaction. bulk_create sends
+no signals, so the set's version is bumped (support/norms.py) and its
+norms indexed for search (support/search.py) here.
+"""
+import io
+
+import pandas as pd
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from .imports import ERROR_SAMPLE, ImportFileError, file_columns, file_rows, name_ids, parse_numbers, read_table_file
+from .models import ClearingNorm, ClearingNormSet, GrowthForm, TreatmentMethod
+from .norms import bump_version
+from .search import index_queryset, search
+
+# file column -> model field
+FILE_COLUMNS = {
+    "Density": "density",
+    "Process": "process",
+    "Growth Form": "growth_form",
+    "Size Class": "size_class",
+    "Treatment Method": "treatment_method",
+    "Terrain": "terrain",
+    "PPD": "ppd",
+}
+CHOICE_FIELDS = {
+    "process": ClearingNorm.PROCESS_CHOICES,
+    "size_class": ClearingNorm.SIZE_CLASS_CHOICES,
+    "terrain": ClearingNorm.TERRAIN_CHOICES,
+}
+BATCH_SIZE = 2000
+NORMS_PER_PAGE = 10
+
+
+# -----------------------------
+# clone
+# -----------------------------
+def clone_norm_set(norm_set, user, name):
+    """Copy every norm of ``norm_set`` into a new set of ``user``."""
+    rows = norm_set.norms.values_list(
+        "density", "process", "growth_form_id", "size_class", "treatment_method_id", "terrain", "ppd"
+    )
+    with transaction.atomic():
+        clone = ClearingNormSet.objects.create(name=name, user=user)
+        ClearingNorm.objects.bulk_create([
+            ClearingNorm(density=density, process=process, growth_form_id=growth_form_id, size_class=size_class,
+                         treatment_method_id=treatment_method_id, terrain=terrain, ppd=ppd, clearing_norm_set=clone)
+            for density, process, growth_form_id, size_class, treatment_method_id, terrain, ppd in rows
+        ], batch_size=BATCH_SIZE)
+        bump_version(clone.pk)
+        index_queryset("clearing_norm", clone.norms.all())
+    return clone
+
+
+# -----------------------------
+# export
+# -----------------------------
+def norm_set_frame(norm_set):
+    """The norms of a set in the file layout."""
+    records = norm_set.norms.order_by("pk").values_list(
+        "density", "process", "growth_form__growth_form", "size_class",
+        "treatment_method__treatment_method", "terrain", "ppd",
+    )
+    return pd.DataFrame.from_records(records, columns=list(FILE_COLUMNS))
+
+
+def export_csv(norm_set):
+    return norm_set_frame(norm_set).to_csv(index=False)
+
+
+def export_xlsx(norm_set):
+    buffer = io.BytesIO()
+    norm_set_frame(norm_set).to_excel(buffer, index=False, sheet_name="Clearing norms")
+    return buffer.getvalue()
+
+
+# -----------------------------
+# import
+# -----------------------------
+def validate_norms(df, user):
+    """
+    Check a norm table in one pass per column and return the model field
+    values (DataFrame). Raises ImportFileError listing every problem.
+    """
+    columns = file_columns(df, FILE_COLUMNS)
+
+    errors = []
+    values = pd.DataFrame(index=df.index)
+    for column, field in FILE_COLUMNS.items():
+        raw = df[columns[column]].astype(str).str.strip()
+        if field in ("density", "ppd"):
+            numbers = parse_numbers(raw)
+            bad = numbers.isna() | (numbers < 0)
+            if bad.any():
+                errors.append(f"{column} must be a number of at least 0 (rows {file_rows(bad)})")
+            values[field] = numbers
+        elif field in CHOICE_FIELDS:
+            # stored as the choice value, matched in any case
+            choices = {value.lower(): value for value, _ in CHOICE_FIELDS[field]}
+            mapped = raw.str.lower().map(choices)
+            if mapped.isna().any():
+                errors.append(f"{column} must be one of {', '.join(choices.values())} (rows {file_rows(mapped.isna())})")
+            values[field] = mapped
+        else:
+            model, name_field = (GrowthForm, "growth_form") if field == "growth_form" else (TreatmentMethod, "treatment_method")
+            ids = name_ids(model, name_field, user)
+            mapped = raw.str.lower().map(ids)
+            if mapped.isna().any():
+                unknown = sorted(raw[mapped.isna()].unique())[:ERROR_SAMPLE]
+                errors.append(f"Unknown {column.lower()}(s) {', '.join(unknown)} (rows {file_rows(mapped.isna())})")
+            values[f"{field}_id"] = mapped
+
+    if not errors:
+        key = ["density", "process", "growth_form_id", "size_class", "treatment_method_id", "terrain"]
+        duplicated = values.duplicated(key, keep=False)
+        if duplicated.any():
+            errors.append(f"Norms given more than once (rows {file_rows(duplicated)})")
+    if errors:
+        raise ImportFileError(errors)
+    return values
+
+
+def import_norm_set(file, user, name):
+    """Create a set of ``user`` called ``name`` from an uploaded norm file."""
+    values = validate_norms(read_table_file(file), user)
+    with transaction.atomic():
+        norm_set = ClearingNormSet.objects.create(name=name, user=user)
+        ClearingNorm.objects.bulk_create([
+            ClearingNorm(clearing_norm_set=norm_set, **row)
+            for row in values.astype({"growth_form_id": int, "treatment_method_id": int}).to_dict("records")
+        ], batch_size=BATCH_SIZE)
+        bump_version(norm_set.pk)
+        index_queryset("clearing_norm", norm_set.norms.all())
+    return norm_set
+
+
+# -----------------------------
+# listing
+# -----------------------------
+def _page_number(value):
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def norm_pages(norm_sets, pages, query="", per_page=NORMS_PER_PAGE):
+    """
+    One page of the norms of every set in ``norm_sets``: {set id: Page}.
+    ``pages`` maps set id -> requested page number (1 when missing or
+    invalid, the last page when past the end, as Paginator.get_page).
+    ``query`` narrows the norms like the list search.
+
+    The queries don't depend on the number of sets: one count per set
+    (GROUP BY), the page rows of every set numbered with ROW_NUMBER() OVER
+    (PARTITION BY set ORDER BY process), and those rows with their growth
+    form and treatment method.
+    """
+    ids = [norm_set.pk for norm_set in norm_sets]
+    by_set = {pk: [] for pk in ids}
+    norms = search(ClearingNorm.objects.filter(clearing_norm_set_id__in=ids), "clearing_norm", query) if ids else None
+    totals = dict.fromkeys(ids, 0)
+    if norms is not None:
+        totals.update(norms.order_by().values_list("clearing_norm_set_id").annotate(total=Count("pk")))
+
+    starts = {}
+    for pk in ids:
+        last = max((totals[pk] - 1) // per_page, 0)
+        starts[pk] = min(_page_number(pages.get(pk)) - 1, last) * per_page
+
+    if any(totals.values()):
+        numbered = norms.annotate(
+            row=Window(RowNumber(), partition_by=[F("clearing_norm_set")], order_by=[F("process").asc(), F("pk").asc()]),
+            start=Case(*[When(clearing_norm_set_id=pk, then=Value(start)) for pk, start in starts.items()],
+                       default=Value(0), output_field=IntegerField()),
+        ).filter(row__gt=F("start"), row__lte=F("start") + per_page).order_by()
+        # ordered here, an ORDER BY would sort all the numbered rows first
+        rows = sorted(numbered.values_list("clearing_norm_set_id", "row", "pk"))
+        objects = ClearingNorm.objects.select_related("growth_form", "treatment_method").in_bulk([pk for _, _, pk in rows])
+        for set_id, _, pk in rows:
+            by_set[set_id].append(objects[pk])
+
+    # a Paginator over a range counts without queries
+    return {pk: Page(by_set[pk], starts[pk] // per_page + 1, Paginator(range(totals[pk]), per_page)) for pk in ids}
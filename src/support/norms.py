@@ -0,0 +1,53 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Clearing norms of a set as the DataFrame the MUCP data reader takes, read
+in one query and cached per set and version. ClearingNormSet.version goes up
+whenever a norm of the set is saved or deleted, a growth form or treatment
+method its norms name is renamed (support/signals.py) or the set is written
+in bulk (bump_version), so every process sees the change without clearing
+caches.
+
+There is no compiled ppd lookup (key codes, density breakpoints): the MUCP
+engine matches the norms itself from this frame, so nothing here would use it.
+"""
+import pandas as pd
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import ClearingNormSet
+
+# columns of the clearing norms DataFrame handed to the MUCP data reader
+NORM_COLUMNS = ["id", "clearing_norm_set", "growth_form", "treatment_method", "density", "ppd", "terrain", "size_class", "process"]
+
+NORMS_CACHE_TIMEOUT = 24 * 3600
+
+
+def bump_version(norm_set_id):
+    """Mark the cached norms of a norm set out of date."""
+    ClearingNormSet.objects.filter(pk=norm_set_id).update(version=F("version") + 1)
+
+
+def bump_versions(norms):
+    """bump_version for every norm set holding one of ``norms`` (a ClearingNorm queryset)."""
+    ClearingNormSet.objects.filter(pk__in=norms.values("clearing_norm_set")).update(version=F("version") + 1)
+
+
+def norm_frame(norm_set):
+    """The norms of a set with growth form / treatment method names, one query."""
+    records = norm_set.norms.order_by("pk").values_list(
+        "id", "clearing_norm_set", "growth_form__growth_form", "treatment_method__treatment_method",
+        "density", "ppd", "terrain", "size_class", "process",
+    )
+    return pd.DataFrame.from_records(records, columns=NORM_COLUMNS)
+
+
+def cached_norm_frame(norm_set):
+    """norm_frame of ``norm_set``, cached until one of its norms changes."""
+    key = f"norm_frame:{norm_set.pk}:{norm_set.version}"
+    frame = cache.get(key)
+    if frame is None:
+        frame = norm_frame(norm_set)
+        cache.set(key, frame, NORMS_CACHE_TIMEOUT)
+    return frame
@@ -0,0 +1,169 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Indexed search over the support data lists. On SQLite every index below is
+an FTS5 table with the trigram tokenizer (SQLite 3.34+), one row per object
+keyed by its pk:
+
+    species         species_name, english_name, afrikaans_name
+    herbicide       herbicide
+    clearing_norm   process, size_class, terrain, growth form and
+                    treatment method names
+
+A trigram MATCH finds the query anywhere in a column, ignoring case, like
+the icontains filters it replaces, but from the index. Queries shorter than
+three characters, other databases and databases without the tables (FTS5
+missing) use the icontains filters instead, with the same results.
+
+The tables follow the data through support/signals.py; code that writes with
+bulk_create / bulk_update calls index_queryset (or rebuild_index) itself.
+"""
+from django.db import connection, models
+
+from .models import ClearingNorm, Herbicide, Species
+
+# index -> model and the text columns (ORM paths) it holds
+SEARCH_INDEXES = {
+    "species": (Species, ["species_name", "english_name", "afrikaans_name"]),
+    "herbicide": (Herbicide, ["herbicide"]),
+    "clearing_norm": (ClearingNorm, ["process", "size_class", "terrain",
+                                     "growth_form__growth_form", "treatment_method__treatment_method"]),
+}
+# shortest query the trigram index answers
+MIN_QUERY_LENGTH = 3
+TYPEAHEAD_LIMIT = 10
+BATCH_SIZE = 900
+
+
+def table_name(index):
+    return f"support_search_{index}"
+
+
+def _column_names(index):
+    return [path.replace("__", "_") for path in SEARCH_INDEXES[index][1]]
+
+
+# (database name, index) of the tables seen, they are never dropped while running
+_found = set()
+
+
+def has_index(index, using=None):
+    """True when the FTS table of ``index`` exists in the (default) database."""
+    using = using or connection
+    if using.vendor != "sqlite":
+        return False
+    key = (str(using.settings_dict["NAME"]), index)
+    if key not in _found:
+        with using.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table_name(index)])
+            if cursor.fetchone() is None:
+                return False
+        _found.add(key)
+    return True
+
+
+# -----------------------------
+# building the index
+# -----------------------------
+def create_index(index, using, model=None):
+    """Create and fill the FTS table of ``index``; False when FTS5 trigram is missing."""
+    columns = ", ".join(_column_names(index))
+    with using.cursor() as cursor:
+        try:
+            cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {table_name(index)} USING fts5({columns}, tokenize="trigram")')
+        except Exception:
+            return False
+    _insert(index, (model or SEARCH_INDEXES[index][0]).objects.all(), using)
+    return True
+
+
+def drop_index(index, using):
+    with using.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name(index)}")
+    _found.discard((str(using.settings_dict["NAME"]), index))
+
+
+def _insert(index, queryset, using):
+    paths = SEARCH_INDEXES[index][1]
+    placeholders = ", ".join(["%s"] * (len(paths) + 1))
+    sql = f"INSERT INTO {table_name(index)} (rowid, {', '.join(_column_names(index))}) VALUES ({placeholders})"
+    rows = [[pk, *("" if value is None else str(value) for value in values)]
+            for pk, *values in queryset.values_list("pk", *paths).iterator(chunk_size=BATCH_SIZE)]
+    with using.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def _delete(index, pks, using):
+    with using.cursor() as cursor:
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start:start + BATCH_SIZE]
+            cursor.execute(f"DELETE FROM {table_name(index)} WHERE rowid IN ({', '.join(['%s'] * len(batch))})", batch)
+
+
+def index_queryset(index, queryset):
+    """(Re)index the objects of ``queryset``."""
+    if not has_index(index):
+        return
+    _delete(index, list(queryset.values_list("pk", flat=True)), connection)
+    _insert(index, queryset, connection)
+
+
+def unindex(index, pks):
+    if has_index(index):
+        _delete(index, list(pks), connection)
+
+
+def rebuild_index(index=None):
+    """Refill one or every index from the tables."""
+    for name in [index] if index else SEARCH_INDEXES:
+        if has_index(name):
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {table_name(name)}")
+            _insert(name, SEARCH_INDEXES[name][0].objects.all(), connection)
+
+
+# -----------------------------
+# querying
+# -----------------------------
+def _phrase(query):
+    # one FTS5 string: the whole query is matched as is, like icontains
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _contains(index, query):
+    q = models.Q()
+    for path in SEARCH_INDEXES[index][1]:
+        q |= models.Q(**{f"{path}__icontains": query})
+    return q
+
+
+def search(queryset, index, query):
+    """``queryset`` narrowed to the objects whose ``index`` columns contain ``query``."""
+    query = (query or "").strip()
+    if not query:
+        return queryset
+    if len(query) < MIN_QUERY_LENGTH or not has_index(index):
+        return queryset.filter(_contains(index, query))
+    matches = models.expressions.RawSQL(
+        f"SELECT rowid FROM {table_name(index)} WHERE {table_name(index)} MATCH %s", [_phrase(query)]
+    )
+    return queryset.filter(pk__in=matches)
+
+
+def typeahead(queryset, index, query, limit=TYPEAHEAD_LIMIT):
+    """
+    First ``limit`` matches of ``query`` in ``queryset`` as {"id", "text"},
+    those starting with the query first, then by name.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+    name = SEARCH_INDEXES[index][1][0]
+    objects = search(queryset, index, query).annotate(
+        search_prefix=models.Case(
+            models.When(**{f"{name}__istartswith": query}, then=0), default=1, output_field=models.IntegerField()
+        )
+    ).order_by("search_prefix", name, "pk")
+    return [{"id": obj.pk, "text": str(obj)} for obj in objects[:limit]]
@@ -0,0 +1,51 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+"""
+# support/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ClearingNorm, GrowthForm, Herbicide, Species, TreatmentMethod
+from .norms import bump_version, bump_versions
+from .search import SEARCH_INDEXES, index_queryset, unindex
+
+SEARCH_MODELS = {model: index for index, (model, _) in SEARCH_INDEXES.items()}
+
+
+# a saved or deleted norm makes the cached norms of its set out of date
+@receiver([post_save, post_delete], sender=ClearingNorm)
+def clearing_norm_changed(sender, instance, **kwargs):
+    bump_version(instance.clearing_norm_set_id)
+
+
+# keep the search indexes (support/search.py) in step with the data
+@receiver(post_save, sender=Species)
+@receiver(post_save, sender=Herbicide)
+@receiver(post_save, sender=ClearingNorm)
+def search_object_saved(sender, instance, **kwargs):
+    index_queryset(SEARCH_MODELS[sender], sender.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Species)
+@receiver(post_delete, sender=Herbicide)
+@receiver(post_delete, sender=ClearingNorm)
+def search_object_deleted(sender, instance, **kwargs):
+    unindex(SEARCH_MODELS[sender], [instance.pk])
+
+
+# the norm index and the cached norms hold growth form and treatment method names
+@receiver(post_save, sender=GrowthForm)
+def growth_form_saved(sender, instance, created, **kwargs):
+    if not created:
+        norms = ClearingNorm.objects.filter(growth_form=instance)
+        index_queryset("clearing_norm", norms)
+        bump_versions(norms)
+
+
+@receiver(post_save, sender=TreatmentMethod)
+def treatment_method_saved(sender, instance, created, **kwargs):
+    if not created:
+        norms = ClearingNorm.objects.filter(treatment_method=instance)
+        index_queryset("clearing_norm", norms)
+        bump_versions(norms)
@@ -0,0 +1,235 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Species library as a file: export every species a user can see and import
+a regional list in one go. The file layout is that of
+support/management/commands/species.csv:
+
+    Ref ID, Species Name, Genus, English Name, Afrikaans Name, Growth Form,
+    WC ... NW (0/1), Initial Reduction, Follow-up Reduction,
+    Treatment Frequency, Densification, Flow Optimal ... Flow Coppice
+
+Imports check each column over the whole table with the rules of
+SpeciesForm, resolve growth forms from one name -> id map and write with
+bulk_create / bulk_update in one transaction. A species the user already
+has (same name, any case) is updated or skipped.
+"""
+import csv
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.db import models, transaction
+from openpyxl import Workbook
+
+from .imports import ERROR_SAMPLE, ImportFileError, file_columns, file_rows, name_ids, parse_numbers, read_table_file
+from .models import GrowthForm, Species
+from .search import index_queryset
+
+NAME_COLUMNS = {
+    "Species Name": "species_name",
+    "Genus": "genus",
+    "English Name": "english_name",
+    "Afrikaans Name": "afrikaans_name",
+}
+PROVINCE_COLUMNS = ["WC", "NC", "KZN", "GTG", "MPL", "FS", "EC", "LMP", "NW"]
+# file column -> (model field, lowest, highest, whole number)
+NUMBER_COLUMNS = {
+    "Initial Reduction": ("initial_reduction", 0, 100, False),
+    "Follow-up Reduction": ("follow_up_reduction", 0, 100, False),
+    "Treatment Frequency": ("treatment_frequency", None, None, True),
+    "Densification": ("densification", 0, None, True),
+    "Flow Optimal": ("flow_optimal", 0, 1, False),
+    "Flow Sub Optimal": ("flow_sub_optimal", 0, 1, False),
+    "Flow Young": ("flow_young", 0, 1, False),
+    "Flow Seedling": ("flow_seedling", 0, 1, False),
+    "Flow Coppice": ("flow_coppice", 0, 1, False),
+}
+REQUIRED_COLUMNS = ["Species Name", "Genus", "Growth Form", *NUMBER_COLUMNS]
+EXPORT_COLUMNS = ["Ref ID", *NAME_COLUMNS, "Growth Form", *PROVINCE_COLUMNS, *NUMBER_COLUMNS]
+EXPORT_FIELDS = ["pk", *NAME_COLUMNS.values(), "growth_form__growth_form", *PROVINCE_COLUMNS,
+                 *[field for field, *_ in NUMBER_COLUMNS.values()]]
+
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+FALSE_VALUES = {"0", "false", "no", "n", ""}
+BATCH_SIZE = 1000
+# bulk_update builds a CASE per field over the batch, small batches are quicker
+UPDATE_BATCH_SIZE = 100
+
+
+# -----------------------------
+# export
+# -----------------------------
+def visible_species(user):
+    """Default species and those of ``user``, as export rows."""
+    return Species.objects.filter(
+        models.Q(user=user) | models.Q(user=None)
+    ).order_by("species_name", "pk").values_list(*EXPORT_FIELDS)
+
+
+def _export_row(row):
+    province = slice(6, 6 + len(PROVINCE_COLUMNS))
+    row = list(row)
+    row[province] = [int(flag) for flag in row[province]]
+    return row
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(user):
+    """CSV lines of the species library, for a StreamingHttpResponse."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in visible_species(user).iterator(chunk_size=BATCH_SIZE):
+        yield writer.writerow(_export_row(row))
+
+
+def write_xlsx(user):
+    """The species library as a write-only workbook in a temporary file (deleted on close)."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Species")
+    sheet.append(EXPORT_COLUMNS)
+    for row in visible_species(user).iterator(chunk_size=BATCH_SIZE):
+        sheet.append(_export_row(row))
+    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx")
+    workbook.save(tmp.name)
+    return tmp
+
+
+# -----------------------------
+# import
+# -----------------------------
+def validate_species(df, user):
+    """
+    Check a species table column by column and return the model field
+    values (DataFrame). Raises ImportFileError listing every problem with
+    its file rows.
+    """
+    columns = file_columns(df, REQUIRED_COLUMNS)
+    lowered = {str(c).strip().lower(): c for c in df.columns}
+
+    def text(column):
+        if column in columns:
+            return df[columns[column]].astype(str).str.strip()
+        if column.lower() in lowered:
+            return df[lowered[column.lower()]].astype(str).str.strip()
+        return None
+
+    errors = []
+    values = pd.DataFrame(index=df.index)
+    for column, field in NAME_COLUMNS.items():
+        raw = text(column)
+        if raw is None:
+            values[field] = None
+            continue
+        if column in REQUIRED_COLUMNS and (raw == "").any():
+            errors.append(f"{column} is required (rows {file_rows(raw == '')})")
+        max_length = Species._meta.get_field(field).max_length
+        too_long = raw.str.len() > max_length
+        if too_long.any():
+            errors.append(f"{column} is longer than {max_length} characters (rows {file_rows(too_long)})")
+        values[field] = raw.where(raw != "", None)
+
+    raw = text("Growth Form")
+    mapped = raw.str.lower().map(name_ids(GrowthForm, "growth_form", user))
+    if mapped.isna().any():
+        unknown = sorted(raw[mapped.isna()].unique())[:ERROR_SAMPLE]
+        errors.append(f"Unknown growth form(s) {', '.join(unknown)} (rows {file_rows(mapped.isna())})")
+    values["growth_form_id"] = mapped
+
+    for column in PROVINCE_COLUMNS:
+        raw = text(column)
+        if raw is None:
+            values[column] = False
+            continue
+        raw = raw.str.lower()
+        bad = ~raw.isin(TRUE_VALUES | FALSE_VALUES)
+        if bad.any():
+            errors.append(f"{column} must be 1 or 0 (rows {file_rows(bad)})")
+        values[column] = raw.isin(TRUE_VALUES)
+
+    for column, (field, low, high, whole) in NUMBER_COLUMNS.items():
+        numbers = parse_numbers(text(column))
+        bad = numbers.isna()
+        if whole:
+            bad |= numbers % 1 != 0
+        if field == "treatment_frequency":
+            bad |= ~numbers.isin(Species.TREATMENT_FREQUENCIES)
+            rule = f"one of {', '.join(map(str, Species.TREATMENT_FREQUENCIES))} months"
+        else:
+            if low is not None:
+                bad |= numbers < low
+            if high is not None:
+                bad |= numbers > high
+            kind = "a whole number" if whole else "a number"
+            rule = f"{kind} from {low} to {high}" if high is not None else f"{kind} of at least {low}"
+        if bad.any():
+            errors.append(f"{column} must be {rule} (rows {file_rows(bad)})")
+        values[field] = numbers
+
+    if not errors:
+        duplicated = values["species_name"].str.lower().duplicated(keep=False)
+        if duplicated.any():
+            errors.append(f"Species listed more than once (rows {file_rows(duplicated)})")
+    if errors:
+        raise ImportFileError(errors)
+
+    whole_fields = [field for field, *_, whole in NUMBER_COLUMNS.values() if whole]
+    return values.astype({"growth_form_id": np.int64, **{field: np.int64 for field in whole_fields}})
+
+
+def _changed(values, current):
+    """Mask of the cells of ``values`` that differ from ``current`` (same shape)."""
+    a, b = values.astype(object), current.astype(object)
+    return ~((a == b) | (a.isna() & b.isna()))
+
+
+def import_species(file, user, on_conflict="update"):
+    """
+    Add the species of an uploaded file to the library of ``user``. Species
+    the user already has are updated (on_conflict="update") or left as
+    they are ("skip"); only the fields that differ are written. Returns the
+    number created, updated and left as they were.
+    """
+    values = validate_species(read_table_file(file), user)
+    fields = list(values.columns)
+    current = pd.DataFrame.from_records(
+        Species.objects.filter(user=user).values_list("pk", *fields), columns=["pk", *fields]
+    )
+    current.index = current["species_name"].str.strip().str.lower()
+    current = current[~current.index.duplicated()]
+
+    names = values["species_name"].str.lower()
+    known = names.isin(current.index).to_numpy()
+    records = values[~known].astype(object).where(values[~known].notna(), None).to_dict("records")
+    new = [Species(user=user, **record) for record in records]
+
+    changed_rows, changed_fields = [], []
+    if on_conflict == "update" and known.any():
+        matched = current.loc[names[known]]
+        changed = _changed(values[known].reset_index(drop=True), matched[fields].reset_index(drop=True))
+        rows = changed.any(axis=1).to_numpy()
+        changed_fields = [field for field in fields if changed[field].any()]
+        update = values[known][rows][changed_fields]
+        changed_rows = [
+            Species(pk=int(pk), **record)
+            for pk, record in zip(matched["pk"][rows], update.astype(object).where(update.notna(), None).to_dict("records"))
+        ]
+
+    with transaction.atomic():
+        Species.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        if changed_rows:
+            Species.objects.bulk_update(
+                changed_rows, ["growth_form" if f == "growth_form_id" else f for f in changed_fields],
+                batch_size=UPDATE_BATCH_SIZE,
+            )
+        if new or changed_rows:
+            # bulk writes send no signals
+            index_queryset("species", Species.objects.filter(user=user))
+    return {"created": len(new), "updated": len(changed_rows), "skipped": int(known.sum()) - len(changed_rows)}
@@ -1,3 +1,146 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+"""
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from .imports import ImportFileError
+from .models import ClearingNorm, ClearingNormSet, GrowthForm, Species, TreatmentMethod
+from .norm_sets import norm_pages
+from .search import search
+from .species_library import import_species
+
+
+class NormPagesTests(TestCase):
+    """norm_pages gives every set the page Paginator.get_page would, in a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("planner")
+        cls.growth_form = GrowthForm.objects.create(growth_form="tree")
+        cls.treatment_method = TreatmentMethod.objects.create(treatment_method="fell")
+        cls.sets = [cls.norm_set(f"set {i}", norms) for i, norms in enumerate([25, 3, 0, 12, 7, 1])]
+
+    @classmethod
+    def norm_set(cls, name, count):
+        norm_set = ClearingNormSet.objects.create(name=name, user=cls.user)
+        for i in range(count):
+            ClearingNorm.objects.create(
+                clearing_norm_set=norm_set, growth_form=cls.growth_form, treatment_method=cls.treatment_method,
+                density=float(i), ppd=1.0, terrain="landscape", size_class="all",
+                process="Follow-up" if i % 3 else "Initial",
+            )
+        return norm_set
+
+    def expected_page(self, norm_set, number, per_page, query=""):
+        norms = norm_set.norms.order_by("process", "pk")
+        if query:
+            norms = norms.filter(process__icontains=query)
+        return Paginator(norms, per_page).get_page(number)
+
+    def assertPages(self, pages, requested, per_page, query=""):
+        for norm_set in self.sets[:len(pages)]:
+            expected = self.expected_page(norm_set, requested.get(norm_set.pk), per_page, query)
+            page = pages[norm_set.pk]
+            with self.subTest(norm_set=norm_set.name):
+                self.assertEqual([norm.pk for norm in page], [norm.pk for norm in expected])
+                self.assertEqual(page.number, expected.number)
+                self.assertEqual(page.paginator.count, expected.paginator.count)
+
+    def test_pages_match_paginator(self):
+        # second page, past the end (last page), invalid and missing (first page)
+        requested = {self.sets[0].pk: 2, self.sets[1].pk: 99, self.sets[3].pk: "x"}
+        pages = norm_pages(self.sets, requested, per_page=5)
+        self.assertEqual(set(pages), {norm_set.pk for norm_set in self.sets})
+        self.assertPages(pages, requested, per_page=5)
+
+    def test_query_narrows_every_set(self):
+        requested = {self.sets[0].pk: 2}
+        self.assertPages(norm_pages(self.sets, requested, query="follow", per_page=4), requested, 4, "follow")
+
+    def test_queries_do_not_grow_with_sets(self):
+        with CaptureQueriesContext(connection) as two:
+            norm_pages(self.sets[:2], {}, per_page=5)
+        with CaptureQueriesContext(connection) as six:
+            norm_pages(self.sets, {}, per_page=5)
+        self.assertEqual(len(two), len(six))
+
+
+SPECIES_HEADER = ("Species Name,Genus,English Name,Growth Form,WC,Initial Reduction,Follow-up Reduction,"
+                  "Treatment Frequency,Densification,Flow Optimal,Flow Sub Optimal,Flow Young,Flow Seedling,Flow Coppice")
+
+
+def species_file(*rows, name="species.csv"):
+    return SimpleUploadedFile(name, "\n".join([SPECIES_HEADER, *rows]).encode())
+
+
+class ImportSpeciesTests(TestCase):
+    """import_species adds new species, updates or keeps known ones and rejects bad files."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("planner")
+        cls.other = User.objects.create_user("other")
+        GrowthForm.objects.create(growth_form="Tree")
+
+    def species(self, name):
+        return Species.objects.get(user=self.user, species_name=name)
+
+    def test_creates_species(self):
+        counts = import_species(species_file(
+            "Acacia mearnsii,Acacia,Black wattle,tree,1,80,90,12,2,0.5,0.4,0.3,0.2,0.1",
+            "Pinus pinaster,Pinus,,TREE,0,70,85,6,1,0.5,0.4,0.3,0.2,0.1",
+        ), self.user)
+        self.assertEqual(counts, {"created": 2, "updated": 0, "skipped": 0})
+        wattle = self.species("Acacia mearnsii")
+        self.assertEqual((wattle.english_name, wattle.WC, wattle.treatment_frequency), ("Black wattle", True, 12))
+        self.assertIsNone(self.species("Pinus pinaster").english_name)
+        self.assertFalse(Species.objects.filter(user=self.other).exists())
+        # bulk writes are indexed for the list search
+        self.assertEqual(list(search(Species.objects.all(), "species", "wattle")), [wattle])
+
+    def test_updates_only_changed_species(self):
+        import_species(species_file(
+            "Acacia mearnsii,Acacia,Black wattle,tree,1,80,90,12,2,0.5,0.4,0.3,0.2,0.1",
+            "Pinus pinaster,Pinus,,tree,0,70,85,6,1,0.5,0.4,0.3,0.2,0.1",
+        ), self.user)
+        counts = import_species(species_file(
+            "Acacia mearnsii,Acacia,Black wattle,tree,1,80,90,12,2,0.5,0.4,0.3,0.2,0.1",
+            "pinus pinaster,Pinus,,tree,0,75,85,6,1,0.5,0.4,0.3,0.2,0.1",
+            "Hakea sericea,Hakea,Silky hakea,tree,1,60,80,24,3,0.5,0.4,0.3,0.2,0.1",
+        ), self.user)
+        self.assertEqual(counts, {"created": 1, "updated": 1, "skipped": 1})
+        # matched in any case, so updated rather than added
+        self.assertEqual(Species.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.species("pinus pinaster").initial_reduction, 75)
+
+    def test_skip_keeps_known_species(self):
+        import_species(species_file("Pinus pinaster,Pinus,,tree,0,70,85,6,1,0.5,0.4,0.3,0.2,0.1"), self.user)
+        counts = import_species(
+            species_file("Pinus pinaster,Pinus,,tree,0,75,85,6,1,0.5,0.4,0.3,0.2,0.1"), self.user, on_conflict="skip"
+        )
+        self.assertEqual(counts, {"created": 0, "updated": 0, "skipped": 1})
+        self.assertEqual(self.species("Pinus pinaster").initial_reduction, 70)
+
+    def test_rejects_bad_rows(self):
+        with self.assertRaises(ImportFileError) as raised:
+            import_species(species_file(
+                "Acacia mearnsii,Acacia,,shrub,1,80,90,12,2,0.5,0.4,0.3,0.2,0.1",
+                "Pinus pinaster,Pinus,,tree,maybe,170,85,5,1,0.5,0.4,0.3,0.2,0.1",
+            ), self.user)
+        errors = " ".join(raised.exception.errors)
+        for problem in ("Unknown growth form(s) shrub", "WC must be 1 or 0", "Initial Reduction must be",
+                        "Treatment Frequency must be one of"):
+            self.assertIn(problem, errors)
+        self.assertFalse(Species.objects.filter(user=self.user).exists())
+
+    def test_rejects_missing_columns_and_file_types(self):
+        with self.assertRaises(ImportFileError):
+            import_species(SimpleUploadedFile("species.csv", b"Species Name,Genus\nAcacia mearnsii,Acacia"), self.user)
+        with self.assertRaises(ImportFileError):
+            import_species(species_file(name="species.txt"), self.user)
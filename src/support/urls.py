@@ -3,12 +3,12 @@ MUCP TOOL
 Author: Kirodh Boodhraj
 """
 from django.urls import path
-from .views import support_view, growth_form_list, growth_form_create, growth_form_delete, growth_form_update
+from .views import support_view, support_typeahead, growth_form_list, growth_form_create, growth_form_delete, growth_form_update
 from .views import treatment_method_list, treatment_method_create, treatment_method_delete, treatment_method_update
-from .views import species_list, species_create, species_edit, species_delete, species_detail
+from .views import species_list, species_create, species_edit, species_delete, species_detail, species_import, species_export
 from .views import herbicide_list, herbicide_create, herbicide_delete, herbicide_update
-from .views import clearing_norm_list, clearing_norm_create, clearing_norm_delete, clearing_norm_update
-from .views import clearing_norm_set_create, clearing_norm_set_delete
+from .views import clearing_norm_list, clearing_norm_set_page, clearing_norm_create, clearing_norm_delete, clearing_norm_update
+from .views import clearing_norm_set_create, clearing_norm_set_delete, clearing_norm_set_clone, clearing_norm_set_export, clearing_norm_set_import
 from .views import costingmodel_list, costingmodel_create, costingmodel_delete, costingmodel_update
 from .views import cost_item_delete_daily, costing_item_add_daily, cost_item_update_daily, costing_item_list_daily
 from .views import category_list, category_delete, category_create, category_update
@@ -19,6 +19,7 @@ app_name = 'support'
 
 urlpatterns = [
     path('', support_view, name='support_view'),
+    path('search/<str:index>/', support_typeahead, name='support_typeahead'),
     # Growth forms
     path('growth-forms/', growth_form_list, name='growth_form_list'),
     path('growth-forms/create/', growth_form_create, name='growth_form_create'),
@@ -35,6 +36,8 @@ urlpatterns = [
     path('species/<int:pk>/edit/', species_edit, name='species_edit'),
     path('species/<int:pk>/delete/', species_delete, name='species_delete'),
     path('species/<int:pk>/', species_detail, name='species_detail'),   # <-- NEW
+    path('species/import/', species_import, name='species_import'),
+    path('species/export/', species_export, name='species_export'),
     # Herbicides
     path('herbicide/', herbicide_list, name='herbicide_list'),
     path('herbicide/create/', herbicide_create, name='herbicide_create'),
@@ -42,11 +45,15 @@ urlpatterns = [
     path('herbicide/<int:pk>/delete/', herbicide_delete, name='herbicide_delete'),
     # Clearing norms
     path('clearing-norm/', clearing_norm_list, name='clearing_norm_list'),
+    path('clearing-norm-set/<int:pk>/page/', clearing_norm_set_page, name='clearing_norm_set_page'),
     path('clearing-norm/create/', clearing_norm_create, name='clearing_norm_create'),
     path('clearing-norm/<int:pk>/edit/', clearing_norm_update, name='clearing_norm_update'),
     path('clearing-norm/<int:pk>/delete/', clearing_norm_delete, name='clearing_norm_delete'),
     path('clearing-norm-set/create/', clearing_norm_set_create, name='clearing_norm_set_create'),
     path('clearing-norm-set/<int:pk>/delete/', clearing_norm_set_delete, name='clearing_norm_set_delete'),
+    path('clearing-norm-set/<int:pk>/clone/', clearing_norm_set_clone, name='clearing_norm_set_clone'),
+    path('clearing-norm-set/<int:pk>/export/', clearing_norm_set_export, name='clearing_norm_set_export'),
+    path('clearing-norm-set/import/', clearing_norm_set_import, name='clearing_norm_set_import'),
 
     # prioritization model
     path('categories/', category_list, name='category_list'),
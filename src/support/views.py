@@ -4,7 +4,8 @@ Author: Kirodh Boodhraj
 """
 # views.py
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseForbidden
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.text import slugify
 
 from django.contrib.auth.decorators import login_required
 from django.db import models
@@ -12,8 +13,11 @@ from django.db import models
 from django.contrib import messages
 from django.core.paginator import Paginator
 
+from main.concurrency import streaming_content
+
 from .models import GrowthForm, TreatmentMethod, Species, Herbicide, ClearingNormSet, ClearingNorm, CostingModel, DailyCostItem, TextPriorityValue, NumericPriorityBand, Category
-from .forms import GrowthFormForm, TreatmentMethodForm, SpeciesForm, HerbicideForm, ClearingNormForm,ClearingNormSetForm, DailyCostItemForm, CostingModelForm, NumericPriorityBandForm, TextPriorityValueForm, CategoryForm
+from .search import SEARCH_INDEXES, search, typeahead
+from .forms import GrowthFormForm, TreatmentMethodForm, SpeciesForm, HerbicideForm, SpeciesImportForm, ClearingNormForm,ClearingNormSetForm, ClearingNormSetImportForm, DailyCostItemForm, CostingModelForm, NumericPriorityBandForm, TextPriorityValueForm, CategoryForm
 
 
 # support home view
@@ -21,6 +25,20 @@ def support_view(request):
     return render(request, 'support/support.html')
 
 
+# typeahead view: the first matches of ?q= among the default and own objects, as JSON
+@login_required
+def support_typeahead(request, index):
+    if index not in SEARCH_INDEXES:
+        return JsonResponse({"error": f"unknown list {index}"}, status=404)
+    model = SEARCH_INDEXES[index][0]
+    if model is ClearingNorm:
+        queryset = model.objects.filter(models.Q(clearing_norm_set__user=request.user) | models.Q(clearing_norm_set__user=None))
+        queryset = queryset.select_related('growth_form')
+    else:
+        queryset = model.objects.filter(models.Q(user=request.user) | models.Q(user=None))
+    return JsonResponse({"results": typeahead(queryset, index, request.GET.get('q', ''))})
+
+
 #############################
 ## Growth Forms
 #############################
@@ -137,17 +155,8 @@ def species_list(request):
     default_species = Species.objects.filter(user=None).order_by('species_name')
     user_species = Species.objects.filter(user=request.user).order_by('species_name')
 
-    if search_query:
-        default_species = default_species.filter(
-            models.Q(species_name__icontains=search_query) |
-            models.Q(english_name__icontains=search_query) |
-            models.Q(afrikaans_name__icontains=search_query)
-        )
-        user_species = user_species.filter(
-            models.Q(species_name__icontains=search_query) |
-            models.Q(english_name__icontains=search_query) |
-            models.Q(afrikaans_name__icontains=search_query)
-        )
+    default_species = search(default_species, 'species', search_query)
+    user_species = search(user_species, 'species', search_query)
 
     paginator_default = Paginator(default_species, 10)
     paginator_user = Paginator(user_species, 10)
@@ -203,6 +212,41 @@ def species_delete(request, pk):
         return redirect('support:species_list')
     return render(request, 'support/species_confirm_delete.html', {'object': species})
 
+# species import view: a CSV / XLSX species list into the user's library
+@login_required
+def species_import(request):
+    from .imports import ImportFileError
+    from .species_library import import_species
+
+    if request.method == 'POST':
+        form = SpeciesImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                counts = import_species(form.cleaned_data['file'], request.user, form.cleaned_data['on_conflict'])
+            except ImportFileError as e:
+                for error in e.errors:
+                    form.add_error('file', error)
+            else:
+                messages.success(request, f"Species imported: {counts['created']} added, {counts['updated']} updated, {counts['skipped']} kept as they were.")
+                return redirect('support:species_list')
+    else:
+        form = SpeciesImportForm()
+    return render(request, 'support/species_import.html', {'form': form})
+
+# species export view: default and own species as streamed CSV or XLSX
+@login_required
+def species_export(request):
+    from .species_library import csv_lines, write_xlsx
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format == 'xlsx':
+        return FileResponse(write_xlsx(request.user), as_attachment=True, filename="species.xlsx")
+    if export_format != 'csv':
+        return JsonResponse({"error": "format must be csv or xlsx"}, status=400)
+    response = StreamingHttpResponse(streaming_content(request, csv_lines(request.user)), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="species.csv"'
+    return response
+
 
 #############################
 ## Herbicides
@@ -216,9 +260,8 @@ def herbicide_list(request):
     user_herbicides_qs = Herbicide.objects.filter(user=request.user).order_by('herbicide')
     default_herbicides_qs = Herbicide.objects.filter(user=None).order_by('herbicide')
 
-    if search_query:
-        user_herbicides_qs = user_herbicides_qs.filter(herbicide__icontains=search_query)
-        default_herbicides_qs = default_herbicides_qs.filter(herbicide__icontains=search_query)
+    user_herbicides_qs = search(user_herbicides_qs, 'herbicide', search_query)
+    default_herbicides_qs = search(default_herbicides_qs, 'herbicide', search_query)
 
     user_paginator = Paginator(user_herbicides_qs.order_by('herbicide'), 10)
     default_paginator = Paginator(default_herbicides_qs.order_by('herbicide'), 10)
@@ -284,47 +327,43 @@ def herbicide_delete(request, pk):
 # clearing norms list view
 @login_required
 def clearing_norm_list(request):
+    from .norm_sets import norm_pages
+
     search_query = request.GET.get('q', '')
 
     # Default set(s) created by the system (no user assigned)
-    default_sets = ClearingNormSet.objects.filter(user=None).order_by('name')
+    default_sets = list(ClearingNormSet.objects.filter(user=None).order_by('name'))
 
     # User-created sets
-    user_sets = ClearingNormSet.objects.filter(user=request.user).order_by('name')
-
-    # Handle search filtering at the norm level
-    def get_filtered_norms(norms_queryset):
-        if search_query:
-            norms_queryset = norms_queryset.filter(
-                models.Q(process__icontains=search_query) |
-                models.Q(size_class__icontains=search_query) |
-                models.Q(terrain__icontains=search_query) |
-                models.Q(treatment_method__treatment_method__icontains=search_query) |
-                models.Q(growth_form__growth_form__icontains=search_query)
-            )
-        return norms_queryset
-
-    # Pagination for each set's norms
-    paginated_default_sets = []
-    for norm_set in default_sets:
-        norms = get_filtered_norms(norm_set.norms.all().order_by('process'))
-        paginator = Paginator(norms, 10)
-        page_number = request.GET.get(f'default_set_{norm_set.id}_page')
-        page_obj = paginator.get_page(page_number)
-        paginated_default_sets.append((norm_set, page_obj))
-
-    paginated_user_sets = []
-    for norm_set in user_sets:
-        norms = get_filtered_norms(norm_set.norms.all().order_by('process'))
-        paginator = Paginator(norms, 10)
-        page_number = request.GET.get(f'user_set_{norm_set.id}_page')
-        page_obj = paginator.get_page(page_number)
-        paginated_user_sets.append((norm_set, page_obj))
+    user_sets = list(ClearingNormSet.objects.filter(user=request.user).order_by('name'))
+
+    # One page of every set, all from one query
+    pages = {norm_set.id: request.GET.get(f'default_set_{norm_set.id}_page') for norm_set in default_sets}
+    pages.update({norm_set.id: request.GET.get(f'user_set_{norm_set.id}_page') for norm_set in user_sets})
+    page_objs = norm_pages(default_sets + user_sets, pages, search_query)
 
     return render(request, 'support/clearing_norm_list.html', {
         'search_query': search_query,
-        'paginated_default_sets': paginated_default_sets,
-        'paginated_user_sets': paginated_user_sets
+        'paginated_default_sets': [(norm_set, page_objs[norm_set.id]) for norm_set in default_sets],
+        'paginated_user_sets': [(norm_set, page_objs[norm_set.id]) for norm_set in user_sets],
+    })
+
+# clearing norms set page view: one page of one set, for the list pagination (AJAX)
+@login_required
+def clearing_norm_set_page(request, pk):
+    from .norm_sets import norm_pages
+
+    norm_set = get_object_or_404(ClearingNormSet, models.Q(user=request.user) | models.Q(user=None), pk=pk)
+    search_query = request.GET.get('q', '')
+    page_obj = norm_pages([norm_set], {norm_set.id: request.GET.get('page')}, search_query)[norm_set.id]
+    editable = norm_set.user_id is not None
+    return render(request, 'support/clearing_norm_set_page.html', {
+        'norm_set': norm_set,
+        'page_obj': page_obj,
+        'search_query': search_query,
+        'kind': 'user' if editable else 'default',
+        'editable': editable,
+        'show_pagination': True,
     })
 
 
@@ -414,6 +453,65 @@ def clearing_norm_set_delete(request, pk):
         return redirect('support:clearing_norm_list')
     return render(request, 'support/clearing_norm_set_confirm_delete.html', {'object': norm_set})
 
+# clearing norms set clone view: copies a default or own set into a new set of the user
+@login_required
+def clearing_norm_set_clone(request, pk):
+    from .norm_sets import clone_norm_set
+
+    source = get_object_or_404(ClearingNormSet, models.Q(user=request.user) | models.Q(user=None), pk=pk)
+    if request.method == 'POST':
+        form = ClearingNormSetForm(request.POST)
+        if form.is_valid():
+            name = form.cleaned_data['name']
+            if ClearingNormSet.objects.filter(name=name, user=request.user).exists():
+                form.add_error('name', "You already have a clearing norm set with this name.")
+            else:
+                clone = clone_norm_set(source, request.user, name)
+                messages.success(request, f"Copied {clone.norms.count()} norms of {source.name} into {clone.name}.")
+                return redirect('support:clearing_norm_list')
+    else:
+        form = ClearingNormSetForm(initial={'name': f"{source.name} (copy)"})
+    return render(request, 'support/clearing_norm_set_form.html', {'form': form, 'source': source})
+
+# clearing norms set export view: the whole set as CSV or XLSX
+@login_required
+def clearing_norm_set_export(request, pk):
+    from .norm_sets import export_csv, export_xlsx
+
+    norm_set = get_object_or_404(ClearingNormSet, models.Q(user=request.user) | models.Q(user=None), pk=pk)
+    export_format = request.GET.get('format', 'csv')
+    filename = slugify(norm_set.name) or 'clearing_norms'
+    if export_format == 'xlsx':
+        response = HttpResponse(export_xlsx(norm_set), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+        return response
+    if export_format != 'csv':
+        return JsonResponse({"error": "format must be csv or xlsx"}, status=400)
+    response = HttpResponse(export_csv(norm_set), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+# clearing norms set import view: a new set from an uploaded CSV / XLSX
+@login_required
+def clearing_norm_set_import(request):
+    from .imports import ImportFileError
+    from .norm_sets import import_norm_set
+
+    if request.method == 'POST':
+        form = ClearingNormSetImportForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            try:
+                norm_set = import_norm_set(form.cleaned_data['file'], request.user, form.cleaned_data['name'])
+            except ImportFileError as e:
+                for error in e.errors:
+                    form.add_error('file', error)
+            else:
+                messages.success(request, f"Imported {norm_set.norms.count()} norms into {norm_set.name}.")
+                return redirect('support:clearing_norm_list')
+    else:
+        form = ClearingNormSetImportForm(user=request.user)
+    return render(request, 'support/clearing_norm_set_import.html', {'form': form})
+
 
 
 # -------------------------
@@ -0,0 +1,148 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Per-compartment aggregates of a scenario for comparing plannings: one
+[year x compartment] array per metric, built with a single pass over the
+scenario years (iter_budget_frames) and kept in the "results" cache. Saved
+results never change, so the BudgetScenario id is the cache key; the
+aggregates are precomputed when a simulation is saved.
+
+Plannings are compared by aligning their arrays on the union of years and
+(normalised) compartment ids; everything after that is numpy.
+"""
+import numpy as np
+import pandas as pd
+from django.core.cache import caches
+
+from project.entities import entity_index, normalize_id
+
+from .results import iter_budget_frames
+
+SUM_METRICS = ["cost", "person_days", "flow"]
+COMPARE_METRICS = SUM_METRICS + ["density"]
+MAX_COMPARED = 8
+
+
+def _compartments(project):
+    """Compartment code per entity key (-1 without a compt_id), normalised ids and labels."""
+    index = entity_index(project)
+    codes, normalized = pd.factorize(normalize_id(index["compt_id"]).to_numpy())
+    valid = np.flatnonzero(codes >= 0)
+    _, first = np.unique(codes[valid], return_index=True)
+    return codes, np.asarray(normalized, dtype=object), index["compt_id"][valid[first]]
+
+
+def build_aggregates(budget):
+    codes, normalized, labels = _compartments(budget.planning.project)
+    n = len(normalized)
+    years = []
+    per_compartment = {metric: [] for metric in SUM_METRICS + ["density_sum", "density_count"]}
+    totals = {metric: [] for metric in COMPARE_METRICS}
+
+    for yearly_result, frame in iter_budget_frames(budget, COMPARE_METRICS):
+        years.append(yearly_result.year)
+        code = codes[frame["entity_key"].to_numpy(dtype=np.int64)]
+        valid = code >= 0
+        for metric in SUM_METRICS:
+            values = np.nan_to_num(frame[metric].to_numpy(dtype=np.float64, na_value=np.nan))
+            per_compartment[metric].append(np.bincount(code[valid], weights=values[valid], minlength=n))
+            totals[metric].append(values.sum())
+
+        density = frame["density"].to_numpy(dtype=np.float64, na_value=np.nan)
+        has = valid & ~np.isnan(density)
+        per_compartment["density_sum"].append(np.bincount(code[has], weights=density[has], minlength=n))
+        per_compartment["density_count"].append(np.bincount(code[has], minlength=n))
+        # same as the timeseries: mean over the rows with a density > 0
+        positive = density[~np.isnan(density) & (density > 0)]
+        totals["density"].append(positive.mean() if len(positive) else 0.0)
+
+    aggregates = {
+        "years": np.asarray(years, dtype=np.int64),
+        "compartments": normalized,
+        "labels": labels,
+        "totals": {metric: np.asarray(values, dtype=np.float64) for metric, values in totals.items()},
+    }
+    for metric, rows in per_compartment.items():
+        aggregates[metric] = np.vstack(rows) if rows else np.zeros((0, n))
+    return aggregates
+
+
+def scenario_aggregates(budget):
+    """Aggregates of a BudgetScenario, from the cache or built and cached."""
+    cache = caches["results"]
+    key = f"aggregates:{budget.pk}"
+    aggregates = cache.get(key)
+    if aggregates is None:
+        aggregates = build_aggregates(budget)
+        cache.set(key, aggregates)
+    return aggregates
+
+
+def precompute_aggregates(planning):
+    for budget in planning.budgets.all():
+        scenario_aggregates(budget)
+
+
+def compartment_values(aggregates, metric):
+    """[year x compartment] array of ``metric`` (density as a mean, NaN without rows)."""
+    if metric != "density":
+        return aggregates[metric]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(aggregates["density_count"] > 0, aggregates["density_sum"] / aggregates["density_count"], np.nan)
+
+
+def align(aggregates_list):
+    """
+    Union of years and compartments of several plannings, with the positions
+    of every planning's years / compartments in them.
+    """
+    years = np.unique(np.concatenate([a["years"] for a in aggregates_list]))
+    compartments = np.unique(np.concatenate([a["compartments"] for a in aggregates_list]).astype(str))
+    positions = [
+        (np.searchsorted(years, a["years"]), np.searchsorted(compartments, a["compartments"].astype(str)))
+        for a in aggregates_list
+    ]
+    labels = np.empty(len(compartments), dtype=object)
+    for a, (_, compartment_pos) in zip(reversed(aggregates_list), reversed(positions)):
+        labels[compartment_pos] = a["labels"]  # first planning's spelling wins
+    return years, compartments, labels, positions
+
+
+def compare(aggregates_list, year=None, sort_metric="cost", limit=200):
+    """
+    Aligned per-year totals and per-compartment values (for ``year``, default
+    the last year) of several plannings, with deltas against the first one.
+    Compartments are limited to the ``limit`` largest absolute deltas in
+    ``sort_metric``.
+    """
+    years, compartments, labels, positions = align(aggregates_list)
+    if year is None or year not in years:
+        year = int(years[-1]) if len(years) else None
+
+    yearly, compartment = {}, {}
+    for metric in COMPARE_METRICS:
+        yearly[metric] = np.full((len(aggregates_list), len(years)), np.nan)
+        compartment[metric] = np.full((len(aggregates_list), len(compartments)), np.nan)
+        for i, (a, (year_pos, compartment_pos)) in enumerate(zip(aggregates_list, positions)):
+            yearly[metric][i, year_pos] = a["totals"][metric]
+            own_year = np.flatnonzero(a["years"] == year)
+            if len(own_year):
+                compartment[metric][i, compartment_pos] = compartment_values(a, metric)[own_year[0]]
+
+    yearly_delta = {metric: values - values[0] for metric, values in yearly.items()}
+    compartment_delta = {metric: values - values[0] for metric, values in compartment.items()}
+
+    # most changed compartments first
+    spread = np.nan_to_num(np.abs(compartment_delta[sort_metric])).max(axis=0) if len(compartments) else np.zeros(0)
+    order = np.argsort(-spread, kind="stable")[:limit]
+    return {
+        "years": years,
+        "year": year,
+        "compartments": labels[order],
+        "total_compartments": len(compartments),
+        "yearly": yearly,
+        "yearly_delta": yearly_delta,
+        "compartment": {metric: values[:, order] for metric, values in compartment.items()},
+        "compartment_delta": {metric: values[:, order] for metric, values in compartment_delta.items()},
+    }
@@ -0,0 +1,90 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Export of the full results of a planning: every scenario x year x row.
+
+Years are produced one at a time (iter_budget_frames rolls the deltas
+forward), so memory depends on the size of one year, not the whole plan:
+
+    csv_chunks()   text chunks for a StreamingHttpResponse
+    write_xlsx()   openpyxl write-only workbook, one sheet per scenario,
+                   written to a file that is streamed afterwards
+"""
+import io
+
+import numpy as np
+from openpyxl import Workbook
+
+from project.entities import ID_COLUMNS, entity_index
+
+from .models import BudgetScenario
+from .results import METRICS, iter_budget_frames
+
+EXPORT_COLUMNS = ["budget", "year", *ID_COLUMNS, *METRICS]
+CSV_CHUNK_ROWS = 20000
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def scenarios(planning, names=None):
+    """Saved scenarios of a planning in the usual order (optimal first)."""
+    found = {budget.name: budget for budget in planning.budgets.all()}
+    order = [name for name, _ in BudgetScenario.SCENARIO_CHOICES]
+    return [found[name] for name in order if name in found and (not names or name in names)]
+
+
+def iter_result_frames(planning, names=None):
+    """(scenario, DataFrame of EXPORT_COLUMNS) per scenario year, one year in memory at a time."""
+    index = entity_index(planning.project)
+    for budget in scenarios(planning, names):
+        for yearly_result, frame in iter_budget_frames(budget):
+            keys = frame["entity_key"].to_numpy(dtype=np.int64)
+            for col in reversed(ID_COLUMNS):
+                frame.insert(0, col, index[col][keys])
+            frame.insert(0, "year", yearly_result.year)
+            frame.insert(0, "budget", budget.name)
+            yield budget, frame[EXPORT_COLUMNS]
+
+
+def csv_chunks(planning, names=None):
+    """CSV text of all results, header first, in chunks of CSV_CHUNK_ROWS rows."""
+    yield ",".join(EXPORT_COLUMNS) + "\n"
+    for _, frame in iter_result_frames(planning, names):
+        for start in range(0, len(frame), CSV_CHUNK_ROWS):
+            out = io.StringIO()
+            frame.iloc[start:start + CSV_CHUNK_ROWS].to_csv(out, header=False, index=False)
+            yield out.getvalue()
+
+
+def _sheet_rows(frame):
+    """Rows of ``frame`` as plain Python values (NaN -> empty cell)."""
+    columns = [frame[col].astype(object).where(frame[col].notna(), None).tolist() for col in frame.columns]
+    return zip(*columns)
+
+
+def write_xlsx(planning, path, names=None):
+    """
+    Write all results to ``path`` with openpyxl's write-only mode (rows go
+    straight to disk). One sheet per scenario, continued on "<name> (2)"
+    etc. past Excel's row limit.
+    """
+    workbook = Workbook(write_only=True)
+    header = EXPORT_COLUMNS[1:]  # the sheet names the scenario
+    sheet, sheet_name, sheet_rows, part = None, None, 0, 1
+    for budget, frame in iter_result_frames(planning, names):
+        if budget.name != sheet_name:
+            sheet_name, part = budget.name, 1
+            sheet = workbook.create_sheet(sheet_name)
+            sheet.append(header)
+            sheet_rows = 1
+        for row in _sheet_rows(frame[header]):
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                part += 1
+                sheet = workbook.create_sheet(f"{sheet_name} ({part})")
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("results").append(header)
+    workbook.save(path)
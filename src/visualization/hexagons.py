@@ -0,0 +1,150 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+H3 hexagon aggregation of the GIS mapping features for zoomed-out maps.
+
+The feature -> cell index of a project is built once per H3 resolution and
+weighting, then cached in the "project_files" cache with the GIS mapping
+fingerprint, so a request only has to join the simulation rows onto the
+features and sum them per cell with numpy.
+
+Weighting:
+    centroid  every feature goes to the cell holding its centroid
+    area      a feature is spread over the cells whose centres it covers,
+              in proportion to the number of cells (centroid if none)
+"""
+import os
+
+import h3
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from project.entities import ID_COLUMNS
+from project.ingestion import DISPLAY_LAYER, artifact_path, load_manifest, read_layer, source_path
+from project.tables import cached
+
+from .results import feature_results
+
+# Leaflet zoom -> H3 resolution, average hexagon edge from ~60km (3) to ~65m (10)
+ZOOM_RESOLUTION = {6: 3, 7: 4, 8: 4, 9: 5, 10: 6, 11: 6, 12: 7, 13: 8, 14: 9}
+MIN_RESOLUTION = 3
+MAX_RESOLUTION = 10
+WEIGHTINGS = ("centroid", "area")
+
+SUM_METRICS = ["priority", "person_days", "cost", "flow"]
+MEAN_METRICS = ["density"]
+
+
+def resolution_for_zoom(zoom):
+    zoom = int(zoom)
+    if zoom < min(ZOOM_RESOLUTION):
+        return MIN_RESOLUTION
+    return ZOOM_RESOLUTION.get(zoom, MAX_RESOLUTION)
+
+
+def _build_cell_index(gdf, resolution, weighting):
+    feature_idx, cells, weights = [], [], []
+    for i, geom in enumerate(gdf.geometry):
+        if geom is None or geom.is_empty:
+            continue
+        covered = []
+        if weighting == "area":
+            covered = list(h3.geo_to_cells(geom, resolution))
+        if not covered:
+            point = geom.representative_point() if weighting == "area" else geom.centroid
+            covered = [h3.latlng_to_cell(point.y, point.x, resolution)]
+        feature_idx.extend([i] * len(covered))
+        cells.extend(covered)
+        weights.extend([1.0 / len(covered)] * len(covered))
+
+    cell_codes, cell_ids = pd.factorize(pd.Series(cells, dtype="object"))
+    return {
+        "feature_idx": np.asarray(feature_idx, dtype=np.int64),
+        "cell_code": cell_codes.astype(np.int64),
+        "weight": np.asarray(weights, dtype=np.float64),
+        "cells": list(cell_ids),
+        "ids": gdf[ID_COLUMNS].astype(object).to_dict("list"),
+    }
+
+
+def cell_index(project, resolution, weighting="centroid"):
+    """Precomputed feature -> H3 cell arrays for a project (cached)."""
+    artifact = artifact_path(project, DISPLAY_LAYER)
+    path = artifact if project.is_ready and os.path.exists(artifact) else source_path(project, "gis_mapping_shp")
+    return cached(
+        f"h3-cells:{weighting}:{resolution}", path,
+        lambda p: _build_cell_index(read_layer(project, DISPLAY_LAYER), resolution, weighting),
+    )
+
+
+def feature_count(project):
+    """Number of GIS mapping features, from the manifest once ingested."""
+    manifest = load_manifest(project)
+    if manifest is not None:
+        return manifest["layers"]["gis_mapping"]["rows"]
+    path = source_path(project, "gis_mapping_shp")
+    return cached("feature-count", path, lambda p: len(read_layer(project, "gis_mapping", geometry=False)))
+
+
+def feature_metrics(entities, index, frame):
+    """
+    Simulation metrics per GIS mapping feature (NaN where there is no row),
+    matched like map_data: (compt, miu, nbal), then (compt, miu), then compt.
+    ``entities`` is the project's entity_index, ``frame`` the rows_frame of
+    the year (None without results).
+    """
+    features = pd.DataFrame(index["ids"])
+    metrics = SUM_METRICS + MEAN_METRICS
+    if frame is None:
+        return pd.DataFrame(np.nan, index=features.index, columns=metrics)
+    _, result = feature_results(entities, features, frame, metrics)
+    return result
+
+
+def hex_collection(index, per_feature):
+    """Sum/average the per feature metrics into the cells of a cell_index."""
+    n_cells = len(index["cells"])
+    feature_idx, cell_code, weight = index["feature_idx"], index["cell_code"], index["weight"]
+    totals = {}
+    for metric in SUM_METRICS:
+        values = per_feature[metric].to_numpy(dtype=np.float64)[feature_idx]
+        totals[metric] = np.bincount(cell_code, weights=np.nan_to_num(values) * weight, minlength=n_cells)
+    for metric in MEAN_METRICS:
+        values = per_feature[metric].to_numpy(dtype=np.float64)[feature_idx]
+        has_value = ~np.isnan(values)
+        value_weight = np.bincount(cell_code, weights=weight * has_value, minlength=n_cells)
+        value_sum = np.bincount(cell_code, weights=np.nan_to_num(values) * weight, minlength=n_cells)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            totals[metric] = np.where(value_weight > 0, value_sum / value_weight, np.nan)
+    feature_counts = np.bincount(cell_code, minlength=n_cells)
+    with_data = np.bincount(cell_code, weights=per_feature["cost"].notna().to_numpy()[feature_idx], minlength=n_cells)
+
+    features = []
+    for i, cell in enumerate(index["cells"]):
+        boundary = [[lng, lat] for lat, lng in h3.cell_to_boundary(cell)]
+        boundary.append(boundary[0])
+        properties = {"cell": cell, "features": int(feature_counts[i])}
+        if with_data[i]:
+            properties.update({
+                metric: (None if np.isnan(totals[metric][i]) else round(float(totals[metric][i]), 2))
+                for metric in SUM_METRICS + MEAN_METRICS
+            })
+        else:
+            properties["note"] = "No simulation data"
+        features.append({
+            "type": "Feature",
+            "properties": properties,
+            "geometry": {"type": "Polygon", "coordinates": [boundary]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def use_hexagons(project, mode, zoom):
+    """Whether map_data should answer with hexagons for this request."""
+    if mode == "hex":
+        return True
+    if mode != "auto" or zoom is None:
+        return False
+    return resolution_for_zoom(zoom) < MAX_RESOLUTION and feature_count(project) > settings.MAP_HEX_FEATURE_THRESHOLD
@@ -0,0 +1,45 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Export the saved results of a planning to CSV or XLSX, one scenario year at
+a time, so long plans go out without every year in memory:
+
+    python manage.py export_results 12 --output planning_12.csv
+    python manage.py export_results 12 --budget optimal --budget budget_1
+    python manage.py export_results 12 --output planning_12.xlsx
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planning.models import Planning
+from visualization.exports import csv_chunks, write_xlsx
+from visualization.models import BudgetScenario
+
+
+class Command(BaseCommand):
+    help = 'Export the saved simulation results of a planning to CSV or XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('planning', type=int, help='Planning id.')
+        parser.add_argument('--budget', action='append', choices=[c[0] for c in BudgetScenario.SCENARIO_CHOICES],
+                            help='Scenario to export (repeatable, default all).')
+        parser.add_argument('--output', help='File to write, .csv or .xlsx (default CSV on stdout).')
+
+    def handle(self, *args, **options):
+        planning = Planning.objects.filter(pk=options['planning']).select_related('project').first()
+        if planning is None:
+            raise CommandError(f"Planning {options['planning']} does not exist.")
+        output = options['output']
+
+        if output and output.lower().endswith('.xlsx'):
+            write_xlsx(planning, output, options['budget'])
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as fh:
+                fh.writelines(csv_chunks(planning, options['budget']))
+        else:
+            sys.stdout.writelines(csv_chunks(planning, options['budget']))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote the results of {planning} to {output}"))
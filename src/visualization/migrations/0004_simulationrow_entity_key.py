@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:32
+
+from django.db import migrations, models
+
+
+def _normalize(value):
+    value = None if value is None else str(value).lower().strip()
+    return None if value in (None, "", "nan", "none") else value
+
+
+def backfill_entity_keys(apps, schema_editor):
+    """Give existing result rows an entity key, creating the project entities."""
+    SimulationRow = apps.get_model("visualization", "SimulationRow")
+    ProjectEntity = apps.get_model("project", "ProjectEntity")
+    Planning = apps.get_model("planning", "Planning")
+
+    for planning in Planning.objects.all().iterator():
+        rows = SimulationRow.objects.filter(yearly_result__budget__planning=planning, entity_key__isnull=True)
+        triples = rows.values_list("compt_id", "miu_id", "nbal_id").distinct()
+        if not triples:
+            continue
+
+        known = {
+            (_normalize(e.compt_id), _normalize(e.miu_id), _normalize(e.nbal_id)): e.key
+            for e in ProjectEntity.objects.filter(project_id=planning.project_id)
+        }
+        next_key = max(known.values(), default=-1) + 1
+        for compt_id, miu_id, nbal_id in triples:
+            normalized = (_normalize(compt_id), _normalize(miu_id), _normalize(nbal_id))
+            if normalized not in known:
+                ProjectEntity.objects.create(project_id=planning.project_id, key=next_key,
+                                             compt_id=compt_id, miu_id=miu_id, nbal_id=nbal_id)
+                known[normalized] = next_key
+                next_key += 1
+            rows.filter(compt_id=compt_id, miu_id=miu_id, nbal_id=nbal_id).update(entity_key=known[normalized])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualization', '0003_alter_simulationrow_compt_id_and_more'),
+        ('project', '0005_project_entity'),
+        ('planning', '0010_alter_planning_budget_plan_1_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationrow',
+            name='entity_key',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='simulationrow',
+            index=models.Index(fields=['yearly_result', 'entity_key'], name='visualizati_yearly__ccc736_idx'),
+        ),
+        migrations.RunPython(backfill_entity_keys, migrations.RunPython.noop),
+    ]
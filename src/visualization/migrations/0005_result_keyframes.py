@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualization', '0004_simulationrow_entity_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationrow',
+            name='occurrence',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='simulationrow',
+            name='removed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='yearlyresult',
+            name='is_keyframe',
+            field=models.BooleanField(default=True),
+        ),
+    ]
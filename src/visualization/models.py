@@ -29,6 +29,9 @@ class YearlyResult(models.Model):
     """Each budget has results per year."""
     budget = models.ForeignKey(BudgetScenario, on_delete=models.CASCADE, related_name="yearly_results")
     year = models.PositiveIntegerField()
+    # keyframes hold every row; other years only the rows that changed since
+    # the previous year (see visualization/results.py)
+    is_keyframe = models.BooleanField(default=True)
 
     class Meta:
         unique_together = ("budget", "year")
@@ -41,6 +44,14 @@ class SimulationRow(models.Model):
     """One row in the simulation output for a given year & budget."""
     yearly_result = models.ForeignKey(YearlyResult, on_delete=models.CASCADE, related_name="rows")
 
+    # key into the project's entity dictionary (project.ProjectEntity.key)
+    entity_key = models.PositiveIntegerField(null=True, blank=True)
+    # n-th row of the same entity in a year (the GIS mapping may repeat a triple)
+    occurrence = models.PositiveSmallIntegerField(default=0)
+    # delta years only: the row no longer exists from this year on
+    removed = models.BooleanField(default=False)
+
+    # only filled for results saved before the entity dictionary existed
     nbal_id = models.CharField(max_length=50, null=True, blank=True)
     miu_id = models.CharField(max_length=50, null=True, blank=True)
     compt_id = models.CharField(max_length=50, null=True, blank=True)
@@ -52,9 +63,11 @@ class SimulationRow(models.Model):
     cleared_now = models.BooleanField(default=False)
     cleared_fully = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["yearly_result", "entity_key"])]
 
     def __str__(self):
-        return f"Row {self.link_back_id} ({self.yearly_result})"
+        return f"Row {self.entity_key} ({self.yearly_result})"
 
 # propagated budget model
 class SimulationBudgetYear(models.Model):
@@ -0,0 +1,229 @@
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+
+Storage of and read access to saved simulation results. Rows reference the
+project entity dictionary (project/entities.py) by integer key, so results are
+loaded as flat arrays and grouped / joined on integer codes; the id strings
+only come back in for display.
+
+Most rows hardly change from one year to the next, so a scenario keeps all of
+its rows only in keyframe years (every RESULT_KEYFRAME_INTERVAL years). The
+years in between store the rows that changed, were added or were removed
+(``removed`` tombstones). rows_frame() rebuilds such a year from the nearest
+keyframe and caches it in the file based "results" cache (shared by the
+workers, next to the aggregates); iter_budget_frames() walks a whole
+scenario holding one year at a time.
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+
+from project.entities import ID_COLUMNS, fallback_keys
+
+from .models import SimulationRow, YearlyResult
+
+METRICS = ["priority", "person_days", "cost", "density", "flow", "cleared_now", "cleared_fully"]
+
+# a row of a year is identified by its entity and repeat number
+STATE_INDEX = ["entity_key", "occurrence"]
+
+# group columns per visualization level
+LEVEL_COLUMNS = {
+    "compartment": ["compt_id"],
+    "miu": ["compt_id", "miu_id"],
+    "nbal": ["compt_id", "miu_id", "nbal_id"],
+}
+
+
+def result_state(entity_keys, rows):
+    """
+    Full result rows of one year as saved: indexed by (entity_key, occurrence)
+    with one column per metric, missing optional metrics filled in.
+    """
+    entity_keys = np.asarray(entity_keys, dtype=np.int64)
+    state = pd.DataFrame({
+        "entity_key": entity_keys,
+        "occurrence": pd.Series(entity_keys).groupby(entity_keys).cumcount().to_numpy(),
+    })
+    for field in METRICS:
+        if field in rows.columns:
+            state[field] = rows[field].to_numpy()
+        elif field in ("cleared_now", "cleared_fully"):
+            state[field] = False
+        else:
+            state[field] = np.nan
+    state["cleared_now"] = state["cleared_now"].astype(bool)
+    state["cleared_fully"] = state["cleared_fully"].astype(bool)
+    return state.set_index(STATE_INDEX)
+
+
+def delta_rows(previous, current):
+    """
+    Rows to store for ``current`` when the year before was ``previous`` (both
+    from result_state): changed and new rows, plus removed rows flagged
+    ``removed``. NaN equals NaN.
+    """
+    common = current.index.intersection(previous.index)
+    now = current.loc[common, METRICS].to_numpy(dtype=np.float64, na_value=np.nan)
+    before = previous.loc[common, METRICS].to_numpy(dtype=np.float64, na_value=np.nan)
+    same = ((now == before) | (np.isnan(now) & np.isnan(before))).all(axis=1)
+    changed = current.index.isin(common[~same]) | ~current.index.isin(previous.index)
+
+    delta = current[changed].assign(removed=False)
+    gone = previous[~previous.index.isin(current.index)].assign(removed=True)
+    return pd.concat([delta, gone])
+
+
+def _stored_rows(yearly_result, fields=METRICS):
+    """Rows as stored for one year, indexed by (entity_key, occurrence)."""
+    records = SimulationRow.objects.filter(yearly_result=yearly_result).order_by("id").values_list(
+        *STATE_INDEX, "removed", *fields
+    )
+    return pd.DataFrame.from_records(records, columns=[*STATE_INDEX, "removed", *fields]).set_index(STATE_INDEX)
+
+
+def apply_delta(state, delta):
+    """Roll ``state`` forward by the stored rows of a delta year, keeping row order."""
+    removed = delta["removed"].to_numpy(dtype=bool)
+    changes = delta.drop(columns="removed")
+    state = state.drop(index=changes.index[removed], errors="ignore")
+
+    changes = changes[~removed]
+    existing = changes.index.isin(state.index)
+    if existing.any():
+        state.loc[changes.index[existing], changes.columns] = changes[existing]
+    return pd.concat([state, changes[~existing]])
+
+
+def _cache_key(yearly_result_id):
+    return f"state:{yearly_result_id}"
+
+
+def reconstruct(yearly_result):
+    """
+    All rows of a delta year, rebuilt from the nearest keyframe (or the
+    nearest cached year after it) and cached.
+    """
+    cache = caches["results"]
+    state = cache.get(_cache_key(yearly_result.pk))
+    if state is not None:
+        return state
+
+    # years back to the keyframe, newest first
+    chain = []
+    for earlier in YearlyResult.objects.filter(
+        budget_id=yearly_result.budget_id, year__lte=yearly_result.year
+    ).order_by("-year"):
+        chain.append(earlier)
+        if earlier.is_keyframe:
+            break
+
+    cached = cache.get_many([_cache_key(y.pk) for y in chain[1:]])
+    state, todo = None, chain
+    for position, earlier in enumerate(chain[1:], start=1):
+        if _cache_key(earlier.pk) in cached:
+            state, todo = cached[_cache_key(earlier.pk)], chain[:position]
+            break
+
+    for earlier in reversed(todo):
+        rows = _stored_rows(earlier)
+        if state is None:
+            # keyframe (or a delta year without one before it)
+            state = rows.drop(columns="removed")
+        else:
+            state = apply_delta(state, rows)
+
+    cache.set(_cache_key(yearly_result.pk), state, settings.RESULT_CACHE_TIMEOUT)
+    return state
+
+
+def rows_frame(yearly_result, fields=METRICS):
+    """Result rows of one scenario year: entity_key + ``fields``."""
+    if not yearly_result.is_keyframe:
+        return reconstruct(yearly_result).reset_index()[["entity_key", *fields]]
+    # same row order as the rebuilt years (_stored_rows)
+    records = SimulationRow.objects.filter(yearly_result=yearly_result).order_by("id").values_list("entity_key", *fields)
+    return pd.DataFrame.from_records(records, columns=["entity_key", *fields])
+
+
+def iter_budget_frames(budget, fields=METRICS):
+    """
+    (yearly result, rows) for every year of a scenario in order, rolling the
+    deltas forward so only one year is held in memory.
+    """
+    state = None
+    for yearly_result in budget.yearly_results.order_by("year"):
+        rows = _stored_rows(yearly_result)
+        if yearly_result.is_keyframe or state is None:
+            state = rows.drop(columns="removed")
+        else:
+            state = apply_delta(state, rows)
+        yield yearly_result, state.reset_index()[["entity_key", *fields]]
+
+
+def level_codes(index, level):
+    """Group code per entity key for a visualization level."""
+    if level == "compartment":
+        return index["compt_code"]
+    if level == "miu":
+        return index["miu_code"]
+    return np.arange(index["size"])
+
+
+def level_table(index, frame, level, aggs):
+    """
+    Group result rows to ``level`` on integer codes and label the groups with
+    the id columns of that level (``index`` from entity_index), sorted by id
+    like a string groupby.
+    """
+    columns = LEVEL_COLUMNS.get(level, LEVEL_COLUMNS["nbal"])
+    if frame.empty:
+        return pd.DataFrame(columns=columns + list(aggs))
+
+    keys = frame["entity_key"].to_numpy(dtype=np.int64)
+    codes = level_codes(index, level)[keys]
+    grouped = frame[list(aggs)].groupby(codes, sort=False).agg(aggs)
+
+    # first entity key of every group gives its labels
+    first_key = pd.Series(keys).groupby(codes, sort=False).first().loc[grouped.index].to_numpy()
+    for col in reversed(columns):
+        grouped.insert(0, col, index[col][first_key])
+    # like a groupby on the id strings, rows with a blank id are left out
+    grouped = grouped[grouped[columns].notna().all(axis=1)]
+    return grouped.sort_values(columns).reset_index(drop=True)
+
+
+def entity_results(index, frame, fields):
+    """
+    Arrays by entity key: ``has`` (a row exists) and one float array per
+    field (NaN without a row). Later rows win, as in a dict lookup.
+    """
+    has = np.zeros(index["size"], dtype=bool)
+    values = {field: np.full(index["size"], np.nan) for field in fields}
+    if not frame.empty:
+        keys = frame["entity_key"].to_numpy(dtype=np.int64)
+        has[keys] = True
+        for field in fields:
+            values[field][keys] = frame[field].to_numpy(dtype=np.float64, na_value=np.nan)
+    return has, values
+
+
+def feature_results(index, features, frame, fields=METRICS):
+    """
+    Results per GIS mapping feature, matched on (compt, miu, nbal), then
+    (compt, miu), then compt (``index`` from entity_index). Returns
+    (matched mask, DataFrame of ``fields``).
+    """
+    has, values = entity_results(index, frame, fields)
+
+    chosen = np.full(len(features), -1, dtype=np.int64)
+    for keys in fallback_keys(index, features[ID_COLUMNS]):
+        usable = (chosen < 0) & (keys >= 0)
+        usable[usable] = has[keys[usable]]
+        chosen[usable] = keys[usable]
+
+    matched = chosen >= 0
+    result = pd.DataFrame({field: np.where(matched, values[field][np.maximum(chosen, 0)], np.nan) for field in fields})
+    return matched, result
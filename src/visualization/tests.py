@@ -1,3 +1,104 @@
-from django.test import TestCase
+"""
+MUCP TOOL
+Author: Kirodh Boodhraj
+"""
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from planning.models import Planning
+from planning.simulation import save_simulation_results
+from project.entities import entity_index, lookup_keys
+from project.models import Project
+from support.models import ClearingNormSet
+
+from .models import BudgetScenario, SimulationRow
+from .results import METRICS, iter_budget_frames, reconstruct, result_state
+
+LOCAL_CACHES = {
+    name: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{name}'}
+    for name in ('default', 'project_files', 'results')
+}
+
+
+def year_rows(compt_ids, density, cleared=(), unprioritised=()):
+    n = len(compt_ids)
+    return pd.DataFrame({
+        "compt_id": compt_ids,
+        "miu_id": [f"m{c[1:]}" for c in compt_ids],
+        "nbal_id": [None] * n,
+        "priority": [np.nan if c in unprioritised else float(i) for i, c in enumerate(compt_ids)],
+        "person_days": np.full(n, 2.0),
+        "cost": np.full(n, 10.0),
+        "density": density,
+        "flow": np.full(n, 0.1),
+        "cleared_now": [c in cleared for c in compt_ids],
+        "cleared_fully": [False] * n,
+    })
+
+
+@override_settings(CACHES=LOCAL_CACHES, RESULT_KEYFRAME_INTERVAL=3)
+class KeyframeStorageTests(TestCase):
+    """Years between keyframes are stored as deltas and rebuilt on read."""
+
+    def setUp(self):
+        user = User.objects.create_user("planner")
+        project = Project.objects.create(user=user, name="catchment", status=Project.STATUS_READY)
+        self.planning = Planning.objects.create(
+            user=user, project=project, clearing_norm_model=ClearingNormSet.objects.create(name="norms"),
+            budget_plan_1=1, budget_plan_2=1, budget_plan_3=1, budget_plan_4=1,
+            escalation_plan_1=1, escalation_plan_2=1, escalation_plan_3=1, escalation_plan_4=1,
+            start_year=2025, years_to_run=7, save_results=True,
+        )
+        ids = ["c1", "c2", "c3", "c4"]
+        # "c2" twice: the same entity on two rows
+        self.years = {
+            2025: year_rows(ids + ["c2"], [5.0, 4.0, 3.0, 2.0, 1.0]),
+            2026: year_rows(ids + ["c2"], [5.0, 4.0, 3.0, 2.0, 1.0]),                  # unchanged
+            2027: year_rows(ids + ["c2"], [5.0, 0.5, 3.0, 2.0, 1.0], cleared=["c2"], unprioritised=["c4"]),  # changed
+            2028: year_rows(ids + ["c2", "c5"], [5.0, 0.5, 3.0, 2.0, 1.0, 9.0], unprioritised=["c4"]),  # added
+            2029: year_rows(["c1", "c3", "c4", "c5"], [5.0, 3.0, 2.0, 9.0]),  # removed
+            2030: year_rows(["c1", "c3", "c4", "c5"], [4.0, 3.0, 1.0, 9.0]),
+            2031: year_rows(["c1", "c3", "c4", "c5", "c6"], [4.0, 3.0, 1.0, 8.0, 7.0]),
+        }
+        save_simulation_results(self.planning, [self.years], {})
+        self.budget = BudgetScenario.objects.get(planning=self.planning, name="optimal")
+
+    def expected(self, year):
+        rows = self.years[year]
+        return result_state(lookup_keys(entity_index(self.planning.project), rows), rows)
+
+    def assertSameRows(self, actual, expected):
+        pd.testing.assert_frame_equal(actual.sort_index()[METRICS], expected.sort_index()[METRICS], check_dtype=False)
+
+    def test_keyframes_every_interval(self):
+        keyframes = list(self.budget.yearly_results.filter(is_keyframe=True).order_by("year").values_list("year", flat=True))
+        self.assertEqual(keyframes, [2025, 2028, 2031])
+
+    def test_delta_years_store_only_changes(self):
+        stored = dict(self.budget.yearly_results.values_list("year", "pk"))
+        self.assertEqual(SimulationRow.objects.filter(yearly_result_id=stored[2026]).count(), 0)
+        # both "c2" rows (cleared) and "c4" (priority gone)
+        self.assertEqual(SimulationRow.objects.filter(yearly_result_id=stored[2027]).count(), 3)
+        removed = SimulationRow.objects.filter(yearly_result_id=stored[2029], removed=True).count()
+        self.assertEqual(removed, 2)
+
+    def test_reconstruct_matches_saved_rows(self):
+        for yearly_result in self.budget.yearly_results.filter(is_keyframe=False).order_by("year"):
+            with self.subTest(year=yearly_result.year):
+                self.assertSameRows(reconstruct(yearly_result), self.expected(yearly_result.year))
+                # second read comes from the results cache
+                self.assertSameRows(reconstruct(yearly_result), self.expected(yearly_result.year))
+
+    def test_iter_budget_frames_matches_saved_rows(self):
+        years = []
+        for yearly_result, frame in iter_budget_frames(self.budget):
+            years.append(yearly_result.year)
+            expected = self.expected(yearly_result.year).reset_index()
+            pd.testing.assert_frame_equal(
+                frame.sort_values("entity_key", kind="stable").reset_index(drop=True)[["entity_key", *METRICS]],
+                expected.sort_values("entity_key", kind="stable").reset_index(drop=True)[["entity_key", *METRICS]],
+                check_dtype=False,
+            )
+        self.assertEqual(years, sorted(self.years))
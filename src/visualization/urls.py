@@ -3,7 +3,7 @@ MUCP TOOL
 Author: Kirodh Boodhraj
 """
 from django.urls import path
-from .views import visualization_home, visualization_view, visualization_selector, visualization_data, visualization_timeseries, visualization_pdf, map_data
+from .views import visualization_home, visualization_view, visualization_selector, visualization_data, visualization_timeseries, visualization_pdf, map_data, visualization_compare, comparison_data, visualization_export
 
 app_name = 'visualization'
 
@@ -18,5 +18,8 @@ urlpatterns += [
     path('data/<int:planning_id>/', visualization_data, name='visualization_data'),
     path('map_data/<int:planning_id>/', map_data, name='map_data'),
     path('timeseries/<int:planning_id>/', visualization_timeseries, name='visualization_timeseries'),
+    path('export/<int:planning_id>/', visualization_export, name='visualization_export'),
+    path('compare/', visualization_compare, name='visualization_compare'),
+    path('compare/data/', comparison_data, name='comparison_data'),
     path('pdf/<int:planning_id>/<int:year>/<str:budget>/', visualization_pdf, name='visualization_pdf'),
 ]
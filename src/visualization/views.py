@@ -3,25 +3,27 @@ MUCP TOOL
 Author: Kirodh Boodhraj
 """
 import os
-import matplotlib
-matplotlib.use("Agg")  # Use non-GUI backend
 import io
 import json
-import geopandas as gpd
-import pandas as pd
-from shapely.geometry import mapping
-from fpdf import FPDF
-import matplotlib.pyplot as plt
+import asyncio
+import tempfile
 
+from django.conf import settings
 from django.contrib.staticfiles import finders
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.text import slugify
 from django.contrib.auth.decorators import login_required
 from django.template.loader import render_to_string
 
+from main.concurrency import compute, json_response, read, streaming_content
 from planning.models import Planning
-from .models import BudgetScenario, YearlyResult, SimulationRow, SimulationBudgetYear
+from .models import BudgetScenario, YearlyResult, SimulationBudgetYear
 
+# numpy/pandas/geopandas, matplotlib, fpdf and the result helpers built on
+# them are imported inside the views that need them, so loading the URLconf
+# (every manage.py command, every worker boot) stays cheap. Preloaded
+# gunicorn masters import them up front, see main/warmup.py.
 
 
 # visualization home view
@@ -55,160 +57,130 @@ def visualization_view(request, planning_id):
     })
 
 # map data view
+# async: the database/file reads run side by side, the geometry and JSON work
+# on the bounded cpu pool (main/concurrency.py)
 @login_required
-def map_data(request, planning_id):
-    planning = get_object_or_404(Planning, id=planning_id, user=request.user)
+async def map_data(request, planning_id):
+    import pandas as pd
+    from shapely.geometry import mapping
+    from project.entities import entity_index
+    from project.ingestion import DISPLAY_LAYER, read_layer
+    from .hexagons import (
+        MEAN_METRICS, SUM_METRICS, WEIGHTINGS,
+        cell_index, feature_metrics, hex_collection, resolution_for_zoom, use_hexagons,
+    )
+    from .results import feature_results, rows_frame
+
+    user = await request.auser()
+    planning = await read(get_object_or_404, Planning.objects.select_related("project"), id=planning_id, user=user)
     project = planning.project  # <-- this gets the related Project instance
 
-    # helper functions:
-    def normalize(v):
-        return str(v).lower().strip() if v not in (None, "", "nan") else None
-
+    # --- FILTERS from request ---
+    year = request.GET.get("year")
+    budget_name = request.GET.get("budget")
+    mode = request.GET.get("mode", "polygons")
     try:
-        # --- FILTERS from request ---
-        year = request.GET.get("year")
-        budget_name = request.GET.get("budget")
-    except Exception as e:
-        pass
-
-    # find budget + yearly result
-    budget = BudgetScenario.objects.filter(planning=planning, name=budget_name).first()
-    yearly_result = None
-    if budget and year:
-        yearly_result = YearlyResult.objects.filter(budget=budget, year=year).first()
-
-    # preload simulation rows into dict for fast lookup
-    sim_lookup = {}
-    if yearly_result:
-        rows = SimulationRow.objects.filter(yearly_result=yearly_result).values(
-            "compt_id", "miu_id", "nbal_id",
-            "priority", "person_days", "cost", "density", "flow",
-            "cleared_now", "cleared_fully"
-        )
-        for r in rows:
-            key = (normalize(r["compt_id"]), normalize(r["miu_id"]), normalize(r["nbal_id"]))
-            # print(key)
-            # key = (r["compt_id"], r["miu_id"], r["nbal_id"])
-            sim_lookup[key] = r
+        zoom = int(request.GET["zoom"]) if request.GET.get("zoom") else None
+    except ValueError:
+        zoom = None
 
+    # helper functions:
+    def find_yearly_result():
+        # find budget + yearly result
+        budget = BudgetScenario.objects.filter(planning=planning, name=budget_name).first()
+        if budget and year:
+            return YearlyResult.objects.filter(budget=budget, year=year).first()
+        return None
+
+    def year_rows(yearly_result, fields):
+        return rows_frame(yearly_result, fields) if yearly_result else pd.DataFrame(columns=["entity_key", *fields])
+
+    def polygon_collection(gis_mapping_df, entities, frame):
+        # Convert all string data in the DataFrame to lowercase
+        for col in gis_mapping_df.select_dtypes(include=['object', 'string']).columns:
+            gis_mapping_df[col] = gis_mapping_df[col].str.lower()
+
+        # simulation results per feature, joined on the project's integer entity keys
+        matched, sim_data = feature_results(entities, gis_mapping_df, frame, metrics)
+        sim_data = sim_data.astype(object).where(sim_data.notna(), None)
+        for col in ("cleared_now", "cleared_fully"):
+            sim_data[col] = sim_data[col].map(lambda v: None if v is None else bool(v))
+        sim_records = sim_data.to_dict("records")
+
+        # Convert to GeoJSON-like dict
+        features = []
+        for i, row in enumerate(gis_mapping_df.itertuples(index=False)):
+            properties = {
+                "compartment": getattr(row, "compt_id", None),
+                "miu": getattr(row, "miu_id", None),
+                "nbal": getattr(row, "nbal_id", None),
+            }
+
+            if matched[i]:
+                properties.update(sim_records[i])
+            else:
+                properties.update({"note": "No simulation data"})
 
-    # --- SHAPEFILE ---
-    # shapefile data:
-    gis_mapping_df = gpd.read_file(project.gis_mapping_shp.path)  # .drop(columns='geometry', errors='ignore')
-    # Convert all column names to lowercase
-    gis_mapping_df.columns = gis_mapping_df.columns.str.lower()  # for consistency
-    # Convert all string data in the DataFrame to lowercase
-    for col in gis_mapping_df.select_dtypes(include=['object']).columns:
-        gis_mapping_df[col] = gis_mapping_df[col].str.lower()
-
-    if gis_mapping_df.crs != "EPSG:4326":
-        gis_mapping_df = gis_mapping_df.to_crs(epsg=4326)
-
-    # simplify geometry a bit
-    bounds = gis_mapping_df.total_bounds  # [minx, miny, maxx, maxy]
-    width = bounds[2] - bounds[0]
-    height = bounds[3] - bounds[1]
-    extent = max(width, height)
-
-    # e.g. simplify to ~1/5000 of map width
-    tolerance = extent / 5000
-    gis_mapping_df["geometry"] = gis_mapping_df["geometry"].buffer(0)
-    gis_mapping_df["geometry"] = gis_mapping_df["geometry"].simplify(tolerance=tolerance, preserve_topology=True)
-
-
-    ### Convert geometries to GeoJSON for Leaflet
-    # first clean
-    if gis_mapping_df.crs != "EPSG:4326":
-        gis_mapping_df = gis_mapping_df.to_crs(epsg=4326)
-
-    gis_mapping_df["geometry"] = gis_mapping_df["geometry"].buffer(0)  # fixes minor invalid polygons
-
-    # Convert to GeoJSON-like dict
-    features = []
-    for _, row in gis_mapping_df.iterrows():
-        comp = normalize(row.get("compt_id"))
-        miu = normalize(row.get("miu_id"))
-        nbal = normalize(row.get("nbal_id"))
-
-        # progressively try more general keys
-        sim_data = (
-                sim_lookup.get((comp, miu, nbal)) or
-                sim_lookup.get((comp, miu, None)) or
-                sim_lookup.get((comp, None, None))
-        )
+            features.append({
+                "type": "Feature",
+                "properties": properties,
+                "geometry": mapping(row.geometry)
+            })
 
-        properties = {
-            "compartment": row.get("compt_id"),
-            "miu": row.get("miu_id"),
-            "nbal": row.get("nbal_id"),
+        return {
+            "type": "FeatureCollection",
+            "features": features
         }
 
-        if sim_data:
-            properties.update({
-                "priority": sim_data["priority"],
-                "person_days": sim_data["person_days"],
-                "cost": sim_data["cost"],
-                "density": sim_data["density"],
-                "flow": sim_data["flow"],
-                "cleared_now": sim_data["cleared_now"],
-                "cleared_fully": sim_data["cleared_fully"],
-            })
-        else:
-            properties.update({"note": "No simulation data"})
-
-        features.append({
-            "type": "Feature",
-            "properties": properties,
-            "geometry": mapping(row["geometry"])
+    # zoomed out / large projects: aggregate into H3 hexagons instead of polygons
+    yearly_result, hexagons = await asyncio.gather(
+        read(find_yearly_result),
+        compute(use_hexagons, project, mode, zoom),
+    )
+    if hexagons:
+        resolution = resolution_for_zoom(zoom) if zoom is not None else settings.MAP_HEX_DEFAULT_RESOLUTION
+        weighting = request.GET.get("weighting", "centroid")
+        if weighting not in WEIGHTINGS:
+            weighting = "centroid"
+        entities, frame, index = await asyncio.gather(
+            read(entity_index, project),
+            read(lambda: rows_frame(yearly_result, SUM_METRICS + MEAN_METRICS) if yearly_result else None),
+            compute(cell_index, project, resolution, weighting),
+        )
+        geojson = await compute(lambda: hex_collection(index, feature_metrics(entities, index, frame)))
+        return await json_response({
+            "mode": "hex",
+            "resolution": resolution,
+            "weighting": weighting,
+            "gis_mapping_geojson": geojson,
         })
 
-        # key = (normalize(row.get("compt_id")),
-        #        normalize(row.get("miu_id")),
-        #        normalize(row.get("nbal_id")))
-        # # key = (str(row.get("compt_id") or ""), str(row.get("miu_id") or ""), str(row.get("nbal_id") or ""))
-        # sim_data = sim_lookup.get(key)
-        # # fallback if no match found
-        # properties = {
-        #     "compartment": row.get("compt_id"),
-        #     "miu": row.get("miu_id"),
-        #     "nbal": row.get("nbal_id"),
-        # }
-        # if sim_data:
-        #     properties.update({
-        #         "priority": sim_data["priority"],
-        #         "person_days": sim_data["person_days"],
-        #         "cost": sim_data["cost"],
-        #         "density": sim_data["density"],
-        #         "flow": sim_data["flow"],
-        #         "cleared_now": sim_data["cleared_now"],
-        #         "cleared_fully": sim_data["cleared_fully"],
-        #     })
-        # else:
-        #     properties.update({"note": "No simulation data"})
-        #
-        # features.append({
-        #     "type": "Feature",
-        #     "properties": properties,
-        #     "geometry": mapping(row["geometry"])
-        # })
-
-    polygon_geojson = {
-        "type": "FeatureCollection",
-        "features": features
-    }
-    # print(json.dumps(polygon_geojson, indent=4))
-
-    return JsonResponse({
+    # --- SHAPEFILE ---
+    # cleaned GIS mapping (EPSG:4326, repaired and simplified at ingestion)
+    metrics = ["priority", "person_days", "cost", "density", "flow", "cleared_now", "cleared_fully"]
+    entities, frame, gis_mapping_df = await asyncio.gather(
+        read(entity_index, project),
+        read(year_rows, yearly_result, metrics),
+        compute(read_layer, project, DISPLAY_LAYER),
+    )
+    polygon_geojson = await compute(polygon_collection, gis_mapping_df, entities, frame)
+
+    return await json_response({
+        'mode': 'polygons',
         'gis_mapping_geojson': polygon_geojson,
     })
 
 
 # --- Step 3: Main visualization data ---
 # Step 3: Main visualization data
-# visualization data view
+# visualization data view (async, see map_data)
 @login_required
-def visualization_data(request, planning_id):
-    planning = get_object_or_404(Planning, id=planning_id, user=request.user)
+async def visualization_data(request, planning_id):
+    from project.entities import entity_index
+    from .results import level_table, rows_frame
+
+    user = await request.auser()
+    planning = await read(get_object_or_404, Planning.objects.select_related("project"), id=planning_id, user=user)
 
     year = request.GET.get("year")
     budget = request.GET.get("budget")
@@ -217,71 +189,169 @@ def visualization_data(request, planning_id):
     if not year or not budget:
         return JsonResponse({"error": "Year and budget are required"}, status=400)
 
-    budget_scenario = get_object_or_404(BudgetScenario, planning=planning, name=budget)
-    yearly_result = get_object_or_404(YearlyResult, budget=budget_scenario, year=year)
-    rows = SimulationRow.objects.filter(yearly_result=yearly_result).values()
-    df = pd.DataFrame(list(rows))
+    aggs = {"priority": "sum", "person_days": "sum", "cost": "sum", "density": "mean", "flow": "sum", "cleared_now": "max"}
+
+    # helper functions:
+    def scenario_rows(name, fields):
+        budget_scenario = get_object_or_404(BudgetScenario, planning=planning, name=name)
+        yearly_result = get_object_or_404(YearlyResult, budget=budget_scenario, year=year)
+        return rows_frame(yearly_result, fields)
+
+    def budget_totals():
+        # Get SimulationBudgetYear totals for this year
+        budget_year = SimulationBudgetYear.objects.filter(planning=planning, year=year).first()
+        totals = {}
+        if budget_year:
+            for i, b in enumerate(["plan_1", "plan_2", "plan_3", "plan_4"]):
+                totals[b] = float(getattr(budget_year, b))
+        return totals
+
+    def table(entities, df):
+        # grouped data for table (integer group-by on the entity keys)
+        grouped = level_table(entities, df, level, aggs)
+
+        # 🔹 Round only numeric columns we care about
+        round_cols = ["priority", "person_days", "cost", "density", "flow"]
+        for col in round_cols:
+            if col in grouped.columns:
+                grouped[col] = grouped[col].round(2)
+        return grouped.to_dict(orient="records")
+
+    # 🔹 Always load the optimal budget separately
+    df, optimal_df, totals, entities = await asyncio.gather(
+        read(scenario_rows, budget, list(aggs)),
+        read(scenario_rows, "optimal", ["cost"]),
+        read(budget_totals),
+        read(entity_index, planning.project),
+    )
+
+    # ✅ Compute optimal plan total cost for this year
+    optimal_budget = float(optimal_df["cost"].sum()) if not optimal_df.empty else 0.0
 
+    return await json_response({
+        "table": await compute(table, entities, df),
+        "budget_totals": totals,
+        "currency": planning.currency,
+        "optimal_budget": optimal_budget
+    })
 
-    # grouped data for table
-    if level == "compartment":
-        grouped = df.groupby("compt_id").agg({"priority": "sum", "person_days": "sum","cost": "sum","density": "mean","flow": "sum","cleared_now": "max"}).reset_index()
-    elif level == "miu":
-        grouped = df.groupby(["compt_id", "miu_id"]).agg({"priority": "sum", "person_days": "sum","cost": "sum","density": "mean","flow": "sum","cleared_now": "max"}).reset_index()
-    else:
-        grouped = df.groupby(["compt_id", "miu_id", "nbal_id"]).agg({"priority": "sum", "person_days": "sum","cost": "sum","density": "mean","flow": "sum","cleared_now": "max"}).reset_index()
 
-    # 🔹 Round only numeric columns we care about
-    round_cols = ["priority", "person_days", "cost", "density", "flow"]
-    for col in round_cols:
-        if col in grouped.columns:
-            grouped[col] = grouped[col].round(2)
+# results export view: every scenario x year x row, as streamed CSV or XLSX
+@login_required
+def visualization_export(request, planning_id):
+    from .exports import csv_chunks, write_xlsx
+
+    planning = get_object_or_404(Planning.objects.select_related("project"), id=planning_id, user=request.user)
+    export_format = request.GET.get("format", "csv")
+    budgets = request.GET.getlist("budget") or None
+    filename = f"{slugify(planning.project.name)}_planning_{planning.pk}_results"
+
+    if export_format == "xlsx":
+        # write-only workbook on disk, then streamed from the file (deleted on close)
+        tmp = tempfile.NamedTemporaryFile(suffix=".xlsx")
+        write_xlsx(planning, tmp.name, budgets)
+        return FileResponse(tmp, as_attachment=True, filename=f"{filename}.xlsx")
+    if export_format != "csv":
+        return JsonResponse({"error": "format must be csv or xlsx"}, status=400)
+
+    response = StreamingHttpResponse(streaming_content(request, csv_chunks(planning, budgets)), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
 
+# --- Planning comparison ---
+# comparison page
+@login_required
+def visualization_compare(request):
+    from .aggregates import COMPARE_METRICS, MAX_COMPARED
+    plannings = Planning.objects.filter(user=request.user, save_results=True).select_related("project").order_by('-created_at')
+    return render(request, "visualization/compare.html", {
+        "plannings": plannings,
+        "budgets": BudgetScenario.SCENARIO_CHOICES,
+        "metrics": COMPARE_METRICS,
+        "max_compared": MAX_COMPARED,
+    })
 
-    # Get SimulationBudgetYear totals for this year
-    budget_year = SimulationBudgetYear.objects.filter(planning=planning, year=year).first()
-    budget_totals = {}
-    if budget_year:
-        for i, b in enumerate(["plan_1", "plan_2", "plan_3", "plan_4"]):
-            budget_totals[b] = float(getattr(budget_year, b))
 
-    # 🔹 Always load the optimal budget separately
-    optimal_scenario = get_object_or_404(BudgetScenario, planning=planning, name="optimal")
-    optimal_yearly = get_object_or_404(YearlyResult, budget=optimal_scenario, year=year)
-    optimal_rows = SimulationRow.objects.filter(yearly_result=optimal_yearly).values()
-    optimal_df = pd.DataFrame(list(optimal_rows))
+# comparison data view: per-year and per-compartment deltas against the first planning
+@login_required
+def comparison_data(request):
+    import numpy as np
+    from .aggregates import COMPARE_METRICS, MAX_COMPARED, compare, scenario_aggregates
 
-    # ✅ Compute optimal plan total cost for this year
-    optimal_budget = float(optimal_df["cost"].sum()) if not optimal_df.empty else 0.0
+    try:
+        planning_ids = [int(pk) for pk in request.GET.getlist("planning")]
+        year = int(request.GET["year"]) if request.GET.get("year") else None
+        limit = min(int(request.GET.get("limit", 200)), 5000)
+    except ValueError:
+        return JsonResponse({"error": "Invalid planning id, year or limit"}, status=400)
+    budget = request.GET.get("budget", "optimal")
+    sort_metric = request.GET.get("sort", "cost")
+
+    planning_ids = list(dict.fromkeys(planning_ids))
+    if not 2 <= len(planning_ids) <= MAX_COMPARED:
+        return JsonResponse({"error": f"Select between 2 and {MAX_COMPARED} plannings"}, status=400)
+    if sort_metric not in COMPARE_METRICS:
+        return JsonResponse({"error": "Unknown metric"}, status=400)
+
+    plannings = Planning.objects.filter(user=request.user, id__in=planning_ids).select_related("project").in_bulk()
+    if len(plannings) != len(planning_ids):
+        return JsonResponse({"error": "Planning not found"}, status=404)
+    scenarios = {
+        scenario.planning_id: scenario
+        for scenario in BudgetScenario.objects.filter(planning_id__in=planning_ids, name=budget).select_related("planning__project")
+    }
+    missing = [pk for pk in planning_ids if pk not in scenarios]
+    if missing:
+        return JsonResponse({"error": f"No saved '{budget}' results for planning {missing[0]}"}, status=404)
+
+    comparison = compare([scenario_aggregates(scenarios[pk]) for pk in planning_ids], year, sort_metric, limit)
 
+    def as_list(values):
+        return np.where(np.isnan(values), None, np.round(values, 2)).tolist()
 
     return JsonResponse({
-        "table": grouped.to_dict(orient="records"),
-        "budget_totals": budget_totals,
-        "currency": planning.currency,
-        "optimal_budget": optimal_budget
-    }, safe=False)
+        "budget": budget,
+        "plannings": [
+            {
+                "id": pk,
+                "name": f"{plannings[pk].project.name} ({plannings[pk].start_year}) ({plannings[pk].created_at:%Y-%m-%d %H:%M} UTC)",
+                "currency": plannings[pk].currency,
+            }
+            for pk in planning_ids
+        ],
+        "years": comparison["years"].tolist(),
+        "year": comparison["year"],
+        "yearly": {metric: as_list(values) for metric, values in comparison["yearly"].items()},
+        "yearly_delta": {metric: as_list(values) for metric, values in comparison["yearly_delta"].items()},
+        "compartments": comparison["compartments"].tolist(),
+        "total_compartments": comparison["total_compartments"],
+        "compartment": {metric: as_list(values) for metric, values in comparison["compartment"].items()},
+        "compartment_delta": {metric: as_list(values) for metric, values in comparison["compartment_delta"].items()},
+    })
 
 
 # --- Step 4: API for timeseries graphs ---
-# visualization timeseries view
+# visualization timeseries view (async: one db pool read per scenario)
 @login_required
-def visualization_timeseries(request, planning_id):
-    planning = get_object_or_404(Planning, id=planning_id, user=request.user)
+async def visualization_timeseries(request, planning_id):
+    import pandas as pd
+    from .results import iter_budget_frames
 
-    data = {}
-    for budget in BudgetScenario.SCENARIO_CHOICES:
-        budget_name = budget[0]
-        # print(budget_name)
-        scenario = BudgetScenario.objects.filter(planning=planning, name=budget_name).first()
-        if not scenario:
-            continue
-        results = YearlyResult.objects.filter(budget=scenario).order_by("year")
+    user = await request.auser()
+    planning = await read(get_object_or_404, Planning, id=planning_id, user=user)
 
+    # helper functions:
+    def scenarios():
+        found = {}
+        for scenario in BudgetScenario.objects.filter(planning=planning).order_by("pk"):
+            found.setdefault(scenario.name, scenario)
+        return [found[name] for name, _ in BudgetScenario.SCENARIO_CHOICES if name in found]
 
+    def scenario_series(scenario):
         yearly_data = []
-        for yr in results:
-            df = pd.DataFrame(list(yr.rows.all().values()))
+        # years in order, deltas rolled forward from each keyframe
+        for yr, df in iter_budget_frames(scenario, ["density", "flow", "person_days", "cost"]):
 
             # Only consider density values > 0 and not NaN
             density_avg = df.loc[(df["density"] > 0) & (df["density"].notna()), "density"].mean()
@@ -297,16 +367,25 @@ def visualization_timeseries(request, planning_id):
                 "person_days": df["person_days"].sum(),
                 "cost": df["cost"].sum(),
             })
+        return yearly_data
 
-        data[budget_name] = yearly_data
-        # print(data)
+    budgets = await read(scenarios)
+    series = await asyncio.gather(*(read(scenario_series, scenario) for scenario in budgets))
+    data = {scenario.name: yearly_data for scenario, yearly_data in zip(budgets, series)}
 
-    return JsonResponse(data, safe=False)
+    return await json_response(data)
 
 # for pdf's
 # visualization pdf view
 @login_required
 def visualization_pdf(request, planning_id, year, budget):
+    import matplotlib
+    matplotlib.use("Agg")  # Use non-GUI backend
+    import matplotlib.pyplot as plt
+    from fpdf import FPDF
+    from project.entities import entity_index
+    from .results import iter_budget_frames, level_table, rows_frame
+
     # helper functions:
     # --- Plot charts with matplotlib (match Chart.js style) ---
     def plot_line(metric, ylabel, title):
@@ -386,16 +465,14 @@ def visualization_pdf(request, planning_id, year, budget):
     # --- Get planning data etc. ---
     budget_scenario = get_object_or_404(BudgetScenario, planning=planning, name=budget)
     yearly_result = get_object_or_404(YearlyResult, budget=budget_scenario, year=year)
-    rows = SimulationRow.objects.filter(yearly_result=yearly_result).values()
-    df = pd.DataFrame(list(rows))
+    df = rows_frame(yearly_result)
 
+    entities = entity_index(planning.project)
+    aggs = {"person_days": "sum", "cost": "sum", "density": "mean", "flow": "sum"}
     level_data = {
-        "Compartment": df.groupby("compt_id").agg({"person_days":"sum","cost":"sum","density":"mean","flow":"sum"}).reset_index(),
-        "MIU": df.groupby(["compt_id","miu_id"]).agg({"person_days":"sum","cost":"sum","density":"mean","flow":"sum"}).reset_index(),
-        "NBAL": df.groupby(["compt_id","miu_id","nbal_id"]).agg({
-            "person_days":"sum","cost":"sum","density":"mean","flow":"sum",
-            "cleared_now":"max","cleared_fully":"max"
-        }).reset_index()
+        "Compartment": level_table(entities, df, "compartment", aggs),
+        "MIU": level_table(entities, df, "miu", aggs),
+        "NBAL": level_table(entities, df, "nbal", {**aggs, "cleared_now": "max", "cleared_fully": "max"}),
     }
 
     budget_years = SimulationBudgetYear.objects.filter(planning=planning).order_by("year")
@@ -413,11 +490,8 @@ def visualization_pdf(request, planning_id, year, budget):
         scenario = BudgetScenario.objects.filter(planning=planning, name=budget_name).first()
         if not scenario:
             continue
-        results = YearlyResult.objects.filter(budget=scenario).order_by("year")
-
         yearly_data = []
-        for yr in results:
-            df = pd.DataFrame(list(yr.rows.all().values()))
+        for yr, df in iter_budget_frames(scenario, ["density", "flow", "person_days", "cost"]):
             yearly_data.append({
                 "year": yr.year,
                 "density": df["density"].mean() if not df.empty else 0,
@@ -430,10 +504,8 @@ def visualization_pdf(request, planning_id, year, budget):
     # also include "optimal" if exists
     opt_scenario = BudgetScenario.objects.filter(planning=planning, name="optimal").first()
     if opt_scenario:
-        opt_results = YearlyResult.objects.filter(budget=opt_scenario).order_by("year")
         data["optimal"] = []
-        for yr in opt_results:
-            df = pd.DataFrame(list(yr.rows.all().values()))
+        for yr, df in iter_budget_frames(opt_scenario, ["density", "flow", "person_days", "cost"]):
             data["optimal"].append({
                 "year": yr.year,
                 "density": df["density"].mean() if not df.empty else 0,